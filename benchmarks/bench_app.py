@@ -0,0 +1,162 @@
+"""Measure server CPU time per Streamlit interaction, against an older revision
+
+Every interaction is replayed on a fresh session with streamlit.testing's
+AppTest: the setup steps run first, then the CPU time of the interaction's
+script run is measured. A click on a widget inside an ``@st.fragment`` is
+replayed the way the server handles it, by rerunning only that fragment.
+Run from the repository root:
+
+    python -m benchmarks.bench_app
+    python -m benchmarks.bench_app --baseline-rev HEAD~1
+
+Interactions whose widgets do not exist in an app version are reported as "-".
+"""
+import argparse
+import contextlib
+import functools
+import inspect
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+APP = "latest.py"
+QUERY = "light that goes on your head for camping"
+
+# A step acts on the app and runs it; it returns False if its widget is missing
+Step = Callable[[AppTest], bool]
+
+
+def _fragment_ids(app: AppTest) -> Dict[str, str]:
+    """Fragment function name -> fragment id, from the fragments the last full run registered"""
+    storage = getattr(getattr(app, '_fragment_storage', None), '_fragments', {})
+    ids = {}
+    for fragment_id, wrapped in storage.items():
+        func = inspect.getclosurevars(wrapped).nonlocals.get('non_optional_func')
+        if func is not None:
+            ids[func.__name__] = fragment_id
+    return ids
+
+
+@contextlib.contextmanager
+def _fragment_rerun(fragment_id: Optional[str]):
+    """Queue a fragment for the next AppTest run, which otherwise reruns the whole script"""
+    if fragment_id is None:
+        yield
+        return
+    original = local_script_runner.RerunData
+    local_script_runner.RerunData = functools.partial(original, fragment_id_queue=[fragment_id])
+    try:
+        yield
+    finally:
+        local_script_runner.RerunData = original
+
+
+def type_text(key: str, text: str) -> Step:
+    def step(app: AppTest) -> bool:
+        widgets = [w for w in list(app.text_area) + list(app.text_input) if w.key == key]
+        if not widgets:
+            return False
+        widgets[0].input(text).run()
+        return True
+    return step
+
+
+def click(label: str, fragment: str = None) -> Step:
+    """Click the first enabled button with label; fragment names the @st.fragment function holding it"""
+    def step(app: AppTest) -> bool:
+        buttons = [b for b in app.button if b.label == label and not b.disabled]
+        if not buttons:
+            return False
+        with _fragment_rerun(_fragment_ids(app).get(fragment) if fragment else None):
+            buttons[0].click().run()
+        return True
+    return step
+
+
+def reload(app: AppTest) -> bool:
+    app.run()
+    return True
+
+
+SEARCH = [type_text("text_input", QUERY), click("🔍 Search")]
+# name -> (setup steps, measured step)
+INTERACTIONS: Dict[str, Tuple[List[Step], Step]] = {
+    'page_load': ([], reload),
+    'rerun_idle': ([], reload),
+    'text_search': ([type_text("text_input", QUERY)], click("🔍 Search")),
+    'example_click': ([], click("Example 1")),
+    'view_details': (SEARCH, click("View Details", fragment="render_results")),
+    'load_more': (SEARCH, click("➕ Load More", fragment="render_results")),
+    'next_page': (SEARCH, click("Next ➡️", fragment="render_results")),
+    'clear_voice': ([type_text("voice_display", QUERY)], click("🗑️ Clear", fragment="voice_panel")),
+    'voice_search': ([type_text("manual_voice_input", QUERY)],
+                     click("🔍 Search from Voice/Text", fragment="voice_panel")),
+    'refresh_dashboard': ([], click("🔄 Refresh", fragment="analytics_dashboard")),
+}
+
+
+def measure(script: str, name: str, repeat: int) -> Optional[float]:
+    """Median CPU milliseconds of one interaction, or None if the app lacks its widgets"""
+    setup, action = INTERACTIONS[name]
+    timings = []
+    for _ in range(repeat):
+        app = AppTest.from_file(os.path.abspath(script), default_timeout=60)
+        if name != 'page_load':
+            app.run()
+        for step in setup:
+            if not step(app):
+                return None
+        start = time.process_time()
+        if not action(app):
+            return None
+        timings.append((time.process_time() - start) * 1000)
+        if app.exception:
+            raise SystemExit(f"{name} failed in {script}: {app.exception[0].value}")
+    return statistics.median(timings)
+
+
+def checkout(revision: str, directory: str) -> str:
+    """Write the app as of a git revision into directory"""
+    source = subprocess.run(["git", "show", f"{revision}:{APP}"], check=True, capture_output=True).stdout
+    path = os.path.join(directory, f"app_{revision.replace('/', '_').replace('~', '_')}.py")
+    with open(path, 'wb') as f:
+        f.write(source)
+    return path
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value:.1f}" if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=APP)
+    parser.add_argument("--baseline-rev", help="git revision of the app to compare against")
+    parser.add_argument("--interactions", nargs="+", choices=list(INTERACTIONS), default=list(INTERACTIONS))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = checkout(args.baseline_rev, directory) if args.baseline_rev else None
+        # Warm the process-wide caches so every interaction measures steady state
+        for script in filter(None, [args.app, baseline]):
+            measure(script, 'text_search', 1)
+
+        print(f"{'interaction':<18} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+        for name in args.interactions:
+            current = measure(args.app, name, args.repeat)
+            before = measure(baseline, name, args.repeat) if baseline else None
+            change = f"{current / before - 1:>+8.1%}" if current is not None and before else f"{'-':>8}"
+            print(f"{name:<18} {_ms(before):>12} {_ms(current):>12} {change}")
+            sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Check that the headless core imports quickly and without heavy dependencies
+
+Each module is imported in a fresh interpreter; the best of several runs is
+compared against the budget. Run from the repository root:
+
+    python -m benchmarks.bench_import --budget-ms 100
+
+Exits with status 1 if a module is over budget or pulls in a UI, audio,
+network or NumPy module at import time. tests/test_import_time.py runs the
+same check under pytest.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['describo.core', 'describo.behavior', 'describo.session_store']
+# Modules that must only be imported on first use
+HEAVY_MODULES = ['streamlit', 'PIL', 'groq', 'pyaudio', 'requests', 'numpy']
+BUDGET_MS = 100.0
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000, 'loaded': sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def measure(module: str, runs: int) -> Dict[str, object]:
+    """Best import time in milliseconds over runs fresh interpreters, and the heavy modules loaded"""
+    best = None
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                check=True, capture_output=True, text=True, cwd=REPO_ROOT).stdout
+        result = json.loads(output)
+        if best is None or result['ms'] < best['ms']:
+            best = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    print(f"{'module':<24} {'import ms':>10}  heavy modules loaded")
+    for module in args.modules:
+        result = measure(module, args.runs)
+        print(f"{module:<24} {result['ms']:>10.1f}  {', '.join(result['loaded']) or '-'}")
+        if result['ms'] > args.budget_ms:
+            failures.append(f"{module} took {result['ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        if result['loaded']:
+            failures.append(f"{module} imported {', '.join(result['loaded'])}")
+
+    if failures:
+        raise SystemExit("\n" + "\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
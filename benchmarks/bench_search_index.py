@@ -0,0 +1,101 @@
+"""Compare the vectorized scorer with the linear scan, including in-place updates
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search_index --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import statistics
+import time
+from typing import List, Dict, Any, Tuple
+
+from benchmarks.synthetic import make_catalog, make_queries
+from describo.analyzer import QueryAnalyzer
+from describo.catalog import DictCatalog
+from describo.scoring import VectorScorer
+from describo.search_index import score_product
+
+
+def linear_rank(products: Dict[str, Dict[str, Any]], keywords: List[str]) -> List[Tuple[str, int]]:
+    """The pre-index search_products: score every product, then sort"""
+    results = []
+    for product_id, product in products.items():
+        score = score_product(product, keywords)
+        if score > 0:
+            results.append((product_id, score))
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results
+
+
+def scorer_rank(scorer: VectorScorer, keywords: List[str]) -> List[Tuple[str, int]]:
+    scores = scorer.scores(keywords)
+    return [(scorer.product_ids[row], int(scores[row])) for row in scorer.best_rows(scores)]
+
+
+query_keywords = QueryAnalyzer(cache_size=0).analyze
+
+
+def time_queries(search, queries: List[List[str]]) -> List[float]:
+    timings = []
+    for keywords in queries:
+        start = time.perf_counter()
+        search(keywords)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def time_updates(catalog: DictCatalog, scorer: VectorScorer, new_products: Dict[str, Dict[str, Any]]) -> float:
+    """Median ms to add a product to the catalog and scorer and remove it again"""
+    timings = []
+    for product_id, product in new_products.items():
+        start = time.perf_counter()
+        catalog.add_product(product_id, product)
+        scorer.add_product(product_id, product)
+        catalog.remove_product(product_id)
+        scorer.remove_product(product_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6])
+    parser.add_argument("--queries", type=int, default=50, help="queries timed against the scorer")
+    parser.add_argument("--linear-queries", type=int, default=5,
+                        help="queries timed against the linear scan (slow at large sizes)")
+    parser.add_argument("--updates", type=int, default=50, help="products added and removed in place")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = [query_keywords(q) for q in make_queries(args.queries, seed=args.seed)]
+    new_products = {f"new-{product_id}": product
+                    for product_id, product in make_catalog(args.updates, seed=args.seed + 1).items()}
+
+    # "rank" scores and orders every match, "top5" returns the five best products,
+    # "update" adds one product in place and removes it again
+    print(f"{'products':>10} {'build s':>9} {'scan ms':>10} {'rank ms':>10} {'top5 ms':>10} "
+          f"{'p99 top5':>10} {'update ms':>10}")
+    for size in args.sizes:
+        products = make_catalog(size, seed=args.seed)
+        catalog = DictCatalog(products)
+
+        start = time.perf_counter()
+        scorer = VectorScorer(catalog)
+        build_s = time.perf_counter() - start
+
+        linear_sample = queries[:args.linear_queries]
+        for keywords in linear_sample:
+            if scorer_rank(scorer, keywords) != linear_rank(products, keywords):
+                raise SystemExit(f"scorer and linear scan disagree for {keywords!r}")
+
+        scan_ms = statistics.median(time_queries(lambda kw: linear_rank(products, kw), linear_sample))
+        rank_ms = statistics.median(time_queries(lambda kw: scorer_rank(scorer, kw), queries))
+        top5 = sorted(time_queries(lambda kw: scorer.top_k(kw, 5), queries))
+        p99 = top5[min(len(top5) - 1, int(len(top5) * 0.99))]
+        update_ms = time_updates(catalog, scorer, new_products)
+        print(f"{size:>10} {build_s:>9.2f} {scan_ms:>10.2f} {rank_ms:>10.2f} "
+              f"{statistics.median(top5):>10.2f} {p99:>10.2f} {update_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Measure semantic index build time, query latency and recall against exact search
+
+Run from the repository root:
+
+    python -m benchmarks.bench_semantic --sizes 10000 100000 1000000
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_catalog, make_queries
+from describo.semantic import HashingVectorizer, SemanticIndex, product_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10 ** 4, 10 ** 5, 10 ** 6])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--recall-queries", type=int, default=20, help="queries also run as an exact scan")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries, seed=args.seed)
+    print(f"{'products':>10} {'lists':>7} {'vector s':>9} {'build s':>9} {'query ms':>9} "
+          f"{'p99 ms':>9} {'recall@k':>9}")
+    for size in args.sizes:
+        products = make_catalog(size, seed=args.seed)
+        vectorizer = HashingVectorizer()
+
+        start = time.perf_counter()
+        vectors = vectorizer.transform(product_text(p) for p in products.values())
+        vector_s = time.perf_counter() - start
+        start = time.perf_counter()
+        index = SemanticIndex.build(list(products), vectors, vectorizer, nprobe=args.nprobe, seed=args.seed)
+        build_s = time.perf_counter() - start
+
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, args.k)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+
+        recalls = []
+        for query in queries[:args.recall_queries]:
+            sims = index.vectors @ vectorizer.transform_one(query)
+            exact = {str(index.ids[row]) for row in np.argsort(-sims)[:args.k] if sims[row] > 0}
+            found = {product_id for product_id, _ in index.search(query, args.k)}
+            if exact:
+                recalls.append(len(exact & found) / len(exact))
+
+        print(f"{size:>10} {len(index.centroids):>7} {vector_s:>9.2f} {build_s:>9.2f} "
+              f"{statistics.median(timings):>9.3f} {timings[min(len(timings) - 1, int(len(timings) * 0.99))]:>9.3f} "
+              f"{statistics.mean(recalls) if recalls else 0.0:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
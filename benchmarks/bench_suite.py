@@ -0,0 +1,235 @@
+"""Time the hot paths and compare them with a saved baseline
+
+Covers keyword extraction, product scoring and search, behavioral
+interaction logging over long sessions and audio encoding, all on synthetic
+data without Streamlit, a microphone or the network. Run from the
+repository root:
+
+    python -m benchmarks.bench_suite --output baseline.json
+    python -m benchmarks.bench_suite --baseline baseline.json --threshold 0.15
+
+Each case is repeated and reports the median time per operation. With
+``--baseline`` the run exits with status 1 when a case got slower than the
+baseline by more than the threshold.
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import statistics
+import struct
+import sys
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from benchmarks.synthetic import make_catalog, make_queries
+from describo.analyzer import QueryAnalyzer
+from describo.audio_codec import encode_flac, encode_wav
+from describo.behavior import BehavioralAuth
+from describo.scoring import VectorScorer
+from describo.catalog import DictCatalog
+from describo.search_index import score_product
+
+SAMPLE_RATE = 16000
+FRAMES_PER_BUFFER = 1024
+SESSION_ACTIONS = ['search', 'example_click', 'product_view', 'voice_stop', 'voice_search', 'checkout_attempt']
+
+# A case prepares its data and returns (operation, inputs); the operation is
+# timed over every input and the total divided by the number of inputs
+Case = Callable[[argparse.Namespace], Tuple[Callable[[Any], Any], Sequence[Any]]]
+
+
+def recorded_frames(seconds: float, seed: int = 0) -> List[bytes]:
+    """Speech-like 16-bit mono PCM split into buffers as the recorder delivers them"""
+    rng = random.Random(seed)
+    samples = []
+    for n in range(int(seconds * SAMPLE_RATE)):
+        t = n / SAMPLE_RATE
+        envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 3 * t)  # syllable-rate loudness
+        voice = math.sin(2 * math.pi * 140 * t) + 0.5 * math.sin(2 * math.pi * 280 * t)
+        samples.append(int(6000 * envelope * voice + rng.gauss(0, 200)))
+    pcm = struct.pack(f'<{len(samples)}h', *(max(-32768, min(32767, s)) for s in samples))
+    step = FRAMES_PER_BUFFER * 2
+    return [pcm[i:i + step] for i in range(0, len(pcm), step)]
+
+
+def _keywords(args) -> List[List[str]]:
+    analyzer = QueryAnalyzer(cache_size=0)
+    return [analyzer.analyze(q) for q in make_queries(args.queries, seed=args.seed)]
+
+
+def case_analyze_cold(args):
+    analyzer = QueryAnalyzer(cache_size=0)
+    return analyzer.analyze, make_queries(args.queries, seed=args.seed)
+
+
+def case_analyze_cached(args):
+    analyzer = QueryAnalyzer()
+    queries = make_queries(args.queries, seed=args.seed)
+    for query in queries:
+        analyzer.analyze(query)
+    return analyzer.analyze, queries
+
+
+def case_score_product(args):
+    products = list(make_catalog(args.catalog_size, seed=args.seed).values())
+    keywords = _keywords(args)[0]
+    return (lambda product: score_product(product, keywords)), products
+
+
+def case_search_linear(args):
+    products = make_catalog(args.catalog_size, seed=args.seed)
+
+    def linear(keywords):
+        scored = [(score_product(p, keywords), pid) for pid, p in products.items()]
+        return sorted((s, pid) for s, pid in scored if s > 0)[-5:]
+    return linear, _keywords(args)[:max(1, args.queries // 10)]
+
+
+def case_search_index(args):
+    scorer = VectorScorer(DictCatalog(make_catalog(args.catalog_size, seed=args.seed)))
+    return (lambda keywords: scorer.best_rows(scorer.scores(keywords))), _keywords(args)
+
+
+def case_search_top5(args):
+    scorer = VectorScorer(DictCatalog(make_catalog(args.catalog_size, seed=args.seed)))
+    return (lambda keywords: scorer.top_k(keywords, 5)), _keywords(args)
+
+
+def case_index_update(args):
+    catalog = DictCatalog(make_catalog(args.catalog_size, seed=args.seed))
+    scorer = VectorScorer(catalog)
+
+    def add_and_remove(item):
+        product_id, product = item
+        catalog.add_product(product_id, product)
+        scorer.add_product(product_id, product)
+        catalog.remove_product(product_id)
+        scorer.remove_product(product_id)
+    new_products = make_catalog(max(1, args.queries), seed=args.seed + 1)
+    return add_and_remove, [(f"new-{product_id}", product) for product_id, product in new_products.items()]
+
+
+def case_log_interaction(args):
+    rng = random.Random(args.seed)
+    auth = BehavioralAuth()
+    # Warm the session up to its full length so trimming and scoring run at steady state
+    for _ in range(args.session_length):
+        auth.log_interaction(rng.choice(SESSION_ACTIONS), {'query_length': rng.randint(1, 80)})
+    actions = [rng.choice(SESSION_ACTIONS) for _ in range(args.session_length)]
+    return auth.log_interaction, actions
+
+
+def case_encode_wav(args):
+    frames = recorded_frames(args.audio_seconds, seed=args.seed)
+    return (lambda buffers: encode_wav(b''.join(buffers), SAMPLE_RATE)), [frames] * 5
+
+
+def case_encode_flac(args):
+    frames = recorded_frames(args.audio_seconds, seed=args.seed)
+    return (lambda buffers: encode_flac(b''.join(buffers), SAMPLE_RATE)), [frames]
+
+
+CASES: Dict[str, Case] = {
+    'analyze_cold': case_analyze_cold,
+    'analyze_cached': case_analyze_cached,
+    'score_product': case_score_product,
+    'search_linear': case_search_linear,
+    'search_index': case_search_index,
+    'search_top5': case_search_top5,
+    'index_update': case_index_update,
+    'log_interaction': case_log_interaction,
+    'encode_wav': case_encode_wav,
+    'encode_flac': case_encode_flac,
+}
+
+
+def run_case(case: Case, args) -> Dict[str, float]:
+    operation, inputs = case(args)
+    per_op = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            operation(item)
+        per_op.append((time.perf_counter() - start) / len(inputs) * 1e6)
+    return {
+        'median_us': statistics.median(per_op),
+        'min_us': min(per_op),
+        'stdev_us': statistics.stdev(per_op) if len(per_op) > 1 else 0.0,
+        'ops_per_repeat': len(inputs),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            thresholds: Dict[str, float], default_threshold: float) -> List[str]:
+    """Print the change per case and return the names of regressed cases"""
+    regressions = []
+    print(f"\n{'case':<18} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<18} {'-':>12} {result['median_us']:>12.2f} {'new':>8}")
+            continue
+        before = baseline[name]['median_us']
+        change = result['median_us'] / before - 1 if before else 0.0
+        limit = thresholds.get(name, default_threshold)
+        flag = "  REGRESSION" if change > limit else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<18} {before:>12.2f} {result['median_us']:>12.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def _case_threshold(value: str) -> Tuple[str, float]:
+    name, _, limit = value.partition('=')
+    if name not in CASES or not limit:
+        raise argparse.ArgumentTypeError(f"expected CASE=FRACTION with CASE one of {', '.join(CASES)}")
+    return name, float(limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--catalog-size", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--session-length", type=int, default=5000, help="interactions per behavioral session")
+    parser.add_argument("--audio-seconds", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON, e.g. to save a baseline")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed slowdown against the baseline as a fraction (default: 0.10)")
+    parser.add_argument("--case-threshold", type=_case_threshold, action="append", default=[],
+                        metavar="CASE=FRACTION", help="per-case override of --threshold")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':<18} {'median us':>12} {'min us':>12} {'stdev us':>12}")
+    for name in args.cases:
+        results[name] = run_case(CASES[name], args)
+        r = results[name]
+        print(f"{name:<18} {r['median_us']:>12.2f} {r['min_us']:>12.2f} {r['stdev_us']:>12.2f}")
+
+    report = {
+        'environment': {'python': sys.version.split()[0], 'platform': platform.platform()},
+        'parameters': {key: getattr(args, key) for key in
+                       ('catalog_size', 'queries', 'session_length', 'audio_seconds', 'repeat', 'seed')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != report['parameters']:
+            print("\nwarning: baseline was recorded with different parameters", file=sys.stderr)
+        regressions = compare(results, baseline['results'], dict(args.case_threshold), args.threshold)
+        if regressions:
+            raise SystemExit(f"\n{len(regressions)} case(s) regressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
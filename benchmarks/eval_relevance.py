@@ -0,0 +1,91 @@
+"""Compare ranking engines by nDCG@k, MRR and query latency over labeled queries
+
+Run from the repository root:
+
+    python -m benchmarks.eval_relevance
+    python -m benchmarks.eval_relevance --judgments benchmarks/relevance_judgments.json
+    python -m benchmarks.eval_relevance --size 100000 --queries 200
+
+Without ``--judgments`` the queries and graded labels come from a synthetic
+catalog (benchmarks.synthetic.make_judged_queries). A judgments file is a
+JSON list of ``{"query": ..., "relevant": {product_id: grade}}`` entries
+over the built-in demo catalog. Latency covers keyword extraction, scoring
+and top-k selection.
+"""
+import argparse
+import json
+import math
+import statistics
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from benchmarks.synthetic import make_catalog, make_judged_queries
+from describo.analyzer import QueryAnalyzer
+from describo.catalog import DictCatalog
+from describo.core import MOCK_PRODUCTS, RANKINGS
+from describo.ranking import RelevanceScorer
+from describo.scoring import VectorScorer
+
+
+def dcg(grades: Sequence[int]) -> float:
+    return sum((2 ** grade - 1) / math.log2(position + 2) for position, grade in enumerate(grades))
+
+
+def ndcg(ranked: Sequence[str], relevant: Dict[str, int], k: int) -> float:
+    ideal = dcg(sorted(relevant.values(), reverse=True)[:k])
+    return dcg([relevant.get(product_id, 0) for product_id in ranked[:k]]) / ideal if ideal else 0.0
+
+
+def reciprocal_rank(ranked: Sequence[str], relevant: Dict[str, int]) -> float:
+    for position, product_id in enumerate(ranked):
+        if relevant.get(product_id, 0) > 0:
+            return 1 / (position + 1)
+    return 0.0
+
+
+def load_judgments(path: str) -> List[Tuple[str, Dict[str, int]]]:
+    with open(path, encoding='utf-8') as f:
+        return [(entry['query'], entry['relevant']) for entry in json.load(f)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--judgments", default=None, help="labeled queries over the demo catalog")
+    parser.add_argument("--size", type=int, default=10 ** 4, help="synthetic catalog size")
+    parser.add_argument("--queries", type=int, default=100, help="synthetic labeled queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.judgments:
+        catalog = DictCatalog(MOCK_PRODUCTS)
+        judged = load_judgments(args.judgments)
+    else:
+        products = make_catalog(args.size, seed=args.seed)
+        catalog = DictCatalog(products)
+        judged = make_judged_queries(products, args.queries, seed=args.seed)
+    analyzer = QueryAnalyzer(cache_size=0)
+
+    print(f"{len(catalog)} products, {len(judged)} labeled queries")
+    print(f"{'engine':>8} {'build s':>9} {'nDCG@' + str(args.k):>9} {'MRR':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for ranking in RANKINGS:
+        start = time.perf_counter()
+        scorer = VectorScorer(catalog) if ranking == 'rules' else RelevanceScorer(catalog, ranking)
+        build_s = time.perf_counter() - start
+
+        ndcgs, reciprocal_ranks, timings = [], [], []
+        for query, relevant in judged:
+            start = time.perf_counter()
+            rows = scorer.best_rows(scorer.scores(analyzer.analyze(query)), args.k)
+            timings.append((time.perf_counter() - start) * 1000)
+            ranked = [scorer.product_ids[row] for row in rows]
+            ndcgs.append(ndcg(ranked, relevant, args.k))
+            reciprocal_ranks.append(reciprocal_rank(ranked, relevant))
+        timings.sort()
+
+        print(f"{ranking:>8} {build_s:>9.2f} {statistics.mean(ndcgs):>9.3f} {statistics.mean(reciprocal_ranks):>7.3f} "
+              f"{statistics.median(timings):>8.3f} {timings[min(len(timings) - 1, int(len(timings) * 0.99))]:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
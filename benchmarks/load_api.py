@@ -0,0 +1,116 @@
+"""Load-test the HTTP search API and report QPS and latency percentiles
+
+Start the server, then run from the repository root:
+
+    python -m describo.api --port 8000 --no-bot-guard
+    python -m benchmarks.load_api --url http://127.0.0.1:8000 --concurrency 32 --duration 30
+    python -m benchmarks.load_api --batch 50 --concurrency 8
+
+Each of ``--concurrency`` clients keeps one connection open and sends
+requests back to back, single queries by default or ``--batch`` queries per
+POST /search/batch. Only the standard library is needed on the client.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List, Tuple
+from urllib.parse import quote, urlsplit
+
+from benchmarks.synthetic import make_queries
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str,
+                   method: str, path: str, body: bytes = b'') -> Tuple[int, bytes]:
+    head = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+    response_head = await reader.readuntil(b'\r\n\r\n')
+    status_line, *header_lines = response_head.decode('latin-1').split('\r\n')
+    length = 0
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return int(status_line.split(' ', 2)[1]), await reader.readexactly(length)
+
+
+async def _client(host: str, port: int, queries: List[str], offset: int, args: argparse.Namespace,
+                  deadline: float, latencies: List[float], errors: List[int]):
+    reader, writer = await asyncio.open_connection(host, port)
+    position = offset
+    try:
+        while time.perf_counter() < deadline:
+            if args.batch:
+                batch = [queries[(position + i) % len(queries)] for i in range(args.batch)]
+                position += args.batch
+                request = ('POST', '/search/batch', json.dumps({'queries': batch, 'top_k': args.top_k}).encode())
+            else:
+                query = queries[position % len(queries)]
+                position += 1
+                request = ('GET', f"/search?q={quote(query)}&top_k={args.top_k}", b'')
+            start = time.perf_counter()
+            status, _ = await _request(reader, writer, host, *request)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(args: argparse.Namespace):
+    url = urlsplit(args.url)
+    host, port = url.hostname or '127.0.0.1', url.port or 80
+    queries = make_queries(args.queries, seed=args.seed)
+
+    # Warm the worker pool so start-up is not counted
+    reader, writer = await asyncio.open_connection(host, port)
+    for query in queries[:args.concurrency * 4]:
+        await _request(reader, writer, host, 'GET', f"/search?q={quote(query)}&top_k={args.top_k}")
+    writer.close()
+
+    latencies: List[float] = []
+    errors: List[int] = []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(
+        _client(host, port, queries, client * 997, args, deadline, latencies, errors)
+        for client in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    requests = len(latencies)
+    per_request = args.batch or 1
+    ms = [latency * 1000 for latency in latencies]
+    print(f"{'requests':>9} {'queries':>9} {'errors':>7} {'req/s':>9} {'QPS':>9} "
+          f"{'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    print(f"{requests:>9} {requests * per_request:>9} {len(errors):>7} {requests / elapsed:>9.1f} "
+          f"{requests * per_request / elapsed:>9.1f} {statistics.mean(ms) if ms else 0.0:>8.2f} "
+          f"{_percentile(ms, 0.50):>8.2f} {_percentile(ms, 0.95):>8.2f} {_percentile(ms, 0.99):>8.2f} "
+          f"{ms[-1] if ms else 0.0:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections sending requests in parallel")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to send requests for")
+    parser.add_argument("--batch", type=int, default=0, help="queries per batch request (0 sends single queries)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=1000, help="distinct synthetic queries")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
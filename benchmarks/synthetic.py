@@ -0,0 +1,88 @@
+"""Synthetic catalogs and query corpora for benchmarks"""
+import random
+from typing import List, Dict, Any, Tuple
+
+ADJECTIVES = [
+    "portable", "foldable", "lightweight", "waterproof", "rechargeable", "compact",
+    "insulated", "durable", "warm", "collapsible", "ultralight", "heavy", "solar",
+    "inflatable", "padded", "adjustable", "hands-free", "reflective", "thermal", "rugged",
+]
+NOUNS = [
+    "cot", "bottle", "headlamp", "chair", "tent", "bag", "stove", "lantern", "knife",
+    "hammock", "tarp", "pillow", "mat", "filter", "purifier", "flask", "cooler", "axe",
+    "compass", "backpack", "poles", "jacket", "gloves", "blanket", "table", "grill",
+]
+USES = [
+    "camping", "hiking", "outdoor", "fishing", "climbing", "travel", "beach",
+    "family", "winter", "emergency", "backpacking", "picnic", "garden", "festival",
+]
+FILLERS = [
+    "water", "sleep", "light", "shelter", "cold", "weather", "drink", "seat", "bed",
+    "cook", "food", "fire", "night", "rain", "sun", "wind", "river", "trail", "snow",
+]
+QUERY_TEMPLATES = [
+    "{adj} thing people {verb} on during {use}",
+    "{noun} which works in {filler} for {use}",
+    "{adj} {noun} for {use}",
+    "I need that {adj} {filler} {noun}",
+    "something to {verb} with when {use} in the {filler}",
+]
+VERBS = ["sleep", "sit", "cook", "drink", "carry", "see", "store", "clean"]
+
+
+def make_catalog(size: int, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    """Generate a product_id -> product mapping shaped like MOCK_PRODUCTS"""
+    rng = random.Random(seed)
+    products = {}
+    for i in range(size):
+        adj, noun, use = rng.choice(ADJECTIVES), rng.choice(NOUNS), rng.choice(USES)
+        # A per-product token keeps names distinct, like model numbers do in real catalogs
+        model = f"x{rng.randrange(10 ** 6):06d}"
+        keywords = {adj, noun, use, model}
+        keywords.update(rng.sample(FILLERS, rng.randint(2, 5)))
+        products[f"product_{i}"] = {
+            "name": f"{adj.title()} {noun.title()} {model.upper()}",
+            "description": f"{adj.capitalize()} {noun} for {use} and {rng.choice(FILLERS)} use",
+            "price": f"${rng.uniform(5, 500):.2f}",
+            "rating": round(rng.uniform(1, 5), 1),
+            "availability": "In Stock" if rng.random() < 0.9 else "Out of Stock",
+            "image_url": f"https://via.placeholder.com/300x200?text={noun.title()}",
+            "keywords": sorted(keywords),
+        }
+    return products
+
+
+def make_queries(count: int, seed: int = 0) -> List[str]:
+    """Generate natural-language queries similar to the sidebar examples"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        template = rng.choice(QUERY_TEMPLATES)
+        queries.append(template.format(
+            adj=rng.choice(ADJECTIVES),
+            noun=rng.choice(NOUNS),
+            use=rng.choice(USES),
+            filler=rng.choice(FILLERS),
+            verb=rng.choice(VERBS),
+        ))
+    return queries
+
+
+def make_judged_queries(products: Dict[str, Dict[str, Any]], count: int,
+                        seed: int = 0) -> List[Tuple[str, Dict[str, int]]]:
+    """Generate "{adj} {noun} for {use}" queries with graded relevance labels
+
+    A product is relevant when it is the requested kind of item (grade 1),
+    and one grade better for each of the adjective and the use it shares.
+    """
+    rng = random.Random(seed)
+    judged = []
+    for _ in range(count):
+        adj, noun, use = rng.choice(ADJECTIVES), rng.choice(NOUNS), rng.choice(USES)
+        grades = {}
+        for product_id, product in products.items():
+            keywords = set(product['keywords'])
+            if noun in keywords:
+                grades[product_id] = 1 + (adj in keywords) + (use in keywords)
+        judged.append((f"{adj} {noun} for {use}", grades))
+    return judged
@@ -0,0 +1 @@
+"""Headless building blocks for the Describo product discovery app"""
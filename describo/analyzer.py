@@ -0,0 +1,116 @@
+"""Query analysis: tokenizing, stop-word removal and synonym expansion"""
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Iterable, Tuple
+
+# Common words to ignore
+DEFAULT_STOP_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'i', 'need', 'want', 'looking', 'that', 'thing', 'stuff', 'item'}
+
+# Some synonym mapping for better matching
+DEFAULT_SYNONYMS = {
+    'foldable': ['fold', 'collapsible', 'portable'],
+    'bottle': ['container', 'flask'],
+    'light': ['lamp', 'flashlight', 'torch'],
+    'bed': ['cot', 'sleeping'],
+    'chair': ['seat'],
+    'water': ['drink', 'liquid'],
+    'filter': ['purifier', 'clean']
+}
+
+PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words of text with punctuation removed, as queries are split"""
+    return PUNCTUATION.sub('', text.lower()).split()
+
+
+class QueryAnalyzer:
+    """Keyword extractor with a precompiled synonym table and an LRU result cache"""
+
+    def __init__(self, stop_words: Iterable[str] = None, synonyms: Dict[str, List[str]] = None,
+                 cache_size: int = 1024):
+        self.stop_words = frozenset(DEFAULT_STOP_WORDS if stop_words is None else stop_words)
+        self.expansions = self._build_expansions(DEFAULT_SYNONYMS if synonyms is None else synonyms)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: 'OrderedDict[str, Tuple[str, ...]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build_expansions(synonyms: Dict[str, List[str]]) -> Dict[str, Tuple[str, ...]]:
+        """Map every word to the words it expands to, in both directions"""
+        expansions: Dict[str, List[str]] = {}
+        for head, alternatives in synonyms.items():
+            expansions.setdefault(head, []).extend(alternatives)
+        for head, alternatives in synonyms.items():
+            for alternative in alternatives:
+                # Reverse direction, e.g. torch -> light
+                expansions.setdefault(alternative, []).append(head)
+        return {word: tuple(dict.fromkeys(targets)) for word, targets in expansions.items()}
+
+    @classmethod
+    def from_files(cls, stop_words_path: str = None, synonyms_path: str = None,
+                   cache_size: int = 1024) -> 'QueryAnalyzer':
+        """Load stop words (one per line) and synonyms (JSON object), falling back to defaults"""
+        stop_words = None
+        if stop_words_path:
+            with open(stop_words_path, encoding='utf-8') as f:
+                stop_words = {line.strip().lower() for line in f
+                              if line.strip() and not line.startswith('#')}
+
+        synonyms = None
+        if synonyms_path:
+            with open(synonyms_path, encoding='utf-8') as f:
+                synonyms = json.load(f)
+
+        return cls(stop_words=stop_words, synonyms=synonyms, cache_size=cache_size)
+
+    def _extract(self, description: str) -> Tuple[str, ...]:
+        # Convert to lowercase and remove punctuation
+        stop_words = self.stop_words
+        words = [word for word in tokenize(description) if word not in stop_words and len(word) > 2]
+
+        # Expand with synonyms
+        expanded_words = list(words)
+        for word in words:
+            expanded_words.extend(self.expansions.get(word, ()))
+        return tuple(expanded_words)
+
+    def extract(self, text: str) -> List[str]:
+        """Extract keywords without touching the cache, for bulk indexing of product text"""
+        return list(self._extract(text))
+
+    def analyze(self, description: str) -> List[str]:
+        """Extract keywords from text description, reusing cached results"""
+        with self._lock:
+            keywords = self._cache.get(description)
+            if keywords is not None:
+                self._cache.move_to_end(description)
+                self.hits += 1
+                return list(keywords)
+            self.misses += 1
+
+        keywords = self._extract(description)
+
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[description] = keywords
+                self._cache.move_to_end(description)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return list(keywords)
+
+    def cache_info(self) -> Dict[str, int]:
+        """Return hit/miss counters and cache occupancy"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._cache), 'maxsize': self.cache_size}
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
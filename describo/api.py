@@ -0,0 +1,310 @@
+"""Headless HTTP search API over the shared search core
+
+A small HTTP/1.1 server on asyncio streams, with no web framework:
+
+    GET  /search?q=...&top_k=5        one query
+    POST /search        {"query": "...", "top_k": 5}
+    POST /search/batch  {"queries": ["...", ...], "top_k": 5}
+    GET  /health
+    GET  /metrics                     Prometheus text of request latencies
+
+Analysis and scoring are CPU bound, so they run in a process pool with one
+worker per core. Every worker builds its SearchService once, configured from
+the same environment variables as the Streamlit app, and keeps it across
+requests; a batch is split into one chunk per worker. The event loop only
+parses requests and serializes responses.
+
+Each client (address, User-Agent and Accept-Language) and each address on
+its own are checked with a BotGuard before queries reach the pool; a batch
+costs one token per query, so with the guard on a batch may hold at most a
+bucket's worth of queries (413 otherwise). Refused requests get 429 with
+Retry-After. X-Forwarded-For is only believed from the proxies given
+with --trusted-proxy (or the trusted_proxies variable). Start with
+--no-bot-guard for load tests from one machine.
+
+    python -m describo.api --port 8000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from describo.bot_guard import BotGuard, Network, client_address, client_fingerprint, parse_trusted_proxies
+from describo.core import TOP_RESULTS, get_search_service
+from describo.metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# Largest accepted request head and body
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+MAX_BATCH = 1000
+MAX_TOP_K = 100
+# Idle keep-alive connections are closed after this many seconds
+KEEP_ALIVE_TIMEOUT = 30.0
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str = None, headers: Dict[str, str] = None):
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _warm_worker():
+    """Build the worker's search service before its first request"""
+    get_search_service().warm()
+
+
+def search_queries(queries: List[str], top_k: int) -> List[Dict[str, Any]]:
+    """Analyze and search each query with this process's SearchService"""
+    service = get_search_service()
+    responses = []
+    for query in queries:
+        keywords = service.analyze(query)
+        cursor = service.cursor(keywords, query, depth=top_k)
+        results = []
+        for hit in cursor:
+            result = hit.to_dict()
+            result['id'] = hit.product_id
+            results.append(result)
+        responses.append({'query': query, 'keywords': keywords, 'total': cursor.total, 'results': results})
+    return responses
+
+
+def _top_k(value: Any) -> int:
+    try:
+        top_k = int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "top_k must be an integer")
+    if not 1 <= top_k <= MAX_TOP_K:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"top_k must be between 1 and {MAX_TOP_K}")
+    return top_k
+
+
+def _query(value: Any) -> str:
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "query must be a non-empty string")
+    return value
+
+
+class SearchAPI:
+    """HTTP front end dispatching searches to a worker pool
+
+    ``workers=0`` searches on threads of the event loop's default executor
+    instead of separate processes, which is enough for small catalogs.
+    """
+
+    def __init__(self, workers: int = None, executor: Executor = None, guard: BotGuard = None,
+                 bot_guard: bool = True, trusted_proxies: List[Network] = ()):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        if executor is None and self.workers:
+            executor = ProcessPoolExecutor(self.workers, initializer=_warm_worker)
+        self.executor = executor
+        self.guard = (guard or BotGuard()) if bot_guard else None
+        self.trusted_proxies = list(trusted_proxies)
+        self.metrics = MetricsRegistry()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8000) -> asyncio.AbstractServer:
+        self._server = await asyncio.start_server(self._serve_connection, host, port, limit=MAX_HEADER_BYTES)
+        return self._server
+
+    async def serve_forever(self, host: str = '127.0.0.1', port: int = 8000):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def search(self, queries: List[str], top_k: int) -> List[Dict[str, Any]]:
+        """Search queries in the pool, one chunk per worker"""
+        loop = asyncio.get_running_loop()
+        chunks = max(1, min(len(queries), self.workers))
+        size = -(-len(queries) // chunks)
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(self.executor, search_queries, queries[i:i + size], top_k)
+            for i in range(0, len(queries), size)
+        ))
+        return [response for part in parts for response in part]
+
+    def _admit(self, client: Tuple[str, str], cost: float):
+        """Refuse the request with 429 if the client or its address is over its rate or looks scripted"""
+        if self.guard is None:
+            return
+        address, fingerprint = client
+        decision = self.guard.check_client(address, fingerprint, cost)
+        if not decision.allowed:
+            retry_after = str(math.ceil(decision.retry_after))
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, f"too many requests ({decision.reason})",
+                            {'Retry-After': retry_after})
+
+    async def _route(self, method: str, target: str, body: bytes, client: Tuple[str, str]) -> Tuple[HTTPStatus, Any]:
+        url = urlsplit(target)
+        if url.path == '/health' and method == 'GET':
+            health = {'status': 'ok', 'workers': self.workers}
+            if self.guard is not None:
+                health['bot_guard'] = self.guard.stats()
+            return HTTPStatus.OK, health
+        if url.path == '/metrics' and method == 'GET':
+            return HTTPStatus.OK, self.metrics.render_prometheus()
+
+        if url.path == '/search':
+            if method == 'GET':
+                params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                query, top_k = params.get('q'), params.get('top_k', TOP_RESULTS)
+            elif method == 'POST':
+                request = self._json(body)
+                query, top_k = request.get('query'), request.get('top_k', TOP_RESULTS)
+            else:
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            query, top_k = _query(query), _top_k(top_k)
+            self._admit(client, 1)
+            with self.metrics.timed('api_search'):
+                [response] = await self.search([query], top_k)
+            return HTTPStatus.OK, response
+
+        if url.path == '/search/batch':
+            if method != 'POST':
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            request = self._json(body)
+            queries = request.get('queries')
+            if not isinstance(queries, list) or not queries:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "queries must be a non-empty list")
+            # Each query costs a token, so a batch larger than the bucket could never be admitted
+            max_batch = MAX_BATCH if self.guard is None else min(MAX_BATCH, int(self.guard.config.burst))
+            if len(queries) > max_batch:
+                raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"at most {max_batch} queries per batch")
+            queries = [_query(query) for query in queries]
+            top_k = _top_k(request.get('top_k', TOP_RESULTS))
+            self._admit(client, len(queries))
+            with self.metrics.timed('api_batch'):
+                responses = await self.search(queries, top_k)
+            return HTTPStatus.OK, {'responses': responses}
+
+        raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    @staticmethod
+    def _json(body: bytes) -> Dict[str, Any]:
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "body is not valid JSON")
+        if not isinstance(request, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "body must be a JSON object")
+        return request
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, str, Dict[str, str], bytes]]:
+        """Parse one request, or return None once the client closed the connection"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+
+        request_line, *header_lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = request_line.split(' ', 2)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "malformed request line")
+        headers = {}
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        if 'transfer-encoding' in headers:
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "chunked bodies are not supported")
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b''
+        return method, target, version, headers, body
+
+    @staticmethod
+    def _response(status: HTTPStatus, payload: Any, keep_alive: bool, headers: Dict[str, str] = None) -> bytes:
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"{extra}"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        return head.encode('latin-1') + body
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info('peername')
+        address = peer[0] if peer else None
+        try:
+            while True:
+                keep_alive, response_headers = False, {}
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, version, headers, body = request
+                    connection = headers.get('connection', '').lower()
+                    keep_alive = connection != 'close' and (version != 'HTTP/1.0' or connection == 'keep-alive')
+                    client_ip = client_address(address, headers.get('x-forwarded-for'), self.trusted_proxies)
+                    client = (client_ip, client_fingerprint(client_ip, headers.get('user-agent'),
+                                                            headers.get('accept-language')))
+                    status, payload = await self._route(method, target, body, client)
+                except HTTPError as e:
+                    status, payload, response_headers = e.status, {'error': str(e)}, e.headers
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception:
+                    logger.exception("Error handling a request from %s", address)
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'internal server error'}
+                writer.write(self._response(status, payload, keep_alive, response_headers))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Describo search over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="search processes (default: one per core; 0 searches on threads)")
+    parser.add_argument('--no-bot-guard', action='store_true',
+                        help="serve every client without rate limits, e.g. for load tests")
+    parser.add_argument('--trusted-proxy', default=os.getenv('trusted_proxies'),
+                        help="comma-separated proxy addresses or CIDR ranges whose X-Forwarded-For is believed")
+    args = parser.parse_args()
+
+    api = SearchAPI(args.workers, bot_guard=not args.no_bot_guard,
+                    trusted_proxies=parse_trusted_proxies(args.trusted_proxy))
+    print(f"Serving search on http://{args.host}:{args.port} with {api.workers} workers", flush=True)
+    try:
+        asyncio.run(api.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""Streaming microphone capture for voice search
+
+Audio is pulled from PyAudio's callback API on PortAudio's own thread,
+downsampled to 16 kHz mono on the fly and written into a preallocated ring
+buffer. Recording stops by itself once voice activity detection sees the
+speaker go quiet, or when the maximum duration is reached.
+"""
+import operator
+import threading
+from array import array
+from typing import Optional
+
+# Whisper resamples everything to 16 kHz mono, so there is no point uploading more
+TARGET_RATE = 16000
+SAMPLE_WIDTH = 2  # bytes per 16-bit sample
+
+
+class RingBuffer:
+    """Fixed-capacity int16 sample buffer that keeps the most recent samples"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._samples = array('h', bytes(capacity * SAMPLE_WIDTH))
+        self._write = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def write(self, samples: array):
+        if len(samples) >= self.capacity:
+            samples = samples[-self.capacity:]
+        end = self._write + len(samples)
+        if end <= self.capacity:
+            self._samples[self._write:end] = samples
+        else:
+            split = self.capacity - self._write
+            self._samples[self._write:] = samples[:split]
+            self._samples[:end - self.capacity] = samples[split:]
+        self._write = end % self.capacity
+        self._size = min(self.capacity, self._size + len(samples))
+
+    def read(self) -> array:
+        """Return the buffered samples, oldest first"""
+        start = (self._write - self._size) % self.capacity
+        if start + self._size <= self.capacity:
+            return self._samples[start:start + self._size]
+        return self._samples[start:] + self._samples[:self._write]
+
+
+class Resampler:
+    """Stateful linear-interpolation resampler for mono int16 audio"""
+
+    def __init__(self, source_rate: int, target_rate: int = TARGET_RATE):
+        self.step = source_rate / target_rate
+        self._position = 0.0  # next output position, in source samples
+        self._previous: Optional[int] = None
+
+    def process(self, samples: array) -> array:
+        if self.step == 1:
+            return samples
+        if self._previous is not None:
+            # Carry the last sample over so interpolation spans chunk boundaries
+            samples = array('h', [self._previous]) + samples
+        output = array('h')
+        position, step, last = self._position, self.step, len(samples) - 1
+        while position < last:
+            index = int(position)
+            fraction = position - index
+            output.append(int(samples[index] + (samples[index + 1] - samples[index]) * fraction))
+            position += step
+        if last >= 0:
+            self._position = position - last
+            self._previous = samples[last]
+        return output
+
+
+def to_mono(samples: array, channels: int) -> array:
+    """Average interleaved channels down to one"""
+    if channels == 1:
+        return samples
+    frames = [samples[channel::channels] for channel in range(channels)]
+    return array('h', (sum(values) // channels for values in zip(*frames)))
+
+
+class VoiceActivityDetector:
+    """Energy-based detector that reports when speech has been followed by silence"""
+
+    def __init__(self, rate: int = TARGET_RATE, frame_ms: int = 30, silence_ms: int = 800,
+                 min_threshold: float = 300.0, noise_factor: float = 3.0, calibration_ms: int = 300):
+        self.frame_size = rate * frame_ms // 1000
+        self.silence_frames = silence_ms // frame_ms
+        self.calibration_frames = calibration_ms // frame_ms
+        self.min_threshold = min_threshold
+        self.noise_factor = noise_factor
+        self.speech_detected = False
+        self._pending = array('h')
+        self._noise_energy = 0.0
+        self._frames_seen = 0
+        self._silent_run = 0
+
+    @staticmethod
+    def _rms(frame: array) -> float:
+        return (sum(map(operator.mul, frame, frame)) / len(frame)) ** 0.5
+
+    @property
+    def threshold(self) -> float:
+        return max(self.min_threshold, self._noise_energy * self.noise_factor)
+
+    def update(self, samples: array) -> bool:
+        """Feed samples; return True once the speaker has gone quiet"""
+        self._pending.extend(samples)
+        while len(self._pending) >= self.frame_size:
+            frame = self._pending[:self.frame_size]
+            del self._pending[:self.frame_size]
+            energy = self._rms(frame)
+            self._frames_seen += 1
+
+            if self._frames_seen <= self.calibration_frames:
+                # Estimate the background noise level from the first few frames
+                self._noise_energy += (energy - self._noise_energy) / self._frames_seen
+                continue
+
+            if energy >= self.threshold:
+                self.speech_detected = True
+                self._silent_run = 0
+            elif self.speech_detected:
+                self._silent_run += 1
+                if self._silent_run >= self.silence_frames:
+                    return True
+        return False
+
+
+class StreamingRecorder:
+    """Background microphone recorder producing 16 kHz mono PCM
+
+    ``pyaudio_module`` defaults to the real PyAudio module; tests can pass a
+    stand-in exposing ``PyAudio``, ``paInt16``, ``paContinue`` and ``paComplete``.
+    """
+
+    def __init__(self, max_duration: float = 10.0, input_rate: int = 44100, channels: int = 1,
+                 chunk: int = 1024, stop_on_silence: bool = True, pyaudio_module=None):
+        self.max_duration = max_duration
+        self.input_rate = input_rate
+        self.channels = channels
+        self.chunk = chunk
+        self.stop_on_silence = stop_on_silence
+        self._pyaudio = pyaudio_module
+        self._buffer = RingBuffer(int(max_duration * TARGET_RATE))
+        self._resampler = Resampler(input_rate)
+        self._vad = VoiceActivityDetector()
+        self._captured = 0  # 16 kHz samples written so far
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._audio = None
+        self._stream = None
+
+    def start(self):
+        """Open the input stream; capture continues on PortAudio's callback thread"""
+        if self._pyaudio is None:
+            import pyaudio
+            self._pyaudio = pyaudio
+        self._audio = self._pyaudio.PyAudio()
+        try:
+            self._stream = self._audio.open(format=self._pyaudio.paInt16,
+                                            channels=self.channels,
+                                            rate=self.input_rate,
+                                            input=True,
+                                            frames_per_buffer=self.chunk,
+                                            stream_callback=self._callback)
+            self._stream.start_stream()
+        except Exception:
+            self._audio.terminate()
+            self._audio = None
+            raise
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        samples = to_mono(array('h', in_data), self.channels)
+        samples = self._resampler.process(samples)
+        with self._lock:
+            self._buffer.write(samples)
+            self._captured += len(samples)
+        finished = self._captured >= self._buffer.capacity
+        if self.stop_on_silence and self._vad.update(samples):
+            finished = True
+        if finished:
+            self._done.set()
+            return None, self._pyaudio.paComplete
+        return None, self._pyaudio.paContinue
+
+    @property
+    def is_active(self) -> bool:
+        return self._stream is not None and not self._done.is_set()
+
+    @property
+    def duration(self) -> float:
+        """Seconds of audio captured so far"""
+        return self._captured / TARGET_RATE
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until recording ends by itself; return False on timeout"""
+        return self._done.wait(timeout)
+
+    def stop(self) -> bytes:
+        """Close the device and return the captured 16 kHz mono PCM"""
+        self._done.set()
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+        with self._lock:
+            return self._buffer.read().tobytes()
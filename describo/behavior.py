@@ -0,0 +1,113 @@
+"""Behavioral trust scoring of user sessions"""
+import time
+from collections import Counter, deque
+from typing import Any, Dict, NamedTuple
+
+from describo.interaction_log import InteractionLog
+
+
+class TrustThresholds(NamedTuple):
+    """Tunable constants of the trust score rules"""
+    time_bonus_interval: float = 30.0  # seconds on site per time bonus point
+    time_bonus_max: int = 15
+    variety_points: int = 5  # per unique action type
+    search_points: int = 10
+    voice_points: int = 20
+    rapid_fire_window: int = 5  # most recent actions checked for rapid-fire behavior
+    rapid_fire_min_actions: int = 3
+    rapid_fire_gap: float = 0.5  # seconds between actions
+    rapid_fire_penalty: int = 20
+    human_cutoff: int = 80
+
+
+DEFAULT_THRESHOLDS = TrustThresholds()
+
+
+# Behavioral-Based Authentication Class
+class BehavioralAuth:
+    # Interactions kept for the dashboard timeline; scoring uses running aggregates
+    HISTORY_SIZE = 100
+
+    def __init__(self, history_size: int = HISTORY_SIZE, thresholds: TrustThresholds = DEFAULT_THRESHOLDS):
+        self.thresholds = thresholds
+        self.session_start = time.time()
+        self.interactions = InteractionLog(retention=history_size)
+        self.trust_score = 0  # Base trust score
+        self.interaction_count = 0
+        self.action_counts = Counter()
+        self.has_search = False
+        self.has_voice = False
+        self.recent_timestamps = deque(maxlen=thresholds.rapid_fire_window)
+
+    def log_interaction(self, action: str, metadata: Dict = None):
+        """Log user interaction for behavioral analysis"""
+        timestamp = time.time()
+        self.interactions.append(timestamp, action, metadata)
+
+        self.interaction_count += 1
+        self.action_counts[action] += 1
+        self.has_search = self.has_search or action == 'search'
+        self.has_voice = self.has_voice or action.startswith('voice')
+        self.recent_timestamps.append(timestamp)
+        self.update_trust_score()
+
+    def update_trust_score(self):
+        """Calculate trust score based on behavioral patterns"""
+        t = self.thresholds
+        score = 0  # Base score
+
+        # Time spent on site (1 point per 30 seconds, up to 15 points)
+        session_time = time.time() - self.session_start
+        score += min(t.time_bonus_max, int(session_time / t.time_bonus_interval))
+
+        # Interaction variety (5 points per unique action type)
+        score += len(self.action_counts) * t.variety_points
+
+        # Search behavior (10 points for natural language search)
+        if self.has_search:
+            score += t.search_points
+
+        # Voice input usage (20 points - hard for bots to fake)
+        if self.has_voice:
+            score += t.voice_points
+
+        # Penalize rapid-fire actions (bot-like behavior)
+        if self.interaction_count > 1:
+            recent_timestamps = self.recent_timestamps
+            if len(recent_timestamps) >= t.rapid_fire_min_actions:
+                time_diffs = [recent_timestamps[i] - recent_timestamps[i-1]
+                              for i in range(1, len(recent_timestamps))]
+                if all(diff < t.rapid_fire_gap for diff in time_diffs):  # All actions within 0.5 seconds
+                    score -= t.rapid_fire_penalty
+
+        self.trust_score = min(100, max(0, score))
+
+    def is_human(self) -> bool:
+        """Determine if user is likely human based on trust score"""
+        return self.trust_score >= self.thresholds.human_cutoff
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable snapshot for the session store"""
+        return {
+            'session_start': self.session_start,
+            'interactions': self.interactions.to_dict(),
+            'trust_score': self.trust_score,
+            'interaction_count': self.interaction_count,
+            'action_counts': dict(self.action_counts),
+            'has_search': self.has_search,
+            'has_voice': self.has_voice,
+            'recent_timestamps': list(self.recent_timestamps),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any], thresholds: TrustThresholds = DEFAULT_THRESHOLDS) -> 'BehavioralAuth':
+        auth = cls(thresholds=thresholds)
+        auth.session_start = state['session_start']
+        auth.interactions = InteractionLog.from_dict(state['interactions'])
+        auth.trust_score = state['trust_score']
+        auth.interaction_count = state['interaction_count']
+        auth.action_counts = Counter(state['action_counts'])
+        auth.has_search = state['has_search']
+        auth.has_voice = state['has_voice']
+        auth.recent_timestamps.extend(state['recent_timestamps'])
+        return auth
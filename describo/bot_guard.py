@@ -0,0 +1,187 @@
+"""Rate limiting and automated-traffic detection keyed by client fingerprint
+
+``BotGuard.check`` runs before searches and transcriptions. Each client
+fingerprint (a hash of its address and browser headers, so opening fresh
+sessions does not reset it) gets a token bucket that limits sustained
+request cost, plus running statistics of the gaps between its requests.
+Clients that keep sending at a machine-regular pace, such as a script
+sleeping 0.6 s between requests, are blocked for a while even when they
+stay under the rate limit. Both checks keep a fixed handful of numbers per
+key, and the least recently seen keys are evicted beyond ``max_keys``.
+
+Browser headers are chosen by the client, so ``check_client`` also charges a
+bucket keyed on the address alone, with ``address_scale`` times the
+allowance to leave room for several people behind one NAT. The address is
+taken from X-Forwarded-For only when the connecting peer is a configured
+trusted proxy (``client_address``).
+"""
+import hashlib
+import ipaddress
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Union
+
+
+class GuardConfig(NamedTuple):
+    """Tunable limits of the bot guard"""
+    rate: float = 1.0  # request cost refilled per second
+    burst: float = 20.0  # bucket capacity
+    gap_smoothing: float = 0.1  # weight of the newest gap in the running mean and variance
+    regular_min_requests: int = 20  # requests seen before the pace is judged
+    regular_max_gap: float = 2.0  # seconds; only paces faster than this are judged
+    regular_max_variation: float = 0.15  # gap standard deviation / mean below this looks scripted
+    block_seconds: float = 300.0
+    address_scale: float = 5.0  # rate and burst of the per-address bucket, relative to the per-client one
+
+
+DEFAULT_CONFIG = GuardConfig()
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    reason: Optional[str] = None  # 'rate' or 'regular' when refused
+    retry_after: float = 0.0  # seconds
+
+
+ALLOWED = Decision(True)
+
+
+class _ClientState:
+    __slots__ = ('tokens', 'refilled', 'updated', 'gap_mean', 'gap_variance', 'requests', 'blocked_until')
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.refilled = now  # when tokens were last topped up
+        self.updated = now  # when the last request arrived
+        self.gap_mean = 0.0
+        self.gap_variance = 0.0
+        self.requests = 0
+        self.blocked_until = 0.0
+
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_trusted_proxies(spec: str = None) -> List[Network]:
+    """Parse a comma-separated list of proxy addresses or CIDR ranges"""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in (spec or '').split(',') if part.strip()]
+
+
+def _is_trusted(address: str, trusted: Iterable[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+
+def client_address(peer: str, forwarded_for: str = None, trusted: Iterable[Network] = ()) -> str:
+    """Client address behind any trusted proxies
+
+    X-Forwarded-For entries are appended by each proxy, so they are walked
+    from the right while the hop that added them is trusted. Without
+    trusted proxies the header is ignored and the peer address is used.
+    """
+    trusted = list(trusted)
+    address = peer or ''
+    if not trusted or not forwarded_for:
+        return address
+    hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+    while hops and _is_trusted(address, trusted):
+        address = hops.pop()
+    return address
+
+
+def client_fingerprint(address: str = None, user_agent: str = None, accept_language: str = None) -> str:
+    """Stable key for a client from its address and browser headers"""
+    payload = "\x1f".join(value or '' for value in (address, user_agent, accept_language))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=12).hexdigest()
+
+
+class BotGuard:
+    """Token buckets and pace statistics per client fingerprint, shared by all sessions of a process"""
+
+    def __init__(self, config: GuardConfig = DEFAULT_CONFIG, max_keys: int = 100_000):
+        self.config = config
+        self.max_keys = max_keys
+        self.allowed = 0
+        self.refused = 0
+        self._clients: 'OrderedDict[str, _ClientState]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _client(self, key: str, now: float, burst: float) -> _ClientState:
+        state = self._clients.get(key)
+        if state is None:
+            state = self._clients[key] = _ClientState(burst, now)
+            while len(self._clients) > self.max_keys:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(key)
+        return state
+
+    def _observe_gap(self, state: _ClientState, gap: float):
+        # Exponentially weighted mean and variance of the gaps between requests
+        alpha = self.config.gap_smoothing
+        if state.requests == 2:  # first gap
+            state.gap_mean = gap
+            return
+        delta = gap - state.gap_mean
+        state.gap_mean += alpha * delta
+        state.gap_variance = (1 - alpha) * (state.gap_variance + alpha * delta * delta)
+
+    def _looks_scripted(self, state: _ClientState) -> bool:
+        c = self.config
+        if state.requests < c.regular_min_requests or state.gap_mean <= 0 or state.gap_mean > c.regular_max_gap:
+            return False
+        return math.sqrt(state.gap_variance) / state.gap_mean < c.regular_max_variation
+
+    def check_client(self, address: str, fingerprint: str, cost: float = 1.0, now: float = None) -> Decision:
+        """Check the per-address bucket, then the per-fingerprint one"""
+        now = time.monotonic() if now is None else now
+        decision = self.check(f"address:{address}", cost, now, scale=self.config.address_scale)
+        if not decision.allowed:
+            return decision
+        return self.check(fingerprint, cost, now)
+
+    def check(self, key: str, cost: float = 1.0, now: float = None, scale: float = 1.0) -> Decision:
+        """Record a request of the given cost and decide whether to serve it
+
+        ``scale`` multiplies the bucket's rate and burst for this key.
+        """
+        c = self.config
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._client(key, now, c.burst * scale)
+            elapsed = max(0.0, now - state.updated)
+            state.updated = now
+            state.requests += 1
+            if state.requests > 1:
+                self._observe_gap(state, elapsed)
+
+            if now < state.blocked_until:
+                self.refused += 1
+                return Decision(False, 'regular', state.blocked_until - now)
+            if self._looks_scripted(state):
+                state.blocked_until = now + c.block_seconds
+                self.refused += 1
+                return Decision(False, 'regular', c.block_seconds)
+
+            rate, burst = c.rate * scale, c.burst * scale
+            state.tokens = min(burst, state.tokens + max(0.0, now - state.refilled) * rate)
+            state.refilled = now
+            if state.tokens < cost:
+                self.refused += 1
+                return Decision(False, 'rate', (cost - state.tokens) / rate)
+            state.tokens -= cost
+            self.allowed += 1
+            return ALLOWED
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def stats(self) -> Dict[str, int]:
+        """Return allowed/refused counters and the number of tracked clients"""
+        with self._lock:
+            return {'allowed': self.allowed, 'refused': self.refused, 'clients': len(self._clients)}
@@ -0,0 +1,439 @@
+"""Product catalog backends
+
+A catalog maps product ids to product dicts shaped like the entries of
+MOCK_PRODUCTS. ``DictCatalog`` wraps an in-memory dict, ``MmapCatalog`` reads a
+compact columnar file that worker processes share through the page cache.
+
+Build a catalog file from a JSON, JSONL or CSV dump with:
+
+    python -m describo.catalog products.json products.cat
+
+``merge_catalogs`` concatenates catalog files without decoding products;
+describo.ingest uses it to join shards built in parallel.
+"""
+import abc
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import sys
+import uuid
+from array import array
+from bisect import bisect_left
+from typing import BinaryIO, Callable, Dict, Any, Iterable, Iterator, List, Sequence, Tuple
+
+MAGIC = b'DSCAT\x00\x01\x00'
+STRING_FIELDS = ('id', 'name', 'description', 'price', 'availability', 'image_url')
+CSV_KEYWORD_SEPARATOR = '|'
+# Array entries copied at a time while merging catalog files
+MERGE_BLOCK = 1 << 16
+
+
+class Catalog(abc.ABC):
+    """Read interface shared by all catalog backends"""
+
+    @property
+    @abc.abstractmethod
+    def version(self) -> str:
+        """Identifier that changes whenever the catalog contents change"""
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def __iter__(self) -> Iterator[str]:
+        pass
+
+    @abc.abstractmethod
+    def __contains__(self, product_id: str) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def __getitem__(self, product_id: str) -> Dict[str, Any]:
+        pass
+
+    def get(self, product_id: str, default=None):
+        try:
+            return self[product_id]
+        except KeyError:
+            return default
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for product_id in self:
+            yield product_id, self[product_id]
+
+
+def _product_hash(product_id: str, product: Dict[str, Any]) -> int:
+    payload = json.dumps([product_id, product], sort_keys=True, default=str).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), 'little')
+
+
+class DictCatalog(Catalog):
+    """Catalog backed by a product_id -> product dict"""
+
+    def __init__(self, products: Dict[str, Dict[str, Any]]):
+        self._products = products
+        self._fingerprint = None
+
+    @property
+    def version(self) -> str:
+        # XOR of per-product hashes: identical contents give the same version in
+        # every process, and add/remove update it without rehashing the catalog
+        if self._fingerprint is None:
+            self._fingerprint = 0
+            for product_id, product in self._products.items():
+                self._fingerprint ^= _product_hash(product_id, product)
+        return f"dict-{self._fingerprint:016x}"
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._products)
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self._products
+
+    def __getitem__(self, product_id: str) -> Dict[str, Any]:
+        return self._products[product_id]
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return iter(self._products.items())
+
+    def add_product(self, product_id: str, product: Dict[str, Any]):
+        """Insert or replace a product"""
+        self.remove_product(product_id)
+        self._products[product_id] = product
+        if self._fingerprint is not None:
+            self._fingerprint ^= _product_hash(product_id, product)
+
+    def remove_product(self, product_id: str):
+        """Delete a product if present"""
+        product = self._products.pop(product_id, None)
+        if product is not None and self._fingerprint is not None:
+            self._fingerprint ^= _product_hash(product_id, product)
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+# (name, length in bytes, function writing exactly that many bytes)
+Section = Tuple[str, int, Callable[[BinaryIO], None]]
+
+
+def _write_catalog(path: str, count: int, sections: Sequence[Section]):
+    """Write header and sections to a temporary file, then move it over path"""
+    layout = {}
+    offset = 0
+    for name, length, _ in sections:
+        layout[name] = [offset, length]
+        offset = _align(offset + length)
+
+    header = json.dumps({
+        'count': count,
+        'build_id': uuid.uuid4().hex,
+        'byteorder': sys.byteorder,
+        'sections': layout,
+    }).encode('utf-8')
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    temp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for name, _, write in sections:
+                f.seek(data_start + layout[name][0])
+                write(f)
+            f.truncate(data_start + offset)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+class _StringColumn:
+    """Concatenated UTF-8 blob with an offsets array, used while building"""
+
+    def __init__(self):
+        self.offsets = array('Q', [0])
+        self.data = bytearray()
+
+    def append(self, value: str):
+        self.data += value.encode('utf-8')
+        self.offsets.append(len(self.data))
+
+
+class CatalogWriter:
+    """Accumulate products column by column and write a catalog file"""
+
+    def __init__(self):
+        self._strings = {field: _StringColumn() for field in STRING_FIELDS}
+        self._ratings = array('d')
+        self._keyword_items = array('Q', [0])  # product row -> range in _keywords
+        self._keywords = _StringColumn()
+
+    def __len__(self) -> int:
+        return len(self._ratings)
+
+    def add(self, product_id: str, product: Dict[str, Any]):
+        values = dict(product, id=product_id)
+        for field in STRING_FIELDS:
+            self._strings[field].append(str(values.get(field, '')))
+        self._ratings.append(float(product.get('rating', 0.0)))
+        for keyword in product.get('keywords', []):
+            self._keywords.append(keyword)
+        self._keyword_items.append(len(self._keywords.offsets) - 1)
+
+    def _payloads(self) -> List[Tuple[str, bytes]]:
+        ids = self._strings['id']
+        id_order = sorted(range(len(self)), key=lambda row: ids.data[ids.offsets[row]:ids.offsets[row + 1]])
+        sections = []
+        for field in STRING_FIELDS:
+            sections.append((f'{field}.offsets', self._strings[field].offsets.tobytes()))
+            sections.append((f'{field}.data', bytes(self._strings[field].data)))
+        sections.append(('rating', self._ratings.tobytes()))
+        sections.append(('keywords.items', self._keyword_items.tobytes()))
+        sections.append(('keywords.offsets', self._keywords.offsets.tobytes()))
+        sections.append(('keywords.data', bytes(self._keywords.data)))
+        sections.append(('id_order', array('Q', id_order).tobytes()))
+        return sections
+
+    def write(self, path: str):
+        """Write the catalog file atomically"""
+        sections = [(name, len(payload), lambda f, payload=payload: f.write(payload))
+                    for name, payload in self._payloads()]
+        _write_catalog(path, len(self), sections)
+
+
+class MmapCatalog(Catalog):
+    """Catalog read from a memory-mapped columnar file built by CatalogWriter"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buffer = memoryview(self._mmap)
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a Describo catalog file")
+        header_length = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 8], 'little')
+        header_start = len(MAGIC) + 8
+        header = json.loads(bytes(buffer[header_start:header_start + header_length]))
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was built on a {header['byteorder']}-endian machine")
+
+        data_start = _align(header_start + header_length)
+        self._count = header['count']
+        self._build_id = header['build_id']
+
+        def section(name: str, fmt: str = 'B') -> memoryview:
+            start, length = header['sections'][name]
+            view = buffer[data_start + start:data_start + start + length]
+            return view.cast(fmt) if fmt != 'B' else view
+
+        self._strings = {
+            field: (section(f'{field}.offsets', 'Q'), section(f'{field}.data'))
+            for field in STRING_FIELDS
+        }
+        self._ratings = section('rating', 'd')
+        self._keyword_items = section('keywords.items', 'Q')
+        self._keywords = (section('keywords.offsets', 'Q'), section('keywords.data'))
+        self._id_order = section('id_order', 'Q')
+
+    @property
+    def version(self) -> str:
+        return f"mmap-{self._build_id}"
+
+    @staticmethod
+    def _string(column: Tuple[memoryview, memoryview], row: int) -> str:
+        offsets, data = column
+        return str(data[offsets[row]:offsets[row + 1]], 'utf-8')
+
+    def _id_bytes(self, row: int) -> bytes:
+        offsets, data = self._strings['id']
+        return data[offsets[row]:offsets[row + 1]].tobytes()
+
+    def _row(self, product_id: str) -> int:
+        # id_order lists rows sorted by id, so lookups are a binary search over the mmap
+        target = product_id.encode('utf-8')
+        position = bisect_left(range(self._count), target,
+                               key=lambda i: self._id_bytes(self._id_order[i]))
+        if position < self._count:
+            row = self._id_order[position]
+            if self._id_bytes(row) == target:
+                return row
+        raise KeyError(product_id)
+
+    def product_at(self, row: int) -> Dict[str, Any]:
+        """Decode the product stored at a row"""
+        product = {field: self._string(self._strings[field], row) for field in STRING_FIELDS[1:]}
+        product['rating'] = self._ratings[row]
+        product['keywords'] = [
+            self._string(self._keywords, k)
+            for k in range(self._keyword_items[row], self._keyword_items[row + 1])
+        ]
+        return product
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        for row in range(self._count):
+            yield self._string(self._strings['id'], row)
+
+    def __contains__(self, product_id: str) -> bool:
+        try:
+            self._row(product_id)
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, product_id: str) -> Dict[str, Any]:
+        return self.product_at(self._row(product_id))
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for row in range(self._count):
+            yield self._string(self._strings['id'], row), self.product_at(row)
+
+
+def _write_rebased(f: BinaryIO, columns: Sequence[memoryview]):
+    """Write offset arrays end to end, shifting each by the last value of the ones before"""
+    f.write(array('Q', [0]).tobytes())
+    base = 0
+    for column in columns:
+        for start in range(1, len(column), MERGE_BLOCK):
+            block = column[start:start + MERGE_BLOCK]
+            if base:
+                f.write(array('Q', [value + base for value in block]).tobytes())
+            else:
+                f.write(block.tobytes())
+        base += column[len(column) - 1]
+
+
+def _write_id_order(f: BinaryIO, shards: Sequence['MmapCatalog']):
+    """Merge the shards' sorted id orders into one over global rows"""
+    def rows(shard: 'MmapCatalog', row_base: int):
+        for position in range(len(shard)):
+            row = shard._id_order[position]
+            yield shard._id_bytes(row), row_base + row
+
+    streams, row_base = [], 0
+    for shard in shards:
+        streams.append(rows(shard, row_base))
+        row_base += len(shard)
+
+    block, previous = array('Q'), None
+    for product_id, row in heapq.merge(*streams):
+        if product_id == previous:
+            raise ValueError(f"Product id {product_id.decode('utf-8')!r} appears in more than one shard")
+        previous = product_id
+        block.append(row)
+        if len(block) >= MERGE_BLOCK:
+            f.write(block.tobytes())
+            del block[:]
+    f.write(block.tobytes())
+
+
+def merge_catalogs(shard_paths: Sequence[str], path: str) -> int:
+    """Concatenate catalog files into one at path, returning the product count
+
+    Columns are copied block by block, so memory use does not grow with the
+    catalog. Product ids must be unique across the shards.
+    """
+    shards = [MmapCatalog(shard_path) for shard_path in shard_paths]
+    count = sum(len(shard) for shard in shards)
+
+    def copy(views: Sequence[memoryview]) -> Callable[[BinaryIO], None]:
+        def write(f: BinaryIO):
+            for view in views:
+                f.write(view)
+        return write
+
+    def rebase(columns: Sequence[memoryview]) -> Callable[[BinaryIO], None]:
+        return lambda f: _write_rebased(f, columns)
+
+    offsets_length = (count + 1) * 8
+    sections: List[Section] = []
+    for field in STRING_FIELDS:
+        offsets = [shard._strings[field][0] for shard in shards]
+        data = [shard._strings[field][1] for shard in shards]
+        sections.append((f'{field}.offsets', offsets_length, rebase(offsets)))
+        sections.append((f'{field}.data', sum(len(view) for view in data), copy(data)))
+    sections.append(('rating', count * 8, copy([shard._ratings for shard in shards])))
+    sections.append(('keywords.items', offsets_length, rebase([shard._keyword_items for shard in shards])))
+    keyword_offsets = [shard._keywords[0] for shard in shards]
+    keyword_data = [shard._keywords[1] for shard in shards]
+    sections.append(('keywords.offsets', (sum(len(view) - 1 for view in keyword_offsets) + 1) * 8,
+                     rebase(keyword_offsets)))
+    sections.append(('keywords.data', sum(len(view) for view in keyword_data), copy(keyword_data)))
+    sections.append(('id_order', count * 8, lambda f: _write_id_order(f, shards)))
+
+    _write_catalog(path, count, sections)
+    return count
+
+
+def read_dump(path: str) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    """Yield (product_id, product) pairs from a JSON, JSONL or CSV product dump
+
+    JSON dumps are either an object shaped like MOCK_PRODUCTS or a list of
+    products carrying an ``id`` field, and are loaded whole. JSONL dumps hold
+    one product with an ``id`` field per line. CSV dumps need an ``id``
+    column and separate keywords with ``|``. JSONL and CSV are streamed.
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                product_id = row.pop('id')
+                keywords = row.get('keywords') or ''
+                row['keywords'] = [k.strip() for k in keywords.split(CSV_KEYWORD_SEPARATOR) if k.strip()]
+                row['rating'] = float(row.get('rating') or 0)
+                yield product_id, row
+        return
+
+    if path.lower().endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    product = json.loads(line)
+                    yield str(product.pop('id')), product
+        return
+
+    with open(path, encoding='utf-8') as f:
+        dump = json.load(f)
+    if isinstance(dump, dict):
+        yield from dump.items()
+    else:
+        for product in dump:
+            product = dict(product)
+            yield str(product.pop('id')), product
+
+
+def build_catalog(dump_path: str, catalog_path: str) -> int:
+    """Convert a JSON/CSV dump into a catalog file, returning the product count"""
+    writer = CatalogWriter()
+    for product_id, product in read_dump(dump_path):
+        writer.add(product_id, product)
+    writer.write(catalog_path)
+    return len(writer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a memory-mapped Describo catalog file")
+    parser.add_argument('dump', help="JSON, JSONL or CSV product dump")
+    parser.add_argument('output', help="catalog file to write")
+    args = parser.parse_args()
+
+    count = build_catalog(args.dump, args.output)
+    print(f"Wrote {count} products to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""Headless search core: product catalog, query analysis and search
+
+Imports no UI, audio or network libraries, so batch jobs, benchmarks and
+other services can use the same search as the Streamlit app. NumPy is only
+imported when the first search builds the vectorized scorer. Trust scoring
+lives in describo.behavior.
+
+Searches return a ResultCursor (describo.results) holding ranked product ids
+and scores; product details are read from the catalog for the page shown.
+
+Keywords missing from the catalog vocabulary are corrected by the
+typo-tolerant tier in describo.fuzzy before scoring. Products are scored
+with the fixed 3/2/1 rules by default, or with BM25 or TF-IDF
+(describo.ranking) when ``ranking`` selects them. In hybrid mode, top-k
+searches also retrieve products by semantic similarity to the raw query
+(describo.semantic) and merge both rankings.
+"""
+import os
+import threading
+from typing import List, Dict, Any, Tuple
+
+from describo.analyzer import QueryAnalyzer
+from describo.catalog import Catalog, DictCatalog, MmapCatalog
+from describo.fuzzy import FuzzyMatcher
+from describo.metrics import timed
+from describo.result_cache import ResultCache
+from describo.results import ResultCursor
+
+# Number of search results shown on the page
+TOP_RESULTS = 5
+# Ranked products kept per query for paging
+MAX_RESULTS = 1000
+# Candidates taken from each ranking before hybrid fusion
+HYBRID_CANDIDATES = 50
+# Longest time spent correcting misspelled keywords per query
+FUZZY_BUDGET = 0.002
+# Ranking engines: the fixed 3/2/1 weights, or relevance scoring from describo.ranking
+RANKINGS = ('rules', 'bm25', 'tfidf')
+
+# Mock product database - in a real app, this would be a proper database
+MOCK_PRODUCTS = {
+    "camping_cot": {
+        "name": "Portable Camping Cot",
+        "description": "Lightweight foldable sleeping cot for camping",
+        "price": "$89.99",
+        "rating": 4.3,
+        "availability": "In Stock",
+        "image_url": "https://via.placeholder.com/300x200?text=Camping+Cot",
+        "keywords": ["foldable", "sleep", "camping", "cot", "portable", "bed", "outdoor"]
+    },
+    "water_purifier": {
+        "name": "Portable Water Purifier Bottle",
+        "description": "Water filter bottle for hiking and camping",
+        "price": "$34.99",
+        "rating": 4.7,
+        "availability": "In Stock",
+        "image_url": "https://via.placeholder.com/300x200?text=Water+Filter",
+        "keywords": ["water", "filter", "purifier", "bottle", "hiking", "camping", "portable", "drink"]
+    },
+    "headlamp": {
+        "name": "LED Headlamp",
+        "description": "Rechargeable LED headlamp for outdoor activities",
+        "price": "$24.99",
+        "rating": 4.5,
+        "availability": "In Stock",
+        "image_url": "https://via.placeholder.com/300x200?text=LED+Headlamp",
+        "keywords": ["light", "head", "camping", "hands-free", "led", "flashlight", "outdoor"]
+    },
+    "camping_chair": {
+        "name": "Folding Camping Chair",
+        "description": "Lightweight portable chair for outdoor use",
+        "price": "$45.99",
+        "rating": 4.2,
+        "availability": "In Stock",
+        "image_url": "https://via.placeholder.com/300x200?text=Camping+Chair",
+        "keywords": ["chair", "folding", "portable", "camping", "outdoor", "seat", "lightweight"]
+    },
+    "tent": {
+        "name": "4-Person Camping Tent",
+        "description": "Waterproof dome tent for family camping",
+        "price": "$129.99",
+        "rating": 4.6,
+        "availability": "In Stock",
+        "image_url": "https://via.placeholder.com/300x200?text=Camping+Tent",
+        "keywords": ["tent", "camping", "shelter", "waterproof", "family", "dome", "outdoor"]
+    },
+    "sleeping_bag": {
+        "name": "Mummy Sleeping Bag",
+        "description": "Warm sleeping bag for cold weather camping",
+        "price": "$79.99",
+        "rating": 4.4,
+        "availability": "In Stock",
+        "image_url": "https://via.placeholder.com/300x200?text=Sleeping+Bag",
+        "keywords": ["sleeping", "bag", "warm", "camping", "cold", "weather", "mummy", "outdoor"]
+    }
+}
+
+
+class SearchService:
+    """Query analysis and product search over one catalog
+
+    The vectorized scorer, the typo index and, with ``hybrid``, the semantic
+    index are built on first use and shared by all callers; rankings are kept
+    in a ResultCache.
+    """
+
+    def __init__(self, catalog: Catalog, analyzer: QueryAnalyzer = None, result_cache: ResultCache = None,
+                 hybrid: bool = False, semantic_index_path: str = None, semantic_weight: float = 0.5,
+                 fuzzy: bool = True, fuzzy_budget: float = FUZZY_BUDGET, ranking: str = 'rules'):
+        if ranking not in RANKINGS:
+            raise ValueError(f"Unknown ranking {ranking!r}, expected one of {RANKINGS}")
+        self.catalog = catalog
+        self.ranking = ranking
+        self.analyzer = analyzer or QueryAnalyzer()
+        self.result_cache = result_cache or ResultCache()
+        self.fuzzy = fuzzy
+        self.fuzzy_budget = fuzzy_budget
+        self.hybrid = hybrid
+        self.semantic_index_path = semantic_index_path
+        self.semantic_weight = semantic_weight
+        self._scorer = None
+        self._semantic = None
+        self._fuzzy_matcher = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'SearchService':
+        """Configure from the catalog_path, stop_words_path, synonyms_path and result_cache_dir variables"""
+        # Point catalog_path at a file built with `python -m describo.catalog` to
+        # serve a large catalog; worker processes share its pages through mmap
+        catalog_path = os.getenv('catalog_path')
+        catalog = MmapCatalog(catalog_path) if catalog_path else DictCatalog(MOCK_PRODUCTS)
+        # stop_words_path (one word per line) and synonyms_path (JSON) override the defaults
+        analyzer = QueryAnalyzer.from_files(os.getenv('stop_words_path'), os.getenv('synonyms_path'))
+        # Set result_cache_dir to also share results between worker processes
+        result_cache = ResultCache(directory=os.getenv('result_cache_dir'))
+        # search_mode=hybrid adds semantic matching, from a prebuilt index at
+        # semantic_index_path or from one built in memory at first search
+        return cls(catalog, analyzer, result_cache,
+                   hybrid=os.getenv('search_mode', 'keyword').lower() == 'hybrid',
+                   semantic_index_path=os.getenv('semantic_index_path'),
+                   semantic_weight=float(os.getenv('semantic_weight', 0.5)),
+                   fuzzy=os.getenv('fuzzy_matching', 'on').lower() != 'off',
+                   ranking=os.getenv('ranking', 'rules').lower())
+
+    @property
+    def scorer(self):
+        """Vectorized top-k scorer for the ranking engine; imports NumPy on first use"""
+        with self._lock:
+            if self._scorer is None:
+                if self.ranking == 'rules':
+                    from describo.scoring import VectorScorer
+                    self._scorer = VectorScorer(self.catalog)
+                else:
+                    from describo.ranking import RelevanceScorer
+                    self._scorer = RelevanceScorer(self.catalog, self.ranking)
+            return self._scorer
+
+    @property
+    def semantic(self):
+        """SemanticIndex for hybrid search; loads NumPy and the index on first use
+
+        An index older than the catalog is rebuilt in memory, so products
+        added or changed since are found too.
+        """
+        with self._lock:
+            index = self._semantic
+            if index is None or index.catalog_version != self.catalog.version:
+                from describo.semantic import SemanticIndex
+                if index is None and self.semantic_index_path:
+                    index = SemanticIndex.load(self.semantic_index_path)
+                    if index.catalog_version != self.catalog.version:
+                        raise ValueError(f"Semantic index {self.semantic_index_path} was built for another catalog")
+                else:
+                    index = SemanticIndex.from_catalog(self.catalog)
+                self._semantic = index
+            return index
+
+    @property
+    def fuzzy_matcher(self) -> FuzzyMatcher:
+        """Typo index over the catalog vocabulary, rebuilt when the catalog changes"""
+        with self._lock:
+            matcher = self._fuzzy_matcher
+            if matcher is None or matcher.catalog_version != self.catalog.version:
+                self._fuzzy_matcher = FuzzyMatcher.from_catalog(self.catalog)
+            return self._fuzzy_matcher
+
+    def warm(self) -> list:
+        """Build the indexes searches will use now instead of on the first request, and return them"""
+        indexes = [self.scorer]
+        if self.fuzzy:
+            indexes.append(self.fuzzy_matcher)
+        if self.hybrid:
+            indexes.append(self.semantic)
+        return indexes
+
+    def _current_indexes(self) -> Tuple[Any, FuzzyMatcher]:
+        # Indexes already built for the current catalog; stale or unbuilt ones rebuild on use
+        version = self.catalog.version
+        scorer = self._scorer if getattr(self._scorer, 'version', None) == version else None
+        matcher = self._fuzzy_matcher
+        matcher = matcher if matcher is not None and matcher.catalog_version == version else None
+        return (scorer if hasattr(scorer, 'add_product') else None), matcher
+
+    def add_product(self, product_id: str, product: Dict[str, Any]):
+        """Insert or replace a product, updating the built indexes in place
+
+        The catalog must support add_product (DictCatalog). BM25/TF-IDF
+        statistics and the semantic index are rebuilt at the next search.
+        """
+        with self._lock:
+            scorer, matcher = self._current_indexes()
+            self.catalog.add_product(product_id, product)
+            if scorer is not None:
+                scorer.add_product(product_id, product)
+            if matcher is not None:
+                matcher.add_product(product)
+                matcher.catalog_version = self.catalog.version
+
+    def remove_product(self, product_id: str):
+        """Delete a product, updating the built indexes in place"""
+        with self._lock:
+            scorer, matcher = self._current_indexes()
+            self.catalog.remove_product(product_id)
+            if scorer is not None:
+                scorer.remove_product(product_id)
+            if matcher is not None:
+                # The product's words stay in the typo vocabulary until the next rebuild
+                matcher.catalog_version = self.catalog.version
+
+    def analyze(self, description: str) -> List[str]:
+        return self.analyzer.analyze(description)
+
+    def _rank(self, keywords: List[str], query: str, depth: int, hybrid: bool) -> Tuple[list, list, list, int]:
+        """Ranked (ids, scores, similarities or None, total matches) for the expanded keywords"""
+        scorer = self.scorer
+        scores = scorer.scores(keywords)
+        if not hybrid:
+            rows = scorer.best_rows(scores, depth)
+            total = len(rows) if depth is None else int((scores > 0).sum())
+            return [scorer.product_ids[row] for row in rows], scores[rows].round(3).tolist(), None, total
+
+        from describo.semantic import fuse_rankings
+        candidates = max(HYBRID_CANDIDATES, depth)
+        keyword_hits = [(scorer.product_ids[row], scores[row].round(3).item())
+                        for row in scorer.best_rows(scores, candidates)]
+        semantic_hits = self.semantic.search(query, candidates)
+        keyword_scores, similarities = dict(keyword_hits), dict(semantic_hits)
+        fused = fuse_rankings(keyword_hits, semantic_hits, self.semantic_weight)
+        ids = [product_id for product_id, _ in fused[:depth]]
+        return (ids, [keyword_scores.get(product_id, 0) for product_id in ids],
+                [similarities.get(product_id, 0.0) for product_id in ids], len(fused))
+
+    def cursor(self, keywords: List[str], query: str = None, depth: int = MAX_RESULTS) -> ResultCursor:
+        """Rank up to depth products (all matches if None); hybrid mode also matches the raw query text"""
+        catalog = self.catalog
+        hybrid = self.hybrid and depth is not None
+        params = {'depth': depth, 'ranking': self.ranking}
+        if hybrid:
+            query = query or " ".join(keywords)
+            params.update(query=query, semantic_weight=self.semantic_weight)
+        ranking = self.result_cache.get(keywords, catalog.version, **params)
+        if ranking is None:
+            expanded = self.fuzzy_matcher.expand(keywords, self.fuzzy_budget) if self.fuzzy else keywords
+            ranking = self._rank(expanded, query, depth, hybrid)
+            # Only ids and scores are cached; product details stay in the catalog
+            self.result_cache.put(keywords, catalog.version, ranking, **params)
+        ids, scores, similarities, total = ranking
+        return ResultCursor(catalog, ids, scores, similarities, total)
+
+    def search(self, keywords: List[str], top_k: int = None, query: str = None) -> List[Dict[str, Any]]:
+        """Scored copies of the top_k best products (all matches if None)"""
+        if top_k is not None and top_k <= 0:
+            return []
+        return [hit.to_dict() for hit in self.cursor(keywords, query, depth=top_k)]
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_search_service() -> SearchService:
+    """Process-wide SearchService configured from the environment"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = SearchService.from_env()
+        return _service
+
+
+@timed('analyze')
+def analyze_text_description(description: str) -> List[str]:
+    """Extract keywords from text description using simple NLP"""
+    return get_search_service().analyze(description)
+
+
+@timed('search')
+def search_cursor(keywords: List[str], query: str = None, depth: int = MAX_RESULTS) -> ResultCursor:
+    """Rank products for keywords, fetching details page by page"""
+    return get_search_service().cursor(keywords, query, depth)
+
+
+@timed('search')
+def search_products(keywords: List[str], top_k: int = None, query: str = None) -> List[Dict[str, Any]]:
+    """Search products based on keywords"""
+    return get_search_service().search(keywords, top_k, query)
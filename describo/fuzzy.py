@@ -0,0 +1,198 @@
+"""Typo-tolerant keyword matching against the catalog vocabulary
+
+``FuzzyMatcher`` precomputes a SymSpell-style deletion index: every
+vocabulary word is stored under each string obtained by deleting up to
+``max_distance`` characters from its prefix. A misspelled query word
+generates its own deletions, and only the words sharing one of them are
+checked with a bounded edit distance, so no scan over the vocabulary is
+needed. Words are also folded to a light stem ("cots" -> "cot",
+"sleeping" -> "sleep"), and adjacent words are tried joined ("hed lamp" ->
+"headlamp").
+
+Corrections are always vocabulary words of at least ``MIN_CORRECTION_LENGTH``
+letters, never stop words, and only words of ``LONG_WORD`` letters or more
+may be more than one edit away from them.
+
+Only words that match nothing in the catalog, neither a vocabulary word nor
+a substring of one, are corrected or joined, so queries without typos rank
+exactly as they would without the matcher.
+"""
+import re
+import time
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from describo.analyzer import DEFAULT_STOP_WORDS
+from describo.catalog import Catalog
+from describo.search_index import SubstringIndex
+
+WORD = re.compile(r'[a-z]+')
+# Shorter vocabulary words are matched exactly but never offered as corrections
+MIN_CORRECTION_LENGTH = 4
+# Query words this long may be up to max_distance edits from their correction, shorter ones one edit
+LONG_WORD = 8
+# Suffixes removed by fold_word, longest first, with the shortest stem allowed
+_SUFFIXES = (('ies', 'y', 3), ('sses', 'ss', 2), ('ing', '', 3), ('es', '', 3), ('ed', '', 3), ('s', '', 3))
+
+
+def fold_word(word: str) -> str:
+    """Reduce plurals and common verb endings to a shared stem"""
+    for suffix, replacement, min_stem in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= min_stem:
+            if suffix == 's' and word[-2] in 'su':  # "glass", "cactus"
+                return word
+            if suffix == 'es' and word[-3] not in 'sxz' and not word.endswith(('ches', 'shes')):
+                continue  # "bottles" -> "bottle" via the plain 's' rule
+            stem = word[:-len(suffix)] + replacement
+            # "sleeping" -> "sleep", but "running" -> "run"
+            if suffix in ('ing', 'ed') and len(stem) > 3 and stem[-1] == stem[-2] and stem[-1] not in 'lsz':
+                stem = stem[:-1]
+            return stem
+    return word
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _deletions(word: str, distance: int) -> Set[str]:
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w)) if len(w) > 1}
+        results |= frontier
+    return results
+
+
+def product_words(product: Dict[str, Any], stop_words: Iterable[str] = DEFAULT_STOP_WORDS) -> Set[str]:
+    """Words of a product's name, description and keywords, without model numbers or stop words"""
+    text = " ".join([product.get('name', ''), product.get('description', '')] + list(product.get('keywords', ())))
+    return {word for word in WORD.findall(text.lower()) if len(word) >= 3 and word not in stop_words}
+
+
+class FuzzyMatcher:
+    """Corrects query words to catalog vocabulary words within a bounded edit distance"""
+
+    def __init__(self, vocabulary: Iterable[str], max_distance: int = 2, prefix_length: int = 7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.vocabulary: Set[str] = set()
+        self.catalog_version = None  # set by from_catalog
+        self._substrings = SubstringIndex()
+        self.folded: Dict[str, str] = {}  # stem -> a vocabulary word with that stem
+        self._deletes: Dict[str, List[str]] = {}
+        for word in vocabulary:
+            self.add(word)
+
+    @classmethod
+    def from_catalog(cls, catalog: Catalog, **options) -> 'FuzzyMatcher':
+        """Vocabulary of product keywords and name/description words, without model numbers"""
+        vocabulary = set()
+        for _, product in catalog.items():
+            vocabulary.update(product_words(product))
+        matcher = cls(vocabulary, **options)
+        matcher.catalog_version = catalog.version
+        return matcher
+
+    def add_product(self, product: Dict[str, Any]):
+        """Add the words of a product added to the catalog"""
+        for word in product_words(product):
+            self.add(word)
+
+    def add(self, word: str):
+        if word in self.vocabulary:
+            return
+        self.vocabulary.add(word)
+        self._substrings.add(word, word)
+        if len(word) < MIN_CORRECTION_LENGTH:
+            return
+        self.folded.setdefault(fold_word(word), word)
+        for deletion in _deletions(word[:self.prefix_length], self.max_distance):
+            self._deletes.setdefault(deletion, []).append(word)
+
+    def known(self, word: str) -> bool:
+        """Whether word already matches the catalog, exactly or inside a longer word"""
+        return word in self.vocabulary or bool(self._substrings.lookup(word))
+
+    def _allowed_distance(self, word: str) -> int:
+        # Short words tolerate fewer edits, or almost anything would match them
+        if len(word) <= 3:
+            return 0
+        if len(word) < LONG_WORD:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    def correct(self, word: str, deadline: float = None) -> List[Tuple[str, int]]:
+        """Vocabulary words closest to word as (word, distance) pairs, nearest first"""
+        if word in self.vocabulary:
+            return [(word, 0)]
+        stem = fold_word(word)
+        if stem in self.folded:
+            return [(self.folded[stem], 0)]
+        limit = self._allowed_distance(word)
+        if not limit:
+            return []
+
+        # Only the word itself is compared: a stem one edit from another
+        # word ("nights" -> "night" -> "light") is usually a different word
+        best: Dict[str, int] = {}
+        for deletion in _deletions(word[:self.prefix_length], limit):
+            for term in self._deletes.get(deletion, ()):
+                if term in best:
+                    continue
+                if deadline is not None and time.perf_counter() > deadline:
+                    break
+                distance = edit_distance(word, term, limit)
+                if distance <= limit:
+                    best[term] = distance
+        if not best:
+            return []
+        nearest = min(best.values())
+        return sorted((term, d) for term, d in best.items() if d == nearest)
+
+    def expand(self, keywords: List[str], budget: float = 0.002) -> List[str]:
+        """Append vocabulary corrections of keywords that match nothing, spending at most budget seconds"""
+        deadline = time.perf_counter() + budget
+        expanded = list(keywords)
+        seen = set(keywords)
+
+        def add(term: str):
+            if term not in seen:
+                seen.add(term)
+                expanded.append(term)
+
+        unknown = {word for word in keywords if word.isalpha() and not self.known(word)}
+        if not unknown:
+            return expanded
+
+        # Words split apart by the transcript, like "hed lamp"
+        for first, second in zip(keywords, keywords[1:]):
+            if first in unknown or second in unknown:
+                for term, _ in self.correct(first + second, deadline):
+                    add(term)
+
+        for word in keywords:
+            if time.perf_counter() > deadline:
+                break
+            if word not in unknown:
+                continue
+            for term, _ in self.correct(word, deadline):
+                add(term)
+        return expanded
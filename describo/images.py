@@ -0,0 +1,332 @@
+"""Product image proxy with a thumbnail cache
+
+``ImageProxy.thumbnail(url)`` fetches a remote image once through a pooled
+``requests`` session, shrinks it with PIL and keeps the encoded thumbnail in
+a ``ThumbnailCache``. Entries older than ``max_age`` are revalidated with
+``If-None-Match``/``If-Modified-Since``, so an unchanged image costs a 304
+instead of a full download. When the origin cannot be reached, a stale
+thumbnail is served rather than none, and a failed URL is not tried again
+for ``failure_ttl`` seconds. ``prefetch`` fetches the thumbnails of a whole
+results page on a thread pool, so a page costs one round trip instead of one
+per image, and can warm the next page in the background. ``requests`` and
+PIL are imported on first use. Any URL works, so a local ``http.server`` can stand in for the
+image host.
+"""
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from describo.metrics import timed
+
+# Width the results list shows product images at
+THUMBNAIL_WIDTH = 150
+# Seconds a cached thumbnail is served before the origin is asked again
+MAX_AGE = 24 * 60 * 60
+# Downloads larger than this are not thumbnailed
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+# Seconds a URL that could not be fetched is left alone before trying again
+FAILURE_TTL = 60.0
+# Failed URLs remembered at most
+MAX_FAILURES = 10_000
+# Disk writes between rescans of the shared cache directory
+DISK_RESCAN_INTERVAL = 64
+
+
+class Thumbnail(NamedTuple):
+    data: bytes
+    content_type: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    def encode(self) -> bytes:
+        """Serialize as a length-prefixed JSON header followed by the image bytes"""
+        header = json.dumps({'content_type': self.content_type, 'etag': self.etag,
+                             'last_modified': self.last_modified, 'fetched_at': self.fetched_at}).encode('utf-8')
+        return struct.pack('<I', len(header)) + header + self.data
+
+    @classmethod
+    def decode(cls, payload: bytes) -> 'Thumbnail':
+        (header_length,) = struct.unpack_from('<I', payload)
+        header = json.loads(payload[4:4 + header_length])
+        return cls(payload[4 + header_length:], header['content_type'], header['etag'],
+                   header['last_modified'], header['fetched_at'])
+
+
+def make_thumbnail(image_bytes: bytes, width: int = THUMBNAIL_WIDTH) -> Thumbnail:
+    """Shrink an image to at most width pixels wide; PNG if it has transparency, JPEG otherwise"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.draft('RGB', (width, width * 4))  # lets JPEG decode at a reduced scale
+        image.thumbnail((width, image.height), Image.LANCZOS)  # keeps the aspect ratio, never enlarges
+        out = io.BytesIO()
+        if image.mode in ('RGBA', 'LA', 'P') and (image.mode != 'P' or 'transparency' in image.info):
+            image.save(out, format='PNG', optimize=True)
+            content_type = 'image/png'
+        else:
+            image.convert('RGB').save(out, format='JPEG', quality=85, optimize=True)
+            content_type = 'image/jpeg'
+    return Thumbnail(out.getvalue(), content_type, None, None, 0.0)
+
+
+class ThumbnailCache:
+    """Size-bounded LRU cache of thumbnails in memory and, optionally, on disk
+
+    Both tiers evict the least recently used entries once they hold more
+    than their byte budget. With ``directory`` set, thumbnails are shared
+    between processes and survive restarts; each process rescans the
+    directory every ``DISK_RESCAN_INTERVAL`` writes, so ``max_bytes`` caps
+    the directory shared by all processes, overshooting by at most one
+    interval of writes per process.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = 64 * 1024 * 1024,
+                 max_memory_bytes: int = 16 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, Thumbnail]' = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_sizes: 'OrderedDict[str, int]' = OrderedDict()  # path -> size, oldest first
+        self._disk_bytes = 0
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_disk_index()
+
+    @staticmethod
+    def key(url: str, width: int) -> str:
+        return hashlib.sha256(f"{width}:{url}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.thumb")
+
+    def _load_disk_index(self):
+        """Replace the disk index with the files every process has written, least recently used first"""
+        entries = []
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.thumb'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:  # evicted by another process meanwhile
+                        continue
+                    entries.append((stat.st_atime, entry.path, stat.st_size))
+        except OSError:
+            return
+        sizes = OrderedDict((path, size) for _, path, size in sorted(entries))
+        with self._lock:
+            self._disk_sizes = sizes
+            self._disk_bytes = sum(sizes.values())
+
+    def _remember(self, key: str, thumbnail: Thumbnail):
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old.data)
+        self._memory[key] = thumbnail
+        self._memory_bytes += len(thumbnail.data)
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.data)
+
+    def _read_disk(self, key: str) -> Optional[Thumbnail]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                thumbnail = Thumbnail.decode(f.read())
+            os.utime(path)  # mark as recently used for eviction
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+        with self._lock:
+            if path in self._disk_sizes:
+                self._disk_sizes.move_to_end(path)
+        return thumbnail
+
+    def _write_disk(self, key: str, thumbnail: Thumbnail):
+        path = self._path(key)
+        payload = thumbnail.encode()
+        temp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except OSError:
+            return
+
+        with self._lock:
+            self._disk_writes += 1
+            rescan = self._disk_writes % DISK_RESCAN_INTERVAL == 0
+        if rescan:
+            self._load_disk_index()
+        with self._lock:
+            self._disk_bytes += len(payload) - self._disk_sizes.pop(path, 0)
+            self._disk_sizes[path] = len(payload)
+            evicted = []
+            while self._disk_bytes > self.max_bytes and len(self._disk_sizes) > 1:
+                old_path, size = self._disk_sizes.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(old_path)
+        for old_path in evicted:
+            try:
+                os.unlink(old_path)
+            except OSError:
+                pass
+
+    def get(self, key: str) -> Optional[Thumbnail]:
+        """Return the cached thumbnail, fresh or not, or None on a miss"""
+        with self._lock:
+            thumbnail = self._memory.get(key)
+            if thumbnail is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return thumbnail
+
+        if self.directory:
+            thumbnail = self._read_disk(key)
+        with self._lock:
+            if thumbnail is None:
+                self.misses += 1
+                return None
+            self._remember(key, thumbnail)
+            self.hits += 1
+        return thumbnail
+
+    def put(self, key: str, thumbnail: Thumbnail):
+        with self._lock:
+            self._remember(key, thumbnail)
+        if self.directory:
+            self._write_disk(key, thumbnail)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters, hit rate and occupancy"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate,
+                    'entries': len(self._memory), 'memory_bytes': self._memory_bytes,
+                    'disk_bytes': self._disk_bytes}
+
+
+class ImageProxy:
+    """Fetches remote images through one pooled session and serves cached thumbnails"""
+
+    def __init__(self, cache: ThumbnailCache = None, max_age: float = MAX_AGE, timeout: float = 5.0,
+                 pool_size: int = 8, failure_ttl: float = FAILURE_TTL):
+        self.cache = cache or ThumbnailCache()
+        self.max_age = max_age
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.failure_ttl = failure_ttl
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._failures: 'OrderedDict[str, float]' = OrderedDict()  # key -> time to retry after
+        self._failures_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """requests session, created on first use; its keep-alive pool is shared by all fetches"""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def _fetch(self, url: str, width: int, cached: Optional[Thumbnail]) -> Thumbnail:
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code == 304 and cached is not None:
+                return cached._replace(fetched_at=time.time())
+            response.raise_for_status()
+            length = int(response.headers.get('Content-Length') or 0)
+            if length > MAX_IMAGE_BYTES:
+                raise ValueError(f"Image at {url} is larger than {MAX_IMAGE_BYTES} bytes")
+            body = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                body += chunk
+                if len(body) > MAX_IMAGE_BYTES:
+                    raise ValueError(f"Image at {url} is larger than {MAX_IMAGE_BYTES} bytes")
+            etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        return make_thumbnail(bytes(body), width)._replace(etag=etag, last_modified=last_modified,
+                                                           fetched_at=time.time())
+
+    def _failed_recently(self, key: str) -> bool:
+        with self._failures_lock:
+            retry_at = self._failures.get(key)
+            if retry_at is None:
+                return False
+            if time.monotonic() < retry_at:
+                return True
+            del self._failures[key]
+            return False
+
+    def _record_failure(self, key: str):
+        with self._failures_lock:
+            self._failures.pop(key, None)
+            self._failures[key] = time.monotonic() + self.failure_ttl
+            while len(self._failures) > MAX_FAILURES:
+                self._failures.popitem(last=False)
+
+    @timed('image')
+    def thumbnail(self, url: str, width: int = THUMBNAIL_WIDTH) -> Optional[bytes]:
+        """Encoded thumbnail of the image at url, or None if it could not be fetched"""
+        key = self.cache.key(url, width)
+        cached = self.cache.get(key)
+        if cached is not None and time.time() - cached.fetched_at < self.max_age:
+            return cached.data
+        if self._failed_recently(key):
+            return cached.data if cached is not None else None
+        try:
+            thumbnail = self._fetch(url, width, cached)
+        except Exception:
+            self._record_failure(key)
+            # Serve the stale copy while the origin is unreachable
+            return cached.data if cached is not None else None
+        self.cache.put(key, thumbnail)
+        return thumbnail.data
+
+    def prefetch(self, urls: Iterable[str], width: int = THUMBNAIL_WIDTH, timeout: float = None,
+                 block: bool = True) -> List['Future[Optional[bytes]]']:
+        """Fetch the thumbnails of urls in parallel so showing them is a cache hit
+
+        With ``block`` the call returns once all are done or timeout passes;
+        otherwise the fetches continue in the background.
+        """
+        with self._session_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.pool_size, thread_name_prefix="thumbnail")
+            executor = self._executor
+        futures = [executor.submit(self.thumbnail, url, width) for url in dict.fromkeys(urls)]
+        if block and futures:
+            wait(futures, timeout)
+        return futures
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._session is not None:
+            self._session.close()
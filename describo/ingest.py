@@ -0,0 +1,201 @@
+"""Bulk catalog ingestion with a process pool
+
+Products are streamed from a JSONL or CSV dump in chunks. Worker processes
+derive each product's keywords from its name and description with the same
+QueryAnalyzer as search queries (stop words and synonyms included), merge
+them with any hand-written keywords and write the chunk as a catalog shard.
+The shards are then merged into one catalog file, which replaces the output
+atomically.
+
+    python -m describo.ingest products.jsonl products.cat --workers 8
+
+Shards are kept in ``--work-dir`` (``<output>.parts`` by default) until the
+merge succeeds, so an interrupted run resumes from the chunks it had not
+finished. Only the shard files and the manifest in that directory are ever
+deleted. At most two chunks per worker are in flight, so memory use
+depends on ``--chunk-size``, not on the size of the dump.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+from describo.analyzer import QueryAnalyzer
+from describo.catalog import CatalogWriter, merge_catalogs, read_dump
+
+CHUNK_SIZE = 50_000
+# Seconds between progress lines
+REPORT_INTERVAL = 5.0
+MANIFEST = 'manifest.json'
+
+Chunk = List[Tuple[str, Dict[str, Any]]]
+
+# Set in each worker by _init_worker
+_analyzer: QueryAnalyzer = None
+
+
+def _init_worker(stop_words_path: str = None, synonyms_path: str = None):
+    global _analyzer
+    _analyzer = QueryAnalyzer.from_files(stop_words_path, synonyms_path, cache_size=0)
+
+
+def product_keywords(analyzer: QueryAnalyzer, product: Dict[str, Any]) -> List[str]:
+    """Hand-written keywords followed by those extracted from name and description"""
+    text = f"{product.get('name', '')} {product.get('description', '')}"
+    keywords = [str(keyword).lower() for keyword in product.get('keywords') or ()]
+    return list(dict.fromkeys(keywords + analyzer.extract(text)))
+
+
+def index_chunk(chunk: Chunk, shard_path: str) -> int:
+    """Tokenize one chunk of products and write it as a catalog shard"""
+    writer = CatalogWriter()
+    for product_id, product in chunk:
+        writer.add(product_id, dict(product, keywords=product_keywords(_analyzer, product)))
+    writer.write(shard_path)
+    return len(writer)
+
+
+def chunks(products: Iterable[Tuple[str, Dict[str, Any]]], size: int) -> Iterator[Chunk]:
+    iterator = iter(products)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _shard_path(work_dir: str, number: int) -> str:
+    return os.path.join(work_dir, f"shard-{number:06d}.cat")
+
+
+def _shard_numbers(work_dir: str) -> Set[int]:
+    # Shards are written atomically, so every finished file is complete
+    return {int(name[6:12]) for name in os.listdir(work_dir)
+            if len(name) == 16 and name.startswith('shard-') and name.endswith('.cat') and name[6:12].isdigit()}
+
+
+def _clear_work_dir(work_dir: str, remove_dir: bool = False):
+    """Delete this pipeline's shards and manifest, leaving any other files alone"""
+    for number in _shard_numbers(work_dir):
+        os.unlink(_shard_path(work_dir, number))
+    try:
+        os.unlink(os.path.join(work_dir, MANIFEST))
+    except FileNotFoundError:
+        pass
+    if remove_dir:
+        try:
+            os.rmdir(work_dir)  # only succeeds if nothing else is in it
+        except OSError:
+            pass
+
+
+def _prepare_work_dir(work_dir: str, dump_path: str, chunk_size: int,
+                      stop_words_path: str = None, synonyms_path: str = None) -> Set[int]:
+    """Return the chunks already indexed with these settings, clearing shards of any other run"""
+    stat = os.stat(dump_path)
+    manifest = {'dump': os.path.abspath(dump_path), 'size': stat.st_size,
+                'mtime': stat.st_mtime, 'chunk_size': chunk_size,
+                'stop_words_path': os.path.abspath(stop_words_path) if stop_words_path else None,
+                'synonyms_path': os.path.abspath(synonyms_path) if synonyms_path else None}
+    os.makedirs(work_dir, exist_ok=True)
+    manifest_path = os.path.join(work_dir, MANIFEST)
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            resumable = json.load(f) == manifest
+    except (OSError, ValueError):
+        resumable = False
+
+    if not resumable:
+        _clear_work_dir(work_dir)
+        os.makedirs(work_dir, exist_ok=True)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        return set()
+    return _shard_numbers(work_dir)
+
+
+class Progress:
+    """Products indexed so far, printed as products per second"""
+
+    def __init__(self, stream=sys.stderr, interval: float = REPORT_INTERVAL):
+        self.stream = stream
+        self.interval = interval
+        self.products = 0
+        self.skipped_chunks = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.start
+        return self.products / elapsed if elapsed > 0 else 0.0
+
+    def add(self, products: int):
+        self.products += products
+        now = time.perf_counter()
+        if self.stream is not None and now - self._last_report >= self.interval:
+            self._last_report = now
+            print(f"{self.products} products indexed, {self.rate:.0f} products/sec", file=self.stream, flush=True)
+
+
+def ingest(dump_path: str, output_path: str, workers: int = None, chunk_size: int = CHUNK_SIZE,
+           work_dir: str = None, stop_words_path: str = None, synonyms_path: str = None,
+           progress: Progress = None) -> int:
+    """Build a catalog file from a product dump, returning the product count"""
+    workers = workers or os.cpu_count() or 1
+    default_work_dir = work_dir is None
+    work_dir = work_dir or f"{output_path}.parts"
+    progress = progress or Progress()
+    done = _prepare_work_dir(work_dir, dump_path, chunk_size, stop_words_path, synonyms_path)
+    shard_paths = []
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(stop_words_path, synonyms_path)) as pool:
+        pending: Set[Future] = set()
+        for number, chunk in enumerate(chunks(read_dump(dump_path), chunk_size)):
+            shard_path = _shard_path(work_dir, number)
+            shard_paths.append(shard_path)
+            if number in done:
+                progress.skipped_chunks += 1
+                continue
+            # Bound the chunks held in memory while workers catch up
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    progress.add(future.result())
+            pending.add(pool.submit(index_chunk, chunk, shard_path))
+        for future in wait(pending).done:
+            progress.add(future.result())
+
+    count = merge_catalogs(shard_paths, output_path)
+    # The default <output>.parts directory is ours; a given --work-dir is left in place
+    _clear_work_dir(work_dir, remove_dir=default_work_dir)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index a product dump into a Describo catalog file")
+    parser.add_argument('dump', help="JSONL or CSV product dump (JSON is loaded whole)")
+    parser.add_argument('output', help="catalog file to write")
+    parser.add_argument('--workers', type=int, default=None, help="indexing processes (default: one per core)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="products per shard")
+    parser.add_argument('--work-dir', default=None, help="directory for shards (default: <output>.parts)")
+    parser.add_argument('--stop-words', default=os.getenv('stop_words_path'), help="stop word file")
+    parser.add_argument('--synonyms', default=os.getenv('synonyms_path'), help="synonyms JSON file")
+    args = parser.parse_args()
+
+    progress = Progress()
+    count = ingest(args.dump, args.output, args.workers, args.chunk_size, args.work_dir,
+                   args.stop_words, args.synonyms, progress)
+    elapsed = time.perf_counter() - progress.start
+    resumed = f", {progress.skipped_chunks} chunks resumed" if progress.skipped_chunks else ""
+    print(f"Wrote {count} products to {args.output} in {elapsed:.1f}s "
+          f"({progress.products / elapsed:.0f} products/sec indexed{resumed})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Compact storage for behavioral interaction history"""
+import sys
+from array import array
+from typing import List, Dict, Any, Iterator, Union
+
+
+class InteractionLog:
+    """Append-only interaction history with a retention window
+
+    Timestamps live in an ``array('d')`` and action names are interned to
+    small integer codes, so an entry costs about ten bytes instead of a dict
+    per interaction. Metadata is only stored for entries that have some.
+    Reads return the familiar ``{'timestamp', 'action', 'metadata'}`` dicts,
+    so ``log[-10:]`` works like it did on the old list.
+    """
+
+    def __init__(self, retention: int = 100):
+        self.retention = retention
+        self._timestamps = array('d')
+        self._codes = array('H')
+        self._actions: List[str] = []
+        self._action_codes: Dict[str, int] = {}
+        self._metadata: Dict[int, Dict[str, Any]] = {}  # sequence number -> metadata
+        self._first = 0  # sequence number of the oldest retained entry
+
+    def append(self, timestamp: float, action: str, metadata: Dict[str, Any] = None):
+        code = self._action_codes.get(action)
+        if code is None:
+            code = self._action_codes[action] = len(self._actions)
+            self._actions.append(sys.intern(action))
+        if metadata:
+            self._metadata[self._first + len(self._codes)] = metadata
+        self._timestamps.append(timestamp)
+        self._codes.append(code)
+
+        if len(self._codes) > 2 * self.retention:
+            # Trim in batches so the amortized cost per append stays O(1)
+            excess = len(self._codes) - self.retention
+            del self._timestamps[:excess]
+            del self._codes[:excess]
+            self._first += excess
+            self._metadata = {seq: meta for seq, meta in self._metadata.items() if seq >= self._first}
+
+    def _entry(self, index: int) -> Dict[str, Any]:
+        return {
+            'timestamp': self._timestamps[index],
+            'action': self._actions[self._codes[index]],
+            'metadata': self._metadata.get(self._first + index, {}),
+        }
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self._entry(index) for index in range(len(self._codes)))
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self._entry(i) for i in range(*index.indices(len(self._codes)))]
+        if index < 0:
+            index += len(self._codes)
+        if not 0 <= index < len(self._codes):
+            raise IndexError("interaction index out of range")
+        return self._entry(index)
+
+    @property
+    def timestamps(self) -> array:
+        """Retained timestamps, oldest first"""
+        return self._timestamps
+
+    @property
+    def actions(self) -> List[str]:
+        """Distinct action names seen in this log"""
+        return list(self._actions)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable snapshot, restored with from_dict"""
+        return {
+            'retention': self.retention,
+            'first': self._first,
+            'timestamps': self._timestamps.tolist(),
+            'codes': self._codes.tolist(),
+            'actions': list(self._actions),
+            'metadata': {str(seq): meta for seq, meta in self._metadata.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'InteractionLog':
+        log = cls(retention=state['retention'])
+        log._first = state['first']
+        log._timestamps = array('d', state['timestamps'])
+        log._codes = array('H', state['codes'])
+        log._actions = [sys.intern(action) for action in state['actions']]
+        log._action_codes = {action: code for code, action in enumerate(log._actions)}
+        log._metadata = {int(seq): meta for seq, meta in state['metadata'].items()}
+        return log
@@ -0,0 +1,207 @@
+"""Per-stage latency histograms with a Prometheus text export
+
+``timed('search')`` works as a decorator or a context manager and records
+the duration, count and failures of a stage into the process-wide
+``REGISTRY``. Recording is a bisect and a few increments, cheap enough to
+leave on every request. ``render_prometheus`` produces the text exposition
+format, which ``start_http_server`` serves and ``start_file_dump`` writes
+to a file for a node exporter textfile collector.
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Sequence
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Bucket upper bounds in seconds, from 100 microseconds to 60 seconds
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+METRIC_PREFIX = 'describo_stage'
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with count, sum and error tallies"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, error: bool = False):
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[slot] += 1
+            self.count += 1
+            self.total += seconds
+            if error:
+                self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket, as Prometheus does"""
+        with self._lock:
+            counts, count = list(self.counts), self.count
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for slot, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if slot == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[slot - 1] if slot else 0.0
+                return lower + (self.buckets[slot] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class _Timer:
+    """Context manager and decorator recording into one stage"""
+
+    def __init__(self, registry: 'MetricsRegistry', stage: str):
+        self._registry = registry
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._registry.observe(self._stage, time.perf_counter() - self._start, error=exc_type is not None)
+        return False
+
+    def __call__(self, func):
+        registry, stage = self._registry, self._stage
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                registry.observe(stage, time.perf_counter() - start, error=failed)
+        return wrapper
+
+
+class MetricsRegistry:
+    """Named stage histograms for one process"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._stages: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> Histogram:
+        histogram = self._stages.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._stages.setdefault(name, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, stage: str, seconds: float, error: bool = False):
+        self.stage(stage).observe(seconds, error)
+
+    def timed(self, stage: str) -> _Timer:
+        """Time a block (``with timed('x'):``) or every call of a function (``@timed('x')``)"""
+        return _Timer(self, stage)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Count, error rate and p50/p95/p99 in milliseconds for every stage"""
+        with self._lock:
+            stages = dict(self._stages)
+        summary = {}
+        for name, histogram in sorted(stages.items()):
+            summary[name] = {
+                'count': histogram.count,
+                'error_rate': histogram.errors / histogram.count if histogram.count else 0.0,
+                'p50_ms': histogram.quantile(0.50) * 1000,
+                'p95_ms': histogram.quantile(0.95) * 1000,
+                'p99_ms': histogram.quantile(0.99) * 1000,
+            }
+        return summary
+
+    def render_prometheus(self) -> str:
+        """Render every stage in the Prometheus text exposition format"""
+        with self._lock:
+            stages = dict(self._stages)
+        lines: List[str] = [
+            f"# HELP {METRIC_PREFIX}_seconds Time spent in each request stage",
+            f"# TYPE {METRIC_PREFIX}_seconds histogram",
+        ]
+        errors = [
+            f"# HELP {METRIC_PREFIX}_errors_total Stage calls that raised",
+            f"# TYPE {METRIC_PREFIX}_errors_total counter",
+        ]
+        for name, histogram in sorted(stages.items()):
+            with histogram._lock:
+                counts, count, total, failures = list(histogram.counts), histogram.count, histogram.total, histogram.errors
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{METRIC_PREFIX}_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_PREFIX}_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'{METRIC_PREFIX}_seconds_sum{{stage="{name}"}} {total}')
+            lines.append(f'{METRIC_PREFIX}_seconds_count{{stage="{name}"}} {count}')
+            errors.append(f'{METRIC_PREFIX}_errors_total{{stage="{name}"}} {failures}')
+        return "\n".join(lines + errors) + "\n"
+
+    def write_file(self, path: str):
+        """Atomically write the Prometheus text to path"""
+        temp_path = f"{path}.tmp{os.getpid()}"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(temp_path, path)
+
+    def start_file_dump(self, path: str, interval: float = 15.0) -> threading.Thread:
+        """Rewrite the metrics file every interval seconds from a daemon thread"""
+        def run():
+            while True:
+                try:
+                    self.write_file(path)
+                except OSError:
+                    pass
+                time.sleep(interval)
+
+        thread = threading.Thread(target=run, name="metrics-dump", daemon=True)
+        thread.start()
+        return thread
+
+    def start_http_server(self, port: int, host: str = '') -> 'ThreadingHTTPServer':
+        """Serve /metrics from a daemon thread"""
+        # Imported here so importing the metrics module stays cheap
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+REGISTRY = MetricsRegistry()
+timed = REGISTRY.timed
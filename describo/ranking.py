@@ -0,0 +1,140 @@
+"""BM25 and TF-IDF relevance scoring over name, keyword and description fields
+
+Unlike the fixed 3/2/1 weights of VectorScorer, these engines weigh a query
+word by how rare it is in the catalog, so "purifier" outranks "camping".
+Fields are tokenized like queries (describo.analyzer.tokenize). When the
+scorer is built, every (term, product) posting of a field gets its final
+weight: IDF, term frequency and length normalization (BM25) or cosine norm
+(TF-IDF) folded into one number. Scoring a query is then a lookup of each
+word's postings and a weighted sum.
+"""
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from describo.analyzer import tokenize
+from describo.catalog import Catalog
+from describo.scoring import VectorScorer
+
+METHODS = ('bm25', 'tfidf')
+# Field weights keep the old preference for name over keyword over description hits
+FIELD_WEIGHTS = {'name': 3.0, 'keywords': 2.0, 'description': 1.0}
+# BM25 term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+
+class _FieldPostings:
+    """Precomputed per-posting weights of one field, grouped by term"""
+
+    def __init__(self, rows_tokens: Sequence[Sequence[str]], method: str, k1: float = K1, b: float = B):
+        vocabulary: Dict[str, int] = {}
+        term_ids, row_ids, frequencies = [], [], []
+        lengths = np.zeros(len(rows_tokens), dtype=np.float64)
+        for row, tokens in enumerate(rows_tokens):
+            lengths[row] = len(tokens)
+            for term, frequency in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                row_ids.append(row)
+                frequencies.append(frequency)
+
+        count = len(rows_tokens)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        frequencies = np.asarray(frequencies, dtype=np.float64)
+        document_frequency = np.bincount(term_ids, minlength=len(vocabulary)).astype(np.float64)
+
+        if method == 'bm25':
+            idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5))
+            average_length = lengths.mean() if count and lengths.mean() > 0 else 1.0
+            length_norm = k1 * (1 - b + b * lengths / average_length)
+            weights = idf[term_ids] * frequencies * (k1 + 1) / (frequencies + length_norm[row_ids])
+        elif method == 'tfidf':
+            idf = np.log((1 + count) / (1 + document_frequency)) + 1
+            weights = (1 + np.log(frequencies)) * idf[term_ids]
+            norms = np.sqrt(np.bincount(row_ids, weights=weights ** 2, minlength=count))
+            weights /= norms[row_ids]
+        else:
+            raise ValueError(f"Unknown ranking method {method!r}, expected one of {METHODS}")
+
+        order = np.argsort(term_ids, kind='stable')
+        self.vocabulary = vocabulary
+        self.rows = row_ids[order]
+        self.weights = weights[order]
+        self.indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=self.indptr[1:])
+
+    def accumulate(self, scores: np.ndarray, term: str, factor: float):
+        """Add factor times the term's weight to the score of every product holding it"""
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return
+        start, end = self.indptr[term_id], self.indptr[term_id + 1]
+        # A term has one posting per product, so the fancy-indexed add is safe
+        scores[self.rows[start:end]] += factor * self.weights[start:end]
+
+
+class RelevanceScorer:
+    """BM25 or TF-IDF scorer with the scores/best_rows interface of VectorScorer"""
+
+    best_rows = staticmethod(VectorScorer.best_rows)
+
+    def __init__(self, catalog: Catalog, method: str = 'bm25', field_weights: Dict[str, float] = None,
+                 k1: float = K1, b: float = B):
+        if method not in METHODS:
+            raise ValueError(f"Unknown ranking method {method!r}, expected one of {METHODS}")
+        self.catalog = catalog
+        self.method = method
+        self.field_weights = dict(FIELD_WEIGHTS if field_weights is None else field_weights)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """Recompute the field statistics if the catalog changed since the last build"""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        version = self.catalog.version
+        if getattr(self, 'version', None) == version:
+            return
+
+        product_ids = []
+        fields: Dict[str, List[List[str]]] = {field: [] for field in self.field_weights}
+        for product_id, product in self.catalog.items():
+            product_ids.append(product_id)
+            for field, rows in fields.items():
+                if field == 'keywords':
+                    rows.append([token for keyword in product['keywords'] for token in tokenize(keyword)])
+                else:
+                    rows.append(tokenize(product[field]))
+
+        postings = {field: _FieldPostings(rows, self.method, self.k1, self.b) for field, rows in fields.items()}
+        self.product_ids, self._fields, self.version = product_ids, postings, version
+
+    def _snapshot_scores(self, keywords: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+        # Score against one build, even if another thread refreshes meanwhile
+        with self._lock:
+            self._refresh()
+            product_ids, fields = self.product_ids, self._fields
+        scores = np.zeros(len(product_ids), dtype=np.float64)
+        counts = Counter(token for keyword in keywords for token in tokenize(keyword))
+        for term, count in counts.items():
+            for field, postings in fields.items():
+                postings.accumulate(scores, term, self.field_weights[field] * count)
+        return product_ids, scores
+
+    def scores(self, keywords: Iterable[str]) -> np.ndarray:
+        """Return the score of every product, in catalog order"""
+        return self._snapshot_scores(keywords)[1]
+
+    def top_k(self, keywords: Iterable[str], k: int) -> List[Tuple[str, float]]:
+        """Return the k best (product_id, score) pairs, ties broken by catalog order"""
+        if k <= 0:
+            return []
+        product_ids, scores = self._snapshot_scores(keywords)
+        return [(product_ids[row], float(scores[row])) for row in self.best_rows(scores, k)]
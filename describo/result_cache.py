@@ -0,0 +1,164 @@
+"""Process-wide cache of ranked search results"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+# The disk cache directory is checked against its size cap every this many writes
+DISK_TRIM_INTERVAL = 64
+
+
+class ResultCache:
+    """TTL + LRU cache of search results keyed on the normalized keyword list
+
+    Entries are stored as JSON, which keeps memory accounting exact and hands
+    every caller its own copy; nothing read back from disk is unpickled, so
+    results must be JSON-serializable (tuples come back as lists). Keys
+    include the catalog version, so results computed against an older catalog
+    are never served; the in-memory entries are dropped as soon as a new
+    version is seen. With ``directory`` set, entries are also written to disk
+    and shared by every process using it.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0, max_bytes: int = 32 * 1024 * 1024,
+                 directory: str = None, max_disk_bytes: int = 256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, Tuple[float, bytes]]' = OrderedDict()  # key -> (expires_at, payload)
+        self._bytes = 0
+        self._catalog_version = None
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(keywords: Iterable[str], catalog_version: str, **params) -> str:
+        """Build a cache key; keyword order does not affect scores, so it is ignored"""
+        normalized = sorted(keywords)
+        payload = json.dumps([catalog_version, normalized, params], sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _check_version(self, catalog_version: str):
+        if catalog_version != self._catalog_version:
+            self._entries.clear()
+            self._bytes = 0
+            self._catalog_version = catalog_version
+
+    def _store(self, key: str, expires_at: float, payload: bytes):
+        if len(payload) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key)[1])
+        self._entries[key] = (expires_at, payload)
+        self._bytes += len(payload)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, bytes]]:
+        try:
+            with open(self._path(key), 'rb') as f:
+                expires_at = float.fromhex(f.readline().decode('ascii').strip())
+                return expires_at, f.read()
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, expires_at: float, payload: bytes):
+        temp_path = f"{self._path(key)}.tmp{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(expires_at.hex().encode('ascii') + b'\n')
+                f.write(payload)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            return
+        with self._lock:
+            self._disk_writes += 1
+            due = self._disk_writes % DISK_TRIM_INTERVAL == 0
+        if due:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        """Delete the least recently written files once the directory exceeds its cap"""
+        try:
+            files = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+        except OSError:
+            return
+        total = sum(entry.stat().st_size for entry in files)
+        if total <= self.max_disk_bytes:
+            return
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            try:
+                size = entry.stat().st_size
+                os.unlink(entry.path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_disk_bytes:
+                break
+
+    def get(self, keywords: Iterable[str], catalog_version: str, **params) -> Optional[Any]:
+        """Return cached results, or None on a miss"""
+        key = self.key(keywords, catalog_version, **params)
+        now = time.time()
+        with self._lock:
+            self._check_version(catalog_version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._bytes -= len(self._entries.pop(key)[1])
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None and self.directory:
+            entry = self._read_disk(key)
+            if entry is not None and entry[0] > now:
+                with self._lock:
+                    self._store(key, *entry)
+            else:
+                entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        try:
+            return json.loads(entry[1])
+        except ValueError:
+            return None
+
+    def put(self, keywords: Iterable[str], catalog_version: str, results: Any, **params):
+        """Cache results computed against catalog_version"""
+        key = self.key(keywords, catalog_version, **params)
+        expires_at = time.time() + self.ttl
+        payload = json.dumps(results, separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            self._check_version(catalog_version)
+            self._store(key, expires_at, payload)
+        if self.directory:
+            self._write_disk(key, expires_at, payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and memory usage"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self._entries), 'bytes': self._bytes}
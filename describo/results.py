@@ -0,0 +1,72 @@
+"""Ranked search results that fetch product details page by page
+
+A ``ResultCursor`` holds only the ranked product ids with their scores; the
+product dicts are looked up in the catalog for the slice being shown. The
+dicts handed out belong to the catalog and must not be modified; call
+``Hit.to_dict`` for a copy carrying the scores.
+"""
+from array import array
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+from describo.catalog import Catalog
+
+
+class Hit(NamedTuple):
+    """One ranked product; rank starts at 1"""
+    rank: int
+    product_id: str
+    score: float
+    similarity: Optional[float]
+    product: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Copy of the product with its score, shaped like search_products results"""
+        product_copy = dict(self.product)
+        product_copy['score'] = self.score
+        if self.similarity is not None:
+            product_copy['similarity'] = self.similarity
+        return product_copy
+
+
+class ResultCursor:
+    """Ranked product ids and scores over a catalog, paged on demand"""
+
+    def __init__(self, catalog: Catalog, ids: Sequence[str], scores: Sequence[int],
+                 similarities: Sequence[float] = None, total: int = None):
+        self.catalog = catalog
+        self.ids = list(ids)
+        # Integer rule scores stay ints; BM25 and TF-IDF scores are floats
+        self.scores = array('d' if any(isinstance(score, float) for score in scores) else 'i', scores)
+        self.similarities = array('f', similarities) if similarities is not None else None
+        # Matching products, more than len(self) when the ranking was cut off
+        self.total = len(self.ids) if total is None else total
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __bool__(self) -> bool:
+        return bool(self.ids)
+
+    def __iter__(self) -> Iterator[Hit]:
+        return iter(self.fetch(0, len(self.ids)))
+
+    def fetch(self, start: int, stop: int) -> List[Hit]:
+        """Hits ranked start to stop - 1 (0-based); products gone from the catalog are skipped"""
+        hits = []
+        for position in range(max(0, start), min(stop, len(self.ids))):
+            product_id = self.ids[position]
+            product = self.catalog.get(product_id)
+            if product is None:
+                continue
+            similarity = None
+            if self.similarities is not None:
+                similarity = round(self.similarities[position], 3)
+            hits.append(Hit(position + 1, product_id, self.scores[position], similarity, product))
+        return hits
+
+    def page(self, number: int, size: int) -> List[Hit]:
+        """Hits on page number (0-based) of size hits each"""
+        return self.fetch(number * size, (number + 1) * size)
+
+    def page_count(self, size: int) -> int:
+        return -(-len(self.ids) // size)
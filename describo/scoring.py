@@ -0,0 +1,216 @@
+"""Vectorized top-k relevance scoring with NumPy"""
+import threading
+from typing import Any, List, Dict, Iterable, Set, Tuple
+
+import numpy as np
+
+from describo.catalog import Catalog
+from describo.search_index import SubstringIndex
+
+
+# Fraction of removed rows at which the matrices are rebuilt instead of updated
+COMPACT_RATIO = 0.25
+
+
+class _TermPostings:
+    """Column-oriented boolean product x term matrix for one field
+
+    Rows appended after the build are kept per term in ``_added`` until the
+    next rebuild.
+    """
+
+    def __init__(self, rows_terms: Iterable[Iterable[str]], count: int):
+        vocabulary: Dict[str, int] = {}
+        term_ids, row_ids = [], []
+        for row, terms in enumerate(rows_terms):
+            for term in set(terms):
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                row_ids.append(row)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind='stable')
+
+        self.vocabulary = vocabulary
+        self.term_index = SubstringIndex()
+        for term, term_id in vocabulary.items():
+            self.term_index.add(term, term_id)
+        self.rows = row_ids[order]
+        self.indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=self.indptr[1:])
+        self.count = count
+        self._built_terms = len(vocabulary)
+        self._added: Dict[int, List[int]] = {}  # term id -> rows appended since the build
+
+    def add_row(self, terms: Iterable[str]):
+        """Append a product row holding terms"""
+        row = self.count
+        for term in set(terms):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                term_id = self.vocabulary[term] = len(self.vocabulary)
+                self.term_index.add(term, term_id)
+            self._added.setdefault(term_id, []).append(row)
+        self.count += 1
+
+    def rows_mask(self, term_mask: np.ndarray) -> np.ndarray:
+        """Products holding at least one of the selected terms"""
+        mask = np.zeros(self.count, dtype=bool)
+        terms = np.flatnonzero(term_mask)
+        if len(terms) == 0:
+            return mask
+
+        built = terms[terms < self._built_terms]
+        starts = self.indptr[built]
+        lengths = self.indptr[built + 1] - starts
+        # Gather the posting ranges of every selected term in one vectorized step
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        mask[self.rows[offsets + np.arange(lengths.sum())]] = True
+        if self._added:
+            for term_id in terms.tolist():
+                rows = self._added.get(term_id)
+                if rows:
+                    mask[rows] = True
+        return mask
+
+    def exact(self, term: str) -> np.ndarray:
+        term_mask = np.zeros(len(self.vocabulary), dtype=bool)
+        if term in self.vocabulary:
+            term_mask[self.vocabulary[term]] = True
+        return self.rows_mask(term_mask)
+
+    def containing(self, fragment: str) -> np.ndarray:
+        term_mask = np.zeros(len(self.vocabulary), dtype=bool)
+        term_ids = self.term_index.lookup(fragment)
+        term_mask[np.fromiter(term_ids, dtype=np.int64, count=len(term_ids))] = True
+        return self.rows_mask(term_mask)
+
+
+class VectorScorer:
+    """Batch scorer returning the same 3/2/1 scores as search_products
+
+    Catalog keywords and whitespace tokens of names and descriptions are
+    encoded as boolean product x term matrices. A query keyword is matched
+    against each field's vocabulary through an n-gram index, and the resulting
+    product masks are combined into the score vector for the whole catalog.
+
+    ``add_product`` and ``remove_product`` update the matrices in place: an
+    added or replaced product gets a new row at the end, which is where the
+    catalog puts it too, and removed rows are masked out of every score until
+    a quarter of the rows are dead and the catalog is re-encoded. Any other
+    catalog change is picked up by a full rebuild on the next search.
+    """
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """Re-encode the catalog if it changed since the last build"""
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self, force: bool = False):
+        version = self.catalog.version
+        if not force and getattr(self, 'version', None) == version:
+            return
+
+        product_ids, keywords, names, descriptions = [], [], [], []
+        for product_id, product in self.catalog.items():
+            product_ids.append(product_id)
+            keywords.append(product['keywords'])
+            names.append(product['name'].lower().split())
+            descriptions.append(product['description'].lower().split())
+
+        count = len(product_ids)
+        self.product_ids = product_ids
+        self._rows = {product_id: row for row, product_id in enumerate(product_ids)}
+        self._removed: Set[int] = set()
+        self._keywords = _TermPostings(keywords, count)
+        self._names = _TermPostings(names, count)
+        self._descriptions = _TermPostings(descriptions, count)
+        self.version = version
+
+    def add_product(self, product_id: str, product: Dict[str, Any]):
+        """Index a product just added to, or replaced in, the catalog"""
+        with self._lock:
+            self._remove_row(product_id)
+            self._rows[product_id] = len(self.product_ids)
+            self.product_ids.append(product_id)
+            self._keywords.add_row(product['keywords'])
+            self._names.add_row(product['name'].lower().split())
+            self._descriptions.add_row(product['description'].lower().split())
+            self._updated()
+
+    def remove_product(self, product_id: str):
+        """Drop a product just removed from the catalog"""
+        with self._lock:
+            self._remove_row(product_id)
+            self._updated()
+
+    def _remove_row(self, product_id: str):
+        row = self._rows.pop(product_id, None)
+        if row is not None:
+            self._removed.add(row)
+
+    def _updated(self):
+        if len(self._removed) > COMPACT_RATIO * len(self.product_ids):
+            self._refresh(force=True)
+        else:
+            self.version = self.catalog.version
+
+    def _scan_field(self, field: str, fragment: str) -> np.ndarray:
+        catalog, removed = self.catalog, self._removed
+        return np.fromiter(
+            (row not in removed and fragment in catalog[product_id][field].lower()
+             for row, product_id in enumerate(self.product_ids)),
+            dtype=bool, count=len(self.product_ids))
+
+    def _keyword_scores(self, keyword: str) -> np.ndarray:
+        exact = self._keywords.exact(keyword)
+        partial = self._keywords.containing(keyword)
+        if keyword and not any(char.isspace() for char in keyword):
+            # Without whitespace a substring of the text must sit inside one token
+            name = self._names.containing(keyword)
+            description = self._descriptions.containing(keyword)
+        else:
+            name = self._scan_field('name', keyword)
+            description = self._scan_field('description', keyword)
+        return np.select([exact, partial, name, description], [2, 1, 3, 1], default=0).astype(np.int32)
+
+    def scores(self, keywords: Iterable[str]) -> np.ndarray:
+        """Return the score of every product row, in catalog order; removed rows score 0"""
+        with self._lock:
+            self._refresh()
+            scores = np.zeros(len(self.product_ids), dtype=np.int32)
+            counts: Dict[str, int] = {}
+            for keyword in keywords:
+                counts[keyword] = counts.get(keyword, 0) + 1
+            for keyword, count in counts.items():
+                scores += self._keyword_scores(keyword) * count
+            if self._removed:
+                scores[np.fromiter(self._removed, dtype=np.int64, count=len(self._removed))] = 0
+        return scores
+
+    @staticmethod
+    def best_rows(scores: np.ndarray, k: int = None) -> np.ndarray:
+        """Rows of the k best positive scores (all of them if k is None), best first"""
+        candidates = np.flatnonzero(scores > 0)
+        if k is not None and k < len(candidates):
+            candidate_scores = scores[candidates]
+            threshold = -np.partition(-candidate_scores, k - 1)[k - 1]
+            above = candidates[candidate_scores > threshold]
+            # Of the products tied at the cut-off, keep the earliest ones like a stable sort
+            tied = candidates[candidate_scores == threshold][:k - len(above)]
+            candidates = np.concatenate([above, tied])
+
+        order = np.lexsort((candidates, -scores[candidates]))
+        return candidates[order]
+
+    def top_k(self, keywords: Iterable[str], k: int) -> List[Tuple[str, int]]:
+        """Return the k best (product_id, score) pairs, ties broken by catalog order"""
+        if k <= 0:
+            return []
+        scores = self.scores(keywords)
+        return [(self.product_ids[row], int(scores[row])) for row in self.best_rows(scores, k)]
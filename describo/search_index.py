@@ -0,0 +1,144 @@
+"""Reference 3/2/1 product scoring, the n-gram substring index used by the scorers, and KeywordIndex"""
+from collections import defaultdict
+from typing import List, Dict, Any, Iterable, Set, Tuple
+
+from describo.catalog import Catalog, DictCatalog
+
+# Substring lookups are narrowed with character n-grams of this length
+NGRAM = 3
+
+
+def score_product(product: Dict[str, Any], keywords: Iterable[str]) -> int:
+    """Score one product against keywords using the 3/2/1 relevance rules"""
+    score = 0
+    name = product['name'].lower()
+    description = product['description'].lower()
+
+    for keyword in keywords:
+        if keyword in product['keywords']:
+            score += 2
+        elif any(keyword in prod_keyword for prod_keyword in product['keywords']):
+            score += 1
+        elif keyword in name:
+            score += 3
+        elif keyword in description:
+            score += 1
+
+    return score
+
+
+def _ngrams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class SubstringIndex:
+    """N-gram index answering "which owners hold a string containing X"
+
+    Owners can be any hashable id: term ids in VectorScorer, the words
+    themselves in FuzzyMatcher.
+    """
+
+    def __init__(self):
+        self._owners: Dict[str, Set[Any]] = {}  # indexed string -> owner ids
+        self._grams: Dict[str, Set[str]] = defaultdict(set)  # n-gram -> indexed strings
+
+    def add(self, text: str, owner: Any):
+        owners = self._owners.get(text)
+        if owners is None:
+            owners = self._owners[text] = set()
+            for gram in _ngrams(text):
+                self._grams[gram].add(text)
+        owners.add(owner)
+
+    def remove(self, text: str, owner: Any):
+        owners = self._owners.get(text)
+        if owners is None:
+            return
+        owners.discard(owner)
+        if not owners:
+            del self._owners[text]
+            for gram in _ngrams(text):
+                strings = self._grams[gram]
+                strings.discard(text)
+                if not strings:
+                    del self._grams[gram]
+
+    def lookup(self, fragment: str) -> Set[Any]:
+        """Return the owners of every indexed string that contains fragment"""
+        if len(fragment) < NGRAM:
+            # Too short to narrow down with n-grams, check every indexed string
+            candidates = self._owners.keys()
+        else:
+            grams = sorted(_ngrams(fragment), key=lambda gram: len(self._grams.get(gram, ())))
+            if grams[0] not in self._grams:
+                return set()
+            candidates = set(self._grams[grams[0]])
+            for gram in grams[1:]:
+                candidates &= self._grams[gram]
+                if not candidates:
+                    return set()
+
+        matches = set()
+        for text in candidates:
+            if fragment in text:
+                matches |= self._owners[text]
+        return matches
+
+
+class KeywordIndex:
+    """Incrementally maintained index giving the same scores as a full catalog scan
+
+    Kept for existing callers; scoring is delegated to
+    ``describo.scoring.VectorScorer``, which imports NumPy when the first
+    index is built. Product details are read back from the catalog.
+    """
+
+    def __init__(self, catalog: Catalog):
+        from describo.scoring import VectorScorer
+
+        self.catalog = catalog
+        self.scorer = VectorScorer(catalog)
+
+    @classmethod
+    def from_catalog(cls, catalog: Catalog) -> 'KeywordIndex':
+        """Build an index over every product in a catalog"""
+        return cls(catalog)
+
+    @classmethod
+    def from_products(cls, products: Dict[str, Dict[str, Any]]) -> 'KeywordIndex':
+        """Build an index over a product_id -> product mapping"""
+        return cls.from_catalog(DictCatalog(products))
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self.catalog
+
+    def add_product(self, product_id: str, product: Dict[str, Any]):
+        """Index a product just added to, or replaced in, the catalog"""
+        self.scorer.add_product(product_id, product)
+
+    def remove_product(self, product_id: str):
+        """Drop a product just removed from the catalog"""
+        self.scorer.remove_product(product_id)
+
+    def scores(self, keywords: Iterable[str]) -> Dict[str, int]:
+        """Return product_id -> score for every product with a positive score"""
+        return dict(self.rank(keywords))
+
+    def rank(self, keywords: Iterable[str]) -> List[Tuple[str, int]]:
+        """Return (product_id, score) pairs ordered by descending score, ties in catalog order"""
+        scorer = self.scorer
+        scores = scorer.scores(keywords)
+        product_ids = scorer.product_ids
+        return [(product_ids[row], int(scores[row])) for row in scorer.best_rows(scores)]
+
+    def search(self, keywords: Iterable[str]) -> List[Dict[str, Any]]:
+        """Return scored product copies ordered by descending score"""
+        results = []
+        for product_id, score in self.rank(keywords):
+            product_copy = dict(self.catalog[product_id])
+            product_copy['score'] = score
+            results.append(product_copy)
+        return results
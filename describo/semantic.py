@@ -0,0 +1,256 @@
+"""Offline semantic retrieval over hashed character n-gram vectors
+
+``HashingVectorizer`` embeds text without downloading a model: every word
+and its character n-grams are hashed into signed buckets of a fixed-size
+vector, so inflections and partial matches ("filters", "filtering",
+"purifier") land near each other. ``SemanticIndex`` is an IVF index: product
+vectors are clustered with spherical k-means, and a query only scans the
+lists of its ``nprobe`` nearest centroids. An index is saved as a directory
+of .npy files that are memory-mapped on load, so worker processes share it.
+
+``fuse_rankings`` merges semantic and keyword results with weighted
+reciprocal rank fusion.
+
+    python -m describo.semantic products.cat products.semantic
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from describo.analyzer import DEFAULT_STOP_WORDS
+from describo.catalog import Catalog, MmapCatalog
+
+WORD = re.compile(r'\w+')
+# Rows vectorized or assigned to centroids per NumPy batch
+BATCH_SIZE = 16384
+# Upper bound on the word vectors gathered at once while vectorizing
+GATHER_BYTES = 64 * 1024 * 1024
+# Words of a text beyond this are ignored
+MAX_WORDS = 256
+# Reciprocal rank fusion constant; larger values flatten the rank curve
+RRF_K = 60
+
+
+class HashingVectorizer:
+    """Maps text to L2-normalized float32 vectors of signed n-gram hashes
+
+    Word vectors are cached in a growing matrix shared by all threads; the
+    lock keeps word ids valid between assigning them and gathering rows.
+    """
+
+    def __init__(self, dim: int = 128, ngram_sizes: Sequence[int] = (3, 4),
+                 stop_words: Iterable[str] = DEFAULT_STOP_WORDS, max_cached_words: int = 1 << 20):
+        self.dim = dim
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.stop_words = frozenset(stop_words)
+        self.max_cached_words = max_cached_words
+        self._lock = threading.Lock()
+        self._clear_cache()
+
+    def _clear_cache(self):
+        # Signed n-gram counts per word; row 0 stays all zero and pads short texts
+        self._word_ids: Dict[str, int] = {}
+        self._word_vectors = np.zeros((1024, self.dim), dtype=np.int32)
+
+    def config(self) -> Dict[str, object]:
+        return {'dim': self.dim, 'ngram_sizes': list(self.ngram_sizes), 'stop_words': sorted(self.stop_words)}
+
+    def _word_id(self, word: str) -> int:
+        """Row of the word's vector in the word vector cache; call with the lock held"""
+        word_id = self._word_ids.get(word)
+        if word_id is None:
+            word_id = len(self._word_ids) + 1
+            if word_id == len(self._word_vectors):
+                self._word_vectors = np.concatenate([self._word_vectors, np.zeros_like(self._word_vectors)])
+            vector = [0] * self.dim
+            padded = f"<{word}>"
+            for gram in [word] + [padded[i:i + n] for n in self.ngram_sizes for i in range(len(padded) - n + 1)]:
+                h = zlib.crc32(gram.encode('utf-8'))
+                vector[h % self.dim] += 1 if h & 0x80000000 else -1
+            self._word_vectors[word_id] = vector
+            self._word_ids[word] = word_id
+        return word_id
+
+    def _words(self, text: str) -> List[str]:
+        return [w for w in WORD.findall(text.lower()) if w not in self.stop_words][:MAX_WORDS]
+
+    def transform(self, texts: Iterable[str]) -> np.ndarray:
+        """Vectorize texts into an (n, dim) float32 matrix with unit-length rows"""
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), BATCH_SIZE):
+            words = [self._words(text) for text in texts[start:start + BATCH_SIZE]]
+            # Word ids padded with the zero row into a (texts, longest text) matrix
+            width = max(map(len, words))
+            if not width:
+                continue
+            with self._lock:
+                if len(self._word_ids) > self.max_cached_words:
+                    self._clear_cache()
+                ids = np.zeros((len(words), width), dtype=np.int32)
+                for row, text_words in enumerate(words):
+                    ids[row, :len(text_words)] = [self._word_id(word) for word in text_words]
+                word_vectors = self._word_vectors
+            # Rows are only ever appended or replaced by a new matrix, so the
+            # gathered snapshot stays valid after the lock is released.
+            # Each text's vector is the sum of its words' vectors; gather in
+            # slices so the (rows, width, dim) intermediate stays small
+            step = max(1, GATHER_BYTES // (width * self.dim * 4))
+            for row in range(0, len(words), step):
+                rows = ids[row:row + step]
+                matrix[start + row:start + row + len(rows)] = word_vectors[rows].sum(axis=1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def transform_one(self, text: str) -> np.ndarray:
+        return self.transform([text])[0]
+
+
+def product_text(product: Dict) -> str:
+    """Text embedded for a product: name, description and keywords"""
+    return " ".join([product.get('name', ''), product.get('description', '')] + list(product.get('keywords', ())))
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(vectors[i:i + BATCH_SIZE] @ centroids.T, axis=1)
+        for i in range(0, len(vectors), BATCH_SIZE)
+    ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+
+def _spherical_kmeans(vectors: np.ndarray, nlist: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        norms = np.linalg.norm(sums, axis=1)
+        empty = norms == 0
+        # Re-seed clusters that lost all their members with random vectors
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        norms[empty] = 1.0
+        centroids = (sums / norms[:, None]).astype(np.float32)
+    return centroids
+
+
+class SemanticIndex:
+    """Inverted-file index of product vectors for approximate nearest-neighbour search"""
+
+    FILES = ('centroids', 'vectors', 'offsets', 'ids')
+
+    def __init__(self, vectorizer: HashingVectorizer, centroids: np.ndarray, vectors: np.ndarray,
+                 offsets: np.ndarray, ids: np.ndarray, catalog_version: str = '', nprobe: int = 16):
+        self.vectorizer = vectorizer
+        self.centroids = centroids
+        self.vectors = vectors  # grouped by list, list i in rows offsets[i]:offsets[i + 1]
+        self.offsets = offsets
+        self.ids = ids
+        self.catalog_version = catalog_version
+        self.nprobe = nprobe
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: Sequence[str], vectors: np.ndarray, vectorizer: HashingVectorizer,
+              nlist: int = None, iterations: int = 10, sample_size: int = 65536, seed: int = 0,
+              catalog_version: str = '', nprobe: int = 16) -> 'SemanticIndex':
+        """Cluster vectors into nlist lists (default about 4 * sqrt(n)) and group them by list"""
+        n = len(ids)
+        rng = np.random.default_rng(seed)
+        nlist = max(1, min(n, nlist or int(4 * np.sqrt(n))))
+        if n:
+            sample = vectors if n <= sample_size else vectors[np.sort(rng.choice(n, sample_size, replace=False))]
+            centroids = _spherical_kmeans(sample, min(nlist, len(sample)), iterations, rng)
+        else:
+            centroids = np.zeros((1, vectorizer.dim), dtype=np.float32)
+        assignment = _nearest(vectors, centroids)
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+        return cls(vectorizer, centroids, np.ascontiguousarray(vectors[order]), offsets,
+                   np.asarray(ids)[order], catalog_version, nprobe)
+
+    @classmethod
+    def from_catalog(cls, catalog: Catalog, vectorizer: HashingVectorizer = None, **options) -> 'SemanticIndex':
+        vectorizer = vectorizer or HashingVectorizer()
+        ids, texts = [], []
+        for product_id, product in catalog.items():
+            ids.append(product_id)
+            texts.append(product_text(product))
+        return cls.build(ids, vectorizer.transform(texts), vectorizer,
+                         catalog_version=catalog.version, **options)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name in self.FILES:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        meta = {'vectorizer': self.vectorizer.config(), 'catalog_version': self.catalog_version,
+                'nprobe': self.nprobe}
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'SemanticIndex':
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r' if mmap else None)
+                  for name in cls.FILES}
+        return cls(HashingVectorizer(**meta['vectorizer']), catalog_version=meta['catalog_version'],
+                   nprobe=meta['nprobe'], **arrays)
+
+    def search(self, text: str, k: int, nprobe: int = None) -> List[Tuple[str, float]]:
+        """Return up to k (product_id, cosine similarity) pairs, most similar first"""
+        query = self.vectorizer.transform_one(text)
+        if not query.any() or not len(self.ids):
+            return []
+        nprobe = min(len(self.centroids), nprobe or self.nprobe)
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = [np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists]
+        sims = [self.vectors[self.offsets[i]:self.offsets[i + 1]] @ query for i in lists]
+        rows, sims = np.concatenate(rows), np.concatenate(sims)
+        if len(sims) > k:
+            best = np.argpartition(-sims, k - 1)[:k]
+            rows, sims = rows[best], sims[best]
+        order = np.argsort(-sims, kind='stable')
+        return [(str(self.ids[r]), float(s)) for r, s in zip(rows[order], sims[order]) if s > 0]
+
+
+def fuse_rankings(keyword_hits: Sequence[Tuple[str, int]], semantic_hits: Sequence[Tuple[str, float]],
+                  semantic_weight: float = 0.5) -> List[Tuple[str, float]]:
+    """Merge two best-first rankings by weighted reciprocal rank fusion
+
+    Returns (product_id, fused score) pairs, best first. A product missing
+    from one ranking only gets the other ranking's contribution.
+    """
+    fused: Dict[str, float] = {}
+    for rank, (product_id, _) in enumerate(keyword_hits):
+        fused[product_id] = (1 - semantic_weight) / (RRF_K + rank + 1)
+    for rank, (product_id, _) in enumerate(semantic_hits):
+        fused[product_id] = fused.get(product_id, 0.0) + semantic_weight / (RRF_K + rank + 1)
+    return sorted(fused.items(), key=lambda item: -item[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a semantic search index for a Describo catalog file")
+    parser.add_argument('catalog', help="catalog file built with python -m describo.catalog")
+    parser.add_argument('output', help="directory to write the index to")
+    parser.add_argument('--dim', type=int, default=128)
+    parser.add_argument('--nlist', type=int, default=None, help="number of clusters (default: 4 * sqrt(products))")
+    parser.add_argument('--nprobe', type=int, default=16, help="clusters scanned per query")
+    args = parser.parse_args()
+
+    index = SemanticIndex.from_catalog(MmapCatalog(args.catalog), HashingVectorizer(dim=args.dim),
+                                       nlist=args.nlist, nprobe=args.nprobe)
+    index.save(args.output)
+    print(f"Indexed {len(index)} products in {len(index.centroids)} lists to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
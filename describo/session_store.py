@@ -0,0 +1,244 @@
+"""Behavioral session stores shared across reruns, reconnects and workers
+
+Sessions are saved as JSON-serializable state dicts keyed by a session id.
+``MemorySessionStore`` keeps them in the current process;
+``SQLiteSessionStore`` keeps them in a SQLite file in WAL mode so several
+worker processes on one host can share them. Both expire idle sessions.
+
+Session ids are issued by the server through ``SessionTokens``: the token a
+browser carries is the id plus an HMAC over it and the client's address and
+User-Agent, so a token copied to another client is rejected instead of
+handing over that session's trust score.
+"""
+import abc
+import hashlib
+import hmac
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+SessionState = Dict[str, Any]
+
+
+class SessionTokens:
+    """Signs server-issued session ids and binds them to one client
+
+    Every worker that should accept the same tokens needs the same secret;
+    without one, a random secret is used and tokens only hold in this process.
+    """
+
+    def __init__(self, secret: str = None):
+        self._secret = secret.encode('utf-8') if secret else secrets.token_bytes(32)
+
+    @staticmethod
+    def binding(address: str = None, user_agent: str = None) -> str:
+        """What a token is tied to: the client's address and browser"""
+        return f"{address or ''}\x1f{user_agent or ''}"
+
+    def _sign(self, session_id: str, binding: str) -> str:
+        message = f"{session_id}\x1f{binding}".encode('utf-8')
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()[:32]
+
+    def issue(self, binding: str) -> str:
+        """New random session id and its token for the client"""
+        session_id = secrets.token_hex(16)
+        return f"{session_id}.{self._sign(session_id, binding)}"
+
+    def verify(self, token: str, binding: str) -> Optional[str]:
+        """Return the session id if the token was issued to this client, else None"""
+        session_id, _, signature = (token or '').partition('.')
+        if not session_id or not signature:
+            return None
+        if not hmac.compare_digest(signature, self._sign(session_id, binding)):
+            return None
+        return session_id
+
+
+class SessionStore(abc.ABC):
+    """Interface for behavioral session persistence"""
+
+    @abc.abstractmethod
+    def load(self, session_id: str) -> Optional[SessionState]:
+        """Return the saved state, or None if the session is unknown or expired"""
+
+    @abc.abstractmethod
+    def save(self, session_id: str, state: SessionState):
+        """Record the latest state; must not block on I/O"""
+
+    @abc.abstractmethod
+    def expire(self) -> int:
+        """Drop idle sessions; returns how many were removed"""
+
+    def flush(self, timeout: float = 10.0):
+        """Wait up to timeout seconds until all saved state is durable"""
+
+    def close(self):
+        self.flush()
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions held in this process, dropped after idle_timeout seconds"""
+
+    def __init__(self, idle_timeout: float = 3600.0, expire_interval: int = 256):
+        self.idle_timeout = idle_timeout
+        self.expire_interval = expire_interval
+        self._sessions: Dict[str, tuple] = {}  # session id -> (updated, state)
+        self._saves = 0
+        self._lock = threading.Lock()
+
+    def load(self, session_id: str) -> Optional[SessionState]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+        if entry is None or time.time() - entry[0] > self.idle_timeout:
+            return None
+        return entry[1]
+
+    def save(self, session_id: str, state: SessionState):
+        with self._lock:
+            self._sessions[session_id] = (time.time(), state)
+            self._saves += 1
+            due = self._saves % self.expire_interval == 0
+        if due:
+            self.expire()
+
+    def expire(self) -> int:
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            idle = [sid for sid, (updated, _) in self._sessions.items() if updated < cutoff]
+            for sid in idle:
+                del self._sessions[sid]
+        return len(idle)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite file, written behind by a background thread
+
+    ``save`` only records the state in a pending buffer, coalescing repeated
+    saves of one session. The writer thread commits the buffer in a single
+    transaction every ``flush_interval`` seconds, or sooner once
+    ``batch_size`` sessions are pending, and periodically deletes idle
+    sessions and checkpoints the WAL.
+    """
+
+    def __init__(self, path: str, idle_timeout: float = 3600.0, flush_interval: float = 0.5,
+                 batch_size: int = 256, compact_interval: float = 300.0):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.compact_interval = compact_interval
+        self._pending: Dict[str, tuple] = {}  # session id -> (updated, state)
+        self._in_flight: Dict[str, tuple] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, state TEXT NOT NULL, updated REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+
+        self._writer = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def load(self, session_id: str) -> Optional[SessionState]:
+        with self._cond:
+            entry = self._pending.get(session_id) or self._in_flight.get(session_id)
+        if entry is None:
+            row = self._reader().execute(
+                "SELECT updated, state FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            entry = (row[0], json.loads(row[1]))
+        if time.time() - entry[0] > self.idle_timeout:
+            return None
+        return entry[1]
+
+    def save(self, session_id: str, state: SessionState):
+        with self._cond:
+            self._pending[session_id] = (time.time(), state)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: Dict[str, tuple]):
+        rows = [(sid, json.dumps(state), updated) for sid, (updated, state) in batch.items()]
+        with conn:
+            conn.executemany(
+                "INSERT INTO sessions (id, state, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET state = excluded.state, updated = excluded.updated "
+                "WHERE excluded.updated >= sessions.updated",
+                rows)
+
+    def _expire(self, conn: sqlite3.Connection) -> int:
+        with conn:
+            removed = conn.execute(
+                "DELETE FROM sessions WHERE updated < ?", (time.time() - self.idle_timeout,)).rowcount
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+
+    def _run(self):
+        conn = self._connect()
+        next_compaction = time.monotonic() + self.compact_interval
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+                closing = self._closed
+            if batch:
+                try:
+                    self._write_batch(conn, batch)
+                except sqlite3.Error:
+                    # Keep the states for the next attempt unless newer ones arrived
+                    with self._cond:
+                        for sid, entry in batch.items():
+                            self._pending.setdefault(sid, entry)
+            with self._cond:
+                self._in_flight = {}
+                self._cond.notify_all()
+            if time.monotonic() >= next_compaction:
+                try:
+                    self._expire(conn)
+                except sqlite3.Error:
+                    pass
+                next_compaction = time.monotonic() + self.compact_interval
+            if closing:
+                conn.close()
+                return
+
+    def expire(self) -> int:
+        self.flush()
+        return self._expire(self._reader())
+
+    def flush(self, timeout: float = 10.0):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify()
+            while (self._pending or self._in_flight) and self._writer.is_alive():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(min(remaining, self.flush_interval))
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
@@ -0,0 +1,168 @@
+"""Content-addressed cache of transcripts"""
+import hashlib
+import json
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Samples at or below this amplitude at either end of a clip are trimmed
+# before hashing, so the same phrase padded with more silence hits the cache
+SILENCE_LEVEL = 64
+# The disk index is rebuilt from a directory scan every this many writes
+DISK_RESCAN_INTERVAL = 64
+
+
+def normalize_pcm(pcm: bytes) -> bytes:
+    """Trim near-silent samples from both ends of 16-bit mono PCM"""
+    samples = array('h')
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % 2])
+    start, end = 0, len(samples)
+    while start < end and abs(samples[start]) <= SILENCE_LEVEL:
+        start += 1
+    while end > start and abs(samples[end - 1]) <= SILENCE_LEVEL:
+        end -= 1
+    return pcm[start * 2:end * 2]
+
+
+class TranscriptCache:
+    """Size-bounded LRU cache of transcripts keyed by a hash of the audio
+
+    Transcripts are always kept in memory; with ``directory`` set they are
+    also stored on disk, one small JSON file per clip, and shared between
+    processes. Disk eviction removes the least recently used files. Each
+    process tracks the files it writes and rescans the directory every
+    ``DISK_RESCAN_INTERVAL`` writes, so ``max_bytes`` caps the directory
+    shared by all processes, overshooting by at most one interval of writes
+    per process.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = 16 * 1024 * 1024,
+                 max_memory_entries: int = 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_memory_entries = max_memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, str]' = OrderedDict()
+        self._disk_sizes: 'OrderedDict[str, int]' = OrderedDict()  # path -> size, oldest first
+        self._disk_bytes = 0
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_disk_index()
+
+    @staticmethod
+    def key(pcm: bytes, **params) -> str:
+        """Hash the normalized audio together with model/language parameters"""
+        digest = hashlib.sha256(normalize_pcm(pcm))
+        digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_disk_index(self):
+        """Replace the disk index with the files every process has written, least recently used first"""
+        entries = []
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.json'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:  # evicted by another process meanwhile
+                        continue
+                    entries.append((stat.st_atime, entry.path, stat.st_size))
+        except OSError:
+            return
+        sizes = OrderedDict((path, size) for _, path, size in sorted(entries))
+        with self._lock:
+            self._disk_sizes = sizes
+            self._disk_bytes = sum(sizes.values())
+
+    def _remember(self, key: str, text: str):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = json.load(f)['text']
+            os.utime(path)  # mark as recently used for eviction
+        except (OSError, ValueError, KeyError):
+            return None
+        with self._lock:
+            if path in self._disk_sizes:
+                self._disk_sizes.move_to_end(path)
+        return text
+
+    def _write_disk(self, key: str, text: str):
+        path = self._path(key)
+        payload = json.dumps({'text': text}).encode('utf-8')
+        temp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except OSError:
+            return
+
+        with self._lock:
+            self._disk_writes += 1
+            rescan = self._disk_writes % DISK_RESCAN_INTERVAL == 0
+        if rescan:
+            self._load_disk_index()
+        with self._lock:
+            self._disk_bytes += len(payload) - self._disk_sizes.pop(path, 0)
+            self._disk_sizes[path] = len(payload)
+            evicted = []
+            while self._disk_bytes > self.max_bytes and len(self._disk_sizes) > 1:
+                old_path, size = self._disk_sizes.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(old_path)
+        for old_path in evicted:
+            try:
+                os.unlink(old_path)
+            except OSError:
+                pass
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached transcript, or None on a miss"""
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return text
+
+        if self.directory:
+            text = self._read_disk(key)
+        with self._lock:
+            if text is None:
+                self.misses += 1
+                return None
+            self._remember(key, text)
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        with self._lock:
+            self._remember(key, text)
+        if self.directory:
+            self._write_disk(key, text)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters, hit rate and occupancy"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate,
+                    'entries': len(self._memory), 'disk_bytes': self._disk_bytes}
@@ -0,0 +1,193 @@
+"""Transcription service wrapping the Groq Whisper endpoint
+
+Calls run on a bounded thread pool with per-call timeouts, retries with
+exponential backoff and full jitter, and a circuit breaker that fails fast
+while the endpoint is down. ``base_url`` can point the client at a local stub
+server standing in for Groq. An optional TranscriptCache short-circuits
+repeated clips.
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Tuple
+
+from describo.transcript_cache import TranscriptCache
+
+# (filename, audio bytes), as accepted by the Groq client
+AudioUpload = Tuple[str, bytes]
+
+
+class TranscriptionError(Exception):
+    """Raised when audio could not be transcribed"""
+
+
+class CircuitOpenError(TranscriptionError):
+    """Raised without calling the endpoint while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Stops calls after repeated failures, then lets one trial call through"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self) -> bool:
+        """Return True if a call may go ahead"""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+
+def _is_retryable(error: Exception) -> bool:
+    # Connection errors and timeouts carry no status code; 429 and 5xx are transient
+    status = getattr(error, 'status_code', None)
+    return status is None or status == 429 or status >= 500
+
+
+class TranscriptionService:
+    """Thread-pooled, rate-limited client for speech-to-text requests"""
+
+    def __init__(self, api_key: str = None, base_url: str = None, model: str = "whisper-large-v3",
+                 language: str = "en", max_concurrency: int = 4, queue_timeout: float = 2.0,
+                 timeout: float = 30.0, max_retries: int = 2, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, breaker: CircuitBreaker = None,
+                 cache: TranscriptCache = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.language = language
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.cache = cache
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="transcribe")
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Groq client, created on first use; its HTTP connection pool is shared by all calls"""
+        with self._client_lock:
+            if self._client is None:
+                from groq import Groq
+                self._client = Groq(api_key=self.api_key, base_url=self.base_url,
+                                    timeout=self.timeout, max_retries=0)
+            return self._client
+
+    def _request(self, upload: AudioUpload) -> str:
+        transcription = self.client.audio.transcriptions.create(
+            file=upload,
+            model=self.model,
+            response_format="json",
+            language=self.language,
+            timeout=self.timeout
+        )
+        return transcription.text
+
+    def _call(self, upload: AudioUpload) -> str:
+        # The breaker counts calls, not attempts: retries of one call are a single failure
+        if not self.breaker.allow():
+            raise CircuitOpenError("Transcription service is temporarily unavailable")
+        for attempt in range(self.max_retries + 1):
+            try:
+                text = self._request(upload)
+            except Exception as e:
+                if not _is_retryable(e):
+                    # The endpoint answered, it just rejected this request (bad audio, bad key)
+                    self.breaker.record_success()
+                    raise TranscriptionError(str(e)) from e
+                if attempt == self.max_retries:
+                    self.breaker.record_failure()
+                    raise TranscriptionError(str(e)) from e
+                # Exponential backoff with full jitter
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+            else:
+                self.breaker.record_success()
+                return text
+
+    def submit(self, upload: AudioUpload) -> 'Future[str]':
+        """Queue a transcription; raises TranscriptionError if every slot stays busy"""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise TranscriptionError("Too many transcriptions in progress, please try again")
+        try:
+            future = self._executor.submit(self._call, upload)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def transcribe(self, upload: AudioUpload, timeout: float = None, pcm: bytes = None) -> str:
+        """Transcribe audio, blocking for at most timeout seconds including retries
+
+        Passing the raw PCM behind the upload lets the cache recognise clips
+        that were transcribed before, whatever container they were encoded in.
+        """
+        key = None
+        if self.cache is not None and pcm is not None:
+            key = self.cache.key(pcm, model=self.model, language=self.language)
+            text = self.cache.get(key)
+            if text is not None:
+                return text
+
+        future = self.submit(upload)
+        try:
+            text = future.result(timeout=timeout)
+        except FutureTimeoutError as e:
+            raise TranscriptionError("Transcription timed out") from e
+
+        if key is not None:
+            self.cache.put(key, text)
+        return text
+
+    async def transcribe_async(self, upload: AudioUpload) -> str:
+        """Transcribe audio without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(upload))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -1,262 +1,339 @@
+import functools
+import math
 import time
 import streamlit as st
 import streamlit.components.v1 as components
-import json
-import re
-from typing import List, Dict, Any
-import requests
-from PIL import Image
-import base64
-import io
-import tempfile
+from typing import Dict
 import os
-from groq import Groq
-import pyaudio
-import wave
-
-# Behavioral-Based Authentication Class
-class BehavioralAuth:
-    def __init__(self):
-        self.session_start = time.time()
-        self.interactions = []
-        self.trust_score = 0  # Base trust score
-        
-    def log_interaction(self, action: str, metadata: Dict = None):
-        """Log user interaction for behavioral analysis"""
-        interaction = {
-            'timestamp': time.time(),
-            'action': action,
-            'metadata': metadata or {}
-        }
-        self.interactions.append(interaction)
-        self.update_trust_score()
-    
-    def update_trust_score(self):
-        """Calculate trust score based on behavioral patterns"""
-        score = 0  # Base score
-        
-        # Time spent on site (up to 30 points)
-        session_time = time.time() - self.session_start
-        time_bonus = min(15, int(session_time / 30))  # 1 point per 30 seconds
-        score += time_bonus
-        
-        # Interaction variety (5 points per unique action type)
-        unique_actions = len(set(i['action'] for i in self.interactions))
-        score += unique_actions * 5
-        
-        # Search behavior (10 points for natural language search)
-        if any(i['action'] == 'search' for i in self.interactions):
-            score += 10
-        
-        # Voice input usage (20 points - hard for bots to fake)
-        if any(i['action'].startswith('voice') for i in self.interactions):
-            score += 20
-        
-        # Penalize rapid-fire actions (bot-like behavior)
-        if len(self.interactions) > 1:
-            recent_interactions = self.interactions[-5:]
-            if len(recent_interactions) >= 3:
-                time_diffs = [recent_interactions[i]['timestamp'] - recent_interactions[i-1]['timestamp'] 
-                             for i in range(1, len(recent_interactions))]
-                if all(diff < 0.5 for diff in time_diffs):  # All actions within 0.5 seconds
-                    score -= 20
-        
-        self.trust_score = min(100, max(0, score))
-    
-    def is_human(self) -> bool:
-        """Determine if user is likely human based on trust score"""
-        return self.trust_score >= 80
+from describo.audio_capture import StreamingRecorder, TARGET_RATE
+from describo.audio_codec import encode_flac, encode_wav
+from describo.behavior import BehavioralAuth
+from describo.bot_guard import BotGuard, client_address as forwarded_client, client_fingerprint, parse_trusted_proxies
+from describo.images import ImageProxy, ThumbnailCache
+from describo.core import TOP_RESULTS, SearchService, analyze_text_description, get_search_service, search_cursor
+from describo.metrics import REGISTRY, MetricsRegistry, timed
+from describo.session_store import MemorySessionStore, SessionStore, SessionTokens, SQLiteSessionStore
+from describo.transcript_cache import TranscriptCache
+from describo.transcription import TranscriptionService
+
 api_key = os.getenv('api_key')
-# Initialize Groq client
-# Make sure to set your GROQ_API_KEY in Streamlit secrets or environment variable
-groq_client = Groq(api_key=api_key)
+
+@st.cache_resource
+def get_transcription_service() -> TranscriptionService:
+    """Create the pooled Groq transcription client once per process"""
+    # Make sure to set your api_key in Streamlit secrets or environment variable;
+    # groq_base_url can point at a stub server standing in for Groq
+    # Transcripts are cached in memory, and on disk too if transcript_cache_dir is set
+    cache = TranscriptCache(directory=os.getenv('transcript_cache_dir'))
+    return TranscriptionService(api_key=api_key, base_url=os.getenv('groq_base_url'), cache=cache)
+
+@st.cache_resource
+def get_session_store() -> SessionStore:
+    """Create the behavioral session store once per process"""
+    # Set session_store_path to share sessions between workers through a SQLite file
+    path = os.getenv('session_store_path')
+    if path:
+        return SQLiteSessionStore(path)
+    return MemorySessionStore()
+
+@st.cache_resource
+def get_session_tokens() -> SessionTokens:
+    """Create the session id signer once per process"""
+    # Set session_secret to the same value on every worker sharing session_store_path
+    secret = os.getenv('session_secret')
+    if os.getenv('session_store_path') and not secret:
+        # A random per-process secret would reject every token issued by another worker or before a restart
+        raise ValueError("session_store_path is set but session_secret is not; "
+                         "set session_secret to the same random value on every worker")
+    return SessionTokens(secret)
+
+# Proxies whose X-Forwarded-For is believed, e.g. "10.0.0.0/8,127.0.0.1"
+TRUSTED_PROXIES = parse_trusted_proxies(os.getenv('trusted_proxies'))
+
+def client_address() -> str:
+    """Address of the client, read from X-Forwarded-For only behind a trusted proxy"""
+    peer = getattr(st.context, 'ip_address', None) or ''
+    return forwarded_client(peer, st.context.headers.get('X-Forwarded-For'), TRUSTED_PROXIES)
+
+def get_session_id() -> str:
+    """Server-issued id for this browser session, kept in the URL so it survives reconnects
+
+    The sid token is signed for this client's address and browser; a token
+    issued to anyone else (a shared link, a replayed URL) starts a new session.
+    """
+    tokens = get_session_tokens()
+    binding = SessionTokens.binding(client_address(), st.context.headers.get('User-Agent'))
+    session_id = tokens.verify(st.query_params.get('sid'), binding)
+    if session_id is None:
+        token = tokens.issue(binding)
+        st.query_params['sid'] = token
+        session_id = tokens.verify(token, binding)
+    return session_id
+
+def load_behavioral_auth(session_id: str) -> BehavioralAuth:
+    """Restore the session's behavioral state, possibly saved by another worker"""
+    state = get_session_store().load(session_id)
+    return BehavioralAuth.from_dict(state) if state else BehavioralAuth()
+
+def log_interaction(action: str, metadata: Dict = None):
+    """Log an interaction and save the updated session without waiting on I/O"""
+    auth = st.session_state.behavioral_auth
+    was_human = auth.is_human()
+    auth.log_interaction(action, metadata)
+    get_session_store().save(st.session_state.session_id, auth.to_dict())
+    if auth.is_human() != was_human:
+        st.session_state.trust_changed = True
+
+def rerun_app_on_trust_change(fragment):
+    """Rerun the whole app when the human verdict flips during a fragment run
+
+    The checkout is drawn outside the fragments, so it would otherwise show
+    the old verdict until the next full run.
+    """
+    @functools.wraps(fragment)
+    def run(*args, **kwargs):
+        # A change made earlier in a full run is drawn by that same run
+        st.session_state.pop('trust_changed', None)
+        try:
+            return fragment(*args, **kwargs)
+        finally:
+            if st.session_state.pop('trust_changed', False):
+                st.rerun()
+    return run
+
+@st.cache_resource
+def get_bot_guard() -> BotGuard:
+    """Create the rate and bot detector once per process, shared by all sessions"""
+    return BotGuard()
+
+# A transcription uses Groq quota, so it costs as much as several searches
+TRANSCRIBE_COST = 5.0
+
+def request_allowed(cost: float = 1.0) -> bool:
+    """Check the client against the bot guard before spending search or transcription work"""
+    headers = st.context.headers
+    address = client_address()
+    fingerprint = client_fingerprint(address, headers.get('User-Agent'), headers.get('Accept-Language'))
+    decision = get_bot_guard().check_client(address, fingerprint, cost)
+    if not decision.allowed:
+        st.warning(f"Too many requests. Please wait {math.ceil(decision.retry_after)} seconds and try again.")
+    return decision.allowed
+
+@st.cache_resource
+def get_image_proxy() -> ImageProxy:
+    """Create the image fetcher and thumbnail cache once per process"""
+    # Set image_cache_dir to keep thumbnails across restarts and share them between workers
+    return ImageProxy(ThumbnailCache(directory=os.getenv('image_cache_dir')))
+
+def show_image(url: str, width: int, **kwargs):
+    """Show a cached thumbnail of url, or the remote image if it cannot be fetched"""
+    st.image(get_image_proxy().thumbnail(url, width) or url, width=width, **kwargs)
+
+@st.cache_resource
+def start_metrics_export() -> MetricsRegistry:
+    """Start the stage latency exporters once per process"""
+    # metrics_port serves Prometheus text at /metrics; metrics_file is rewritten every 15 seconds
+    metrics_port = os.getenv('metrics_port')
+    if metrics_port:
+        REGISTRY.start_http_server(int(metrics_port))
+    metrics_file = os.getenv('metrics_file')
+    if metrics_file:
+        REGISTRY.start_file_dump(metrics_file)
+    return REGISTRY
+
+# Upper bound on a transcription, retries included
+TRANSCRIBE_TIMEOUT = 60
 
 # Audio recording parameters
 CHUNK = 1024
-FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 44100
+# Recordings are downsampled to 16 kHz mono before upload
+TRANSCRIBE_RATE = TARGET_RATE
+MAX_RECORDING_SECONDS = 15
+# Set audio_format=flac to upload losslessly compressed audio instead of WAV
+AUDIO_FORMAT = os.getenv('audio_format', 'wav').lower()
 
-# Mock product database - in a real app, this would be a proper database
-MOCK_PRODUCTS = {
-    "camping_cot": {
-        "name": "Portable Camping Cot",
-        "description": "Lightweight foldable sleeping cot for camping",
-        "price": "$89.99",
-        "rating": 4.3,
-        "availability": "In Stock",
-        "image_url": "https://via.placeholder.com/300x200?text=Camping+Cot",
-        "keywords": ["foldable", "sleep", "camping", "cot", "portable", "bed", "outdoor"]
-    },
-    "water_purifier": {
-        "name": "Portable Water Purifier Bottle",
-        "description": "Water filter bottle for hiking and camping",
-        "price": "$34.99",
-        "rating": 4.7,
-        "availability": "In Stock",
-        "image_url": "https://via.placeholder.com/300x200?text=Water+Filter",
-        "keywords": ["water", "filter", "purifier", "bottle", "hiking", "camping", "portable", "drink"]
-    },
-    "headlamp": {
-        "name": "LED Headlamp",
-        "description": "Rechargeable LED headlamp for outdoor activities",
-        "price": "$24.99",
-        "rating": 4.5,
-        "availability": "In Stock",
-        "image_url": "https://via.placeholder.com/300x200?text=LED+Headlamp",
-        "keywords": ["light", "head", "camping", "hands-free", "led", "flashlight", "outdoor"]
-    },
-    "camping_chair": {
-        "name": "Folding Camping Chair",
-        "description": "Lightweight portable chair for outdoor use",
-        "price": "$45.99",
-        "rating": 4.2,
-        "availability": "In Stock",
-        "image_url": "https://via.placeholder.com/300x200?text=Camping+Chair",
-        "keywords": ["chair", "folding", "portable", "camping", "outdoor", "seat", "lightweight"]
-    },
-    "tent": {
-        "name": "4-Person Camping Tent",
-        "description": "Waterproof dome tent for family camping",
-        "price": "$129.99",
-        "rating": 4.6,
-        "availability": "In Stock",
-        "image_url": "https://via.placeholder.com/300x200?text=Camping+Tent",
-        "keywords": ["tent", "camping", "shelter", "waterproof", "family", "dome", "outdoor"]
-    },
-    "sleeping_bag": {
-        "name": "Mummy Sleeping Bag",
-        "description": "Warm sleeping bag for cold weather camping",
-        "price": "$79.99",
-        "rating": 4.4,
-        "availability": "In Stock",
-        "image_url": "https://via.placeholder.com/300x200?text=Sleeping+Bag",
-        "keywords": ["sleeping", "bag", "warm", "camping", "cold", "weather", "mummy", "outdoor"]
-    }
-}
-
-def analyze_text_description(description: str) -> List[str]:
-    """Extract keywords from text description using simple NLP"""
-    # Convert to lowercase and remove punctuation
-    text = re.sub(r'[^\w\s]', '', description.lower())
-    
-    # Common words to ignore
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'i', 'need', 'want', 'looking', 'that', 'thing', 'stuff', 'item'}
-    
-    # Extract words
-    words = [word for word in text.split() if word not in stop_words and len(word) > 2]
-    
-    # Add some synonym mapping for better matching
-    synonyms = {
-        'foldable': ['fold', 'collapsible', 'portable'],
-        'bottle': ['container', 'flask'],
-        'light': ['lamp', 'flashlight', 'torch'],
-        'bed': ['cot', 'sleeping'],
-        'chair': ['seat'],
-        'water': ['drink', 'liquid'],
-        'filter': ['purifier', 'clean']
-    }
-    
-    # Expand with synonyms
-    expanded_words = words.copy()
-    for word in words:
-        if word in synonyms:
-            expanded_words.extend(synonyms[word])
-    
-    return expanded_words
-
-def search_products(keywords: List[str]) -> List[Dict[str, Any]]:
-    """Search products based on keywords"""
-    results = []
-    
-    for product_id, product in MOCK_PRODUCTS.items():
-        score = 0
-        
-        # Calculate relevance score
-        for keyword in keywords:
-            if keyword in product['keywords']:
-                score += 2
-            elif any(keyword in prod_keyword for prod_keyword in product['keywords']):
-                score += 1
-            elif keyword in product['name'].lower():
-                score += 3
-            elif keyword in product['description'].lower():
-                score += 1
-        
-        if score > 0:
-            product_copy = product.copy()
-            product_copy['score'] = score
-            results.append(product_copy)
-    
-    # Sort by relevance score
-    results.sort(key=lambda x: x['score'], reverse=True)
-    return results
+def start_recording(max_duration=MAX_RECORDING_SECONDS):
+    """Start recording in the background; capture ends by itself after a pause in speech"""
+    try:
+        with timed('record_start'):
+            recorder = StreamingRecorder(max_duration=max_duration,
+                                         input_rate=RATE,
+                                         channels=CHANNELS,
+                                         chunk=CHUNK)
+            recorder.start()
+        return recorder
+    except Exception as e:
+        st.error(f"Error recording audio: {str(e)}")
+        return None
 
-def record_audio(duration=5):
-    """Record audio for specified duration"""
+def stop_recording(recorder):
+    """Stop a background recording and return its 16 kHz mono PCM"""
     try:
-        audio = pyaudio.PyAudio()
-        
-        # Start recording
-        stream = audio.open(format=FORMAT,
-                          channels=CHANNELS,
-                          rate=RATE,
-                          input=True,
-                          frames_per_buffer=CHUNK)
-        
-        st.info(f"🎤 Recording for {duration} seconds... Speak now!")
-        
-        frames = []
-        for i in range(0, int(RATE / CHUNK * duration)):
-            data = stream.read(CHUNK)
-            frames.append(data)
-        
-        # Stop recording
-        stream.stop_stream()
-        stream.close()
-        audio.terminate()
-        
-        return frames
+        with timed('record_stop'):
+            pcm = recorder.stop()
+        return pcm or None
     except Exception as e:
         st.error(f"Error recording audio: {str(e)}")
         return None
 
-def save_audio_to_file(frames):
-    """Save recorded audio frames to a temporary WAV file"""
+def encode_audio(pcm):
+    """Encode recorded PCM in memory, returning an upload (filename, bytes) pair"""
     try:
-        # Create temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        
-        # Save audio to file
-        wf = wave.open(temp_file.name, 'wb')
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(pyaudio.PyAudio().get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b''.join(frames))
-        wf.close()
-        
-        return temp_file.name
+        with timed('encode_audio'):
+            if AUDIO_FORMAT == 'flac':
+                return "recording.flac", encode_flac(pcm, TRANSCRIBE_RATE)
+            return "recording.wav", encode_wav(pcm, TRANSCRIBE_RATE)
     except Exception as e:
-        st.error(f"Error saving audio file: {str(e)}")
+        st.error(f"Error encoding audio: {str(e)}")
         return None
 
-def transcribe_with_groq(audio_file_path):
+def transcribe_with_groq(audio_upload, pcm=None):
     """Transcribe audio using Groq API"""
     try:
-        with open(audio_file_path, "rb") as file:
-            transcription = groq_client.audio.transcriptions.create(
-                file=(audio_file_path, file.read()),
-                model="whisper-large-v3",
-                response_format="json",
-                language="en"
-            )
-        
-        return transcription.text
+        with timed('transcribe'):
+            return get_transcription_service().transcribe(audio_upload, timeout=TRANSCRIBE_TIMEOUT, pcm=pcm)
     except Exception as e:
         st.error(f"Error transcribing audio: {str(e)}")
         return None
 
 
+# Button callbacks run before the rerun they trigger, so the new state is
+# drawn without a second st.rerun()
+def begin_recording():
+    """Start a background recording from the Start Recording button"""
+    recorder = start_recording()
+    if recorder:
+        st.session_state.recorder = recorder
+        st.session_state.is_recording = True
+
+def clear_voice_text():
+    st.session_state.voice_text = ""
+    st.session_state.voice_display = ""
+
+def show_results(start: int, count: int):
+    """Show count results from 0-based rank start"""
+    st.session_state.results_start = start
+    st.session_state.results_count = count
+
+@st.cache_resource
+def warm_search_service() -> SearchService:
+    """Build the search indexes once per process, before the first search"""
+    service = get_search_service()
+    service.warm()
+    return service
+
+
+# Voice input HTML component with improved implementation; a constant so
+# reruns do not rebuild it
+VOICE_HTML = """
+<div id="voice-container">
+    <style>
+        .voice-status {
+            padding: 10px;
+            margin: 10px 0;
+            border-radius: 5px;
+            text-align: center;
+            font-weight: bold;
+        }
+        .recording { background-color: #ffebee; color: #c62828; }
+        .ready { background-color: #e8f5e8; color: #2e7d32; }
+        .error { background-color: #fff3e0; color: #ef6c00; }
+    </style>
+    <div id="status" class="voice-status ready">Ready to record</div>
+    <script>
+        let recognition = null;
+        let isRecording = false;
+        let finalTranscript = '';
+        
+        const statusDiv = document.getElementById('status');
+        
+        // Check if browser supports speech recognition
+        if ('webkitSpeechRecognition' in window || 'SpeechRecognition' in window) {
+            const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
+            recognition = new SpeechRecognition();
+            
+            recognition.continuous = true;
+            recognition.interimResults = true;
+            recognition.lang = 'en-US';
+            
+            recognition.onstart = function() {
+                isRecording = true;
+                statusDiv.innerHTML = '🔴 Recording... Speak now!';
+                statusDiv.className = 'voice-status recording';
+            };
+            
+            recognition.onresult = function(event) {
+                let interimTranscript = '';
+                
+                for (let i = event.resultIndex; i < event.results.length; i++) {
+                    const transcript = event.results[i][0].transcript;
+                    if (event.results[i].isFinal) {
+                        finalTranscript += transcript + ' ';
+                    } else {
+                        interimTranscript += transcript;
+                    }
+                }
+                
+                // Send the transcript to Streamlit
+                const fullTranscript = finalTranscript + interimTranscript;
+                window.parent.postMessage({
+                    type: 'voice_transcript',
+                    transcript: fullTranscript
+                }, '*');
+            };
+            
+            recognition.onerror = function(event) {
+                console.error('Speech recognition error:', event.error);
+                statusDiv.innerHTML = '❌ Error: ' + event.error;
+                statusDiv.className = 'voice-status error';
+                isRecording = false;
+            };
+            
+            recognition.onend = function() {
+                isRecording = false;
+                statusDiv.innerHTML = '✅ Recording stopped';
+                statusDiv.className = 'voice-status ready';
+            };
+        } else {
+            statusDiv.innerHTML = '❌ Speech recognition not supported in this browser';
+            statusDiv.className = 'voice-status error';
+        }
+        
+        function startRecording() {
+            if (recognition && !isRecording) {
+                finalTranscript = '';
+                recognition.start();
+                return true;
+            }
+            return false;
+        }
+        
+        function stopRecording() {
+            if (recognition && isRecording) {
+                recognition.stop();
+                return true;
+            }
+            return false;
+        }
+        
+        function clearTranscript() {
+            finalTranscript = '';
+            window.parent.postMessage({
+                type: 'voice_transcript',
+                transcript: ''
+            }, '*');
+        }
+        
+        // Make functions available globally
+        window.startRecording = startRecording;
+        window.stopRecording = stopRecording;
+        window.clearTranscript = clearTranscript;
+    </script>
+</div>
+"""
+
 # Streamlit App Configuration (must be first)
 st.set_page_config(
     page_title="Describo - Product Discovery Assistant",
@@ -264,10 +341,236 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.fragment
+@rerun_app_on_trust_change
+def voice_panel():
+    """Voice input tab; its buttons rerun only this panel"""
+    st.info("🎤 Voice Input - Speak Your Product Description")
+    
+    # Initialize session state for voice input
+    if 'voice_text' not in st.session_state:
+        st.session_state.voice_text = ""
+    
+    # Voice input interface
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        # Display current voice text
+        voice_text_display = st.text_area(
+            "Speech Recognition Output:",
+            value=st.session_state.voice_text,
+            height=100,
+            key="voice_display",
+            help="This will show what you speak"
+        )
+    
+    with col2:
+        st.write("**Instructions:**")
+        st.write("1. Click 'Start Recording'")
+        st.write("2. Speak clearly into your microphone")
+        st.write("3. Pause, then click 'Stop Recording'")
+        st.write("4. Review the text and search")
+    
+    # Inject the HTML/JavaScript
+    components.html(VOICE_HTML, height=150)
+    
+    # Control buttons
+    col1, col2, col3 = st.columns([1, 1, 1])
+    
+    with col1:
+        st.button("🎤 Start Recording", key="start_recording", disabled=st.session_state.is_recording,
+                  on_click=begin_recording)
+    
+    with col2:
+        if st.button("⏹️ Stop Recording", key="stop_recording"):
+            log_interaction('voice_stop')
+            recorder = st.session_state.pop('recorder', None)
+            pcm = stop_recording(recorder) if recorder else None
+            
+            status = []
+            if pcm:
+                # Encode in memory, nothing is written to disk
+                audio_upload = encode_audio(pcm)
+                
+                if audio_upload and request_allowed(TRANSCRIBE_COST):
+                    # Transcribe using Groq
+                    with st.spinner("Transcribing audio..."):
+                        transcribed_text = transcribe_with_groq(audio_upload, pcm=pcm)
+                    
+                    if transcribed_text:
+                        st.session_state.voice_text = transcribed_text
+                        status.append(('success', "✅ Transcription completed!"))
+                    else:
+                        status.append(('error', "❌ Transcription failed!"))
+                elif audio_upload:
+                    status.append(('warning', "Too many requests. Please wait a moment and try again."))
+            status.append(('info', "Recording stopped. Check the text area above for results."))
+            
+            # Kept for the rerun, which redraws the text area and the Start button
+            st.session_state.voice_status = status
+            st.session_state.is_recording = False
+            st.rerun(scope="fragment")
+        
+        for kind, message in st.session_state.pop('voice_status', []):
+            getattr(st, kind)(message)
+    
+    with col3:
+        st.button("🗑️ Clear", key="clear_voice", on_click=clear_voice_text)
+    
+    # Recording status
+    recorder = st.session_state.get('recorder')
+    if st.session_state.is_recording and recorder:
+        if recorder.is_active:
+            st.info("🎤 Recording... Speak now! It stops by itself when you pause.")
+        else:
+            st.info(f"✅ Captured {recorder.duration:.1f}s of audio. Click 'Stop Recording' to transcribe.")
+    
+    # Manual text input as fallback
+    st.markdown("---")
+    st.write("**Or type manually:**")
+    manual_voice_input = st.text_input(
+        "Type your product description here:",
+        key="manual_voice_input",
+        placeholder="e.g., 'I need that foldable thing people sleep on during camping'"
+    )
+    
+    # Search button for voice input
+    if st.button("🔍 Search from Voice/Text", type="primary", key="search_voice"):
+        search_text = voice_text_display.strip() or manual_voice_input.strip()
+        if search_text:
+            log_interaction('voice_search', metadata={'query_length': len(search_text)})
+            if request_allowed():
+                with st.spinner("Analyzing your input..."):
+                    keywords = analyze_text_description(search_text)
+                    st.session_state.search_cursor = search_cursor(keywords, query=search_text)
+                    st.session_state.results_start = 0
+                    st.session_state.results_count = TOP_RESULTS
+                    st.session_state.search_keywords = keywords
+                    st.session_state.voice_text = search_text
+                    # The results and keywords are drawn outside this fragment
+                    st.rerun()
+        else:
+            st.warning("Please provide voice input or type your description!")
+    
+    # Browser compatibility and tips
+    st.markdown("---")
+    st.caption("📱 **Browser Support**: Works best in Chrome, Edge, and Safari. Make sure to allow microphone access when prompted.")
+    st.caption("💡 **Tips**: Speak clearly and wait a moment after speaking for the best results.")
+
+
+@st.fragment
+@rerun_app_on_trust_change
+def render_results():
+    """Current page of search results; paging reruns only this list"""
+    if hasattr(st.session_state, 'search_cursor') and st.session_state.search_cursor:
+        st.header("🎯 Search Results")
+        
+        # Only the shown slice of the ranking is read from the catalog
+        cursor = st.session_state.search_cursor
+        results_start = st.session_state.get('results_start', 0)
+        results_count = st.session_state.get('results_count', TOP_RESULTS)
+        hits = cursor.fetch(results_start, results_start + results_count)
+        
+        if not hits:
+            st.warning("No products found matching your description. Try different keywords!")
+        else:
+            st.caption(f"Showing {hits[0].rank}-{hits[-1].rank} of {cursor.total} matching products")
+            # Fetch the page's thumbnails side by side, then warm the next page in the background
+            image_proxy = get_image_proxy()
+            image_proxy.prefetch([hit.product['image_url'] for hit in hits], 150, timeout=image_proxy.timeout)
+            next_hits = cursor.fetch(results_start + results_count, results_start + results_count + TOP_RESULTS)
+            image_proxy.prefetch([hit.product['image_url'] for hit in next_hits], 150, block=False)
+            with timed('render_results'):
+                for hit in hits:
+                    product = hit.product
+                    with st.container():
+                        col1, col2, col3 = st.columns([1, 2, 1])
+                    
+                        with col1:
+                            show_image(product['image_url'], 150)
+                    
+                        with col2:
+                            st.subheader(product['name'])
+                            st.write(product['description'])
+                        
+                            # Rating stars
+                            stars = "⭐" * int(product['rating'])
+                            st.write(f"{stars} {product['rating']}/5")
+                        
+                            # Relevance score (for demo)
+                            st.caption(f"Relevance Score: {hit.score}")
+                            if hit.similarity is not None:
+                                st.caption(f"Semantic Similarity: {hit.similarity:.2f}")
+                    
+                        with col3:
+                            st.metric("Price", product['price'])
+                        
+                            if product['availability'] == "In Stock":
+                                st.success("✅ In Stock")
+                            else:
+                                st.error("❌ Out of Stock")
+                        
+                            if st.button(f"View Details", key=f"view_{hit.rank}"):
+                                log_interaction('product_view', metadata={'product_rank': hit.rank})
+                
+                    st.divider()
+        
+        results_end = results_start + results_count
+        nav_previous, nav_more, nav_next = st.columns([1, 1, 1])
+        with nav_previous:
+            st.button("⬅️ Previous", disabled=results_start == 0, on_click=show_results,
+                      args=(max(0, results_start - TOP_RESULTS), TOP_RESULTS))
+        with nav_more:
+            st.button("➕ Load More", disabled=results_end >= len(cursor), on_click=show_results,
+                      args=(results_start, results_count + TOP_RESULTS))
+        with nav_next:
+            st.button("Next ➡️", disabled=results_end >= len(cursor), on_click=show_results,
+                      args=(results_end, TOP_RESULTS))
+
+
+@st.fragment
+def analytics_dashboard():
+    """Admin view of the session's behavioral signals and server latency"""
+    with st.expander("📊 Behavioral Analytics Dashboard (Admin View)"):
+        # Reruns only the dashboard
+        st.button("🔄 Refresh", key="refresh_dashboard")
+        st.write("**User Interaction Timeline:**")
+        
+        if st.session_state.behavioral_auth.interactions:
+            for i, interaction in enumerate(st.session_state.behavioral_auth.interactions[-10:]):  # Show last 10
+                time_elapsed = interaction['timestamp'] - st.session_state.behavioral_auth.session_start
+                st.write(f"• {interaction['action']} at {time_elapsed:.1f}s")
+        
+        st.write("**Trust Score Breakdown:**")
+        st.write(f"• Base Score: 0")
+        st.write(f"• Session Time Bonus: +{min(15, int((time.time() - st.session_state.behavioral_auth.session_start) / 4))}")
+        st.write(f"• Interaction Variety: +{len(st.session_state.behavioral_auth.action_counts) * 5}")
+        st.write(f"• Search Behavior: +{15 if st.session_state.behavioral_auth.has_search else 0}")
+        st.write(f"• Voice Input: +{20 if st.session_state.behavioral_auth.has_voice else 0}")
+        
+        st.metric("Final Trust Score", f"{st.session_state.behavioral_auth.trust_score}/100")
+        
+        st.write("**Request Latency (this server process):**")
+        latency = REGISTRY.snapshot()
+        if latency:
+            st.table([{
+                'Stage': stage,
+                'Calls': stats['count'],
+                'p50 (ms)': f"{stats['p50_ms']:.1f}",
+                'p95 (ms)': f"{stats['p95_ms']:.1f}",
+                'p99 (ms)': f"{stats['p99_ms']:.1f}",
+                'Errors': f"{stats['error_rate']:.1%}",
+            } for stage, stats in latency.items()])
+
+
 def main():
+    start_metrics_export()
+    warm_search_service()
+    
     # Initialize Behavioral Auth in session state
     if 'behavioral_auth' not in st.session_state:
-        st.session_state.behavioral_auth = BehavioralAuth()
+        st.session_state.session_id = get_session_id()
+        st.session_state.behavioral_auth = load_behavioral_auth(st.session_state.session_id)
     
     # Header
     st.title("🧩 Describo - Product Discovery Assistant")
@@ -294,7 +597,7 @@ def main():
             if st.button(f"Example {i+1}", key=f"example_{i}"):
                 st.session_state.text_input = example
                 # Log example usage
-                st.session_state.behavioral_auth.log_interaction('example_click', metadata={'example': i})
+                log_interaction('example_click', metadata={'example': i})
     
     # Main content area
     col1, col2 = st.columns([2, 1])
@@ -316,228 +619,19 @@ def main():
             if st.button("🔍 Search", type="primary"):
                 if text_input:
                     # Log search interaction
-                    st.session_state.behavioral_auth.log_interaction('search', metadata={'query_length': len(text_input), 'input_type': 'text'})
+                    log_interaction('search', metadata={'query_length': len(text_input), 'input_type': 'text'})
                     
-                    with st.spinner("Analyzing your description..."):
-                        keywords = analyze_text_description(text_input)
-                        results = search_products(keywords)
-                        
-                        st.session_state.search_results = results
-                        st.session_state.search_keywords = keywords
-                        st.rerun()
+                    if request_allowed():
+                        with st.spinner("Analyzing your description..."):
+                            keywords = analyze_text_description(text_input)
+                            st.session_state.search_cursor = search_cursor(keywords, query=text_input)
+                            st.session_state.results_start = 0
+                            st.session_state.results_count = TOP_RESULTS
+                            st.session_state.search_keywords = keywords
         
         with tab2:
-            st.info("🎤 Voice Input - Speak Your Product Description")
-            
-            # Initialize session state for voice input
-            if 'voice_text' not in st.session_state:
-                st.session_state.voice_text = ""
-            
-            # Voice input interface
-            col1, col2 = st.columns([1, 1])
-            
-            with col1:
-                # Display current voice text
-                voice_text_display = st.text_area(
-                    "Speech Recognition Output:",
-                    value=st.session_state.voice_text,
-                    height=100,
-                    key="voice_display",
-                    help="This will show what you speak"
-                )
-            
-            with col2:
-                st.write("**Instructions:**")
-                st.write("1. Click 'Start Recording'")
-                st.write("2. Speak clearly into your microphone")
-                st.write("3. Click 'Stop Recording' when done")
-                st.write("4. Review the text and search")
-            
-            # Voice input HTML component with improved implementation
-            voice_html = """
-            <div id="voice-container">
-                <style>
-                    .voice-status {
-                        padding: 10px;
-                        margin: 10px 0;
-                        border-radius: 5px;
-                        text-align: center;
-                        font-weight: bold;
-                    }
-                    .recording { background-color: #ffebee; color: #c62828; }
-                    .ready { background-color: #e8f5e8; color: #2e7d32; }
-                    .error { background-color: #fff3e0; color: #ef6c00; }
-                </style>
-                <div id="status" class="voice-status ready">Ready to record</div>
-                <script>
-                    let recognition = null;
-                    let isRecording = false;
-                    let finalTranscript = '';
-                    
-                    const statusDiv = document.getElementById('status');
-                    
-                    // Check if browser supports speech recognition
-                    if ('webkitSpeechRecognition' in window || 'SpeechRecognition' in window) {
-                        const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
-                        recognition = new SpeechRecognition();
-                        
-                        recognition.continuous = true;
-                        recognition.interimResults = true;
-                        recognition.lang = 'en-US';
-                        
-                        recognition.onstart = function() {
-                            isRecording = true;
-                            statusDiv.innerHTML = '🔴 Recording... Speak now!';
-                            statusDiv.className = 'voice-status recording';
-                        };
-                        
-                        recognition.onresult = function(event) {
-                            let interimTranscript = '';
-                            
-                            for (let i = event.resultIndex; i < event.results.length; i++) {
-                                const transcript = event.results[i][0].transcript;
-                                if (event.results[i].isFinal) {
-                                    finalTranscript += transcript + ' ';
-                                } else {
-                                    interimTranscript += transcript;
-                                }
-                            }
-                            
-                            // Send the transcript to Streamlit
-                            const fullTranscript = finalTranscript + interimTranscript;
-                            window.parent.postMessage({
-                                type: 'voice_transcript',
-                                transcript: fullTranscript
-                            }, '*');
-                        };
-                        
-                        recognition.onerror = function(event) {
-                            console.error('Speech recognition error:', event.error);
-                            statusDiv.innerHTML = '❌ Error: ' + event.error;
-                            statusDiv.className = 'voice-status error';
-                            isRecording = false;
-                        };
-                        
-                        recognition.onend = function() {
-                            isRecording = false;
-                            statusDiv.innerHTML = '✅ Recording stopped';
-                            statusDiv.className = 'voice-status ready';
-                        };
-                    } else {
-                        statusDiv.innerHTML = '❌ Speech recognition not supported in this browser';
-                        statusDiv.className = 'voice-status error';
-                    }
-                    
-                    function startRecording() {
-                        if (recognition && !isRecording) {
-                            finalTranscript = '';
-                            recognition.start();
-                            return true;
-                        }
-                        return false;
-                    }
-                    
-                    function stopRecording() {
-                        if (recognition && isRecording) {
-                            recognition.stop();
-                            return true;
-                        }
-                        return false;
-                    }
-                    
-                    function clearTranscript() {
-                        finalTranscript = '';
-                        window.parent.postMessage({
-                            type: 'voice_transcript',
-                            transcript: ''
-                        }, '*');
-                    }
-                    
-                    // Make functions available globally
-                    window.startRecording = startRecording;
-                    window.stopRecording = stopRecording;
-                    window.clearTranscript = clearTranscript;
-                </script>
-            </div>
-            """
-            
-            # Inject the HTML/JavaScript
-            components.html(voice_html, height=150)
-            
-            # Control buttons
-            col1, col2, col3 = st.columns([1, 1, 1])
-            
-            with col1:
-                if st.button("🎤 Start Recording", key="start_recording", disabled=st.session_state.is_recording):
-                    st.session_state.is_recording = True
-                    
-                    # Record audio
-                    frames = record_audio(duration=5)
-                    
-                    if frames:
-                        # Save to temporary file
-                        audio_file = save_audio_to_file(frames)
-                        
-                        if audio_file:
-                            # Transcribe using Groq
-                            with st.spinner("Transcribing audio..."):
-                                transcribed_text = transcribe_with_groq(audio_file)
-                                
-                                if transcribed_text:
-                                    st.session_state.voice_text = transcribed_text
-                                    st.success("✅ Transcription completed!")
-                                else:
-                                    st.error("❌ Transcription failed!")
-                            
-                            # Clean up temporary file
-                            try:
-                                os.unlink(audio_file)
-                            except:
-                                pass
-                    
-                    st.session_state.is_recording = False
-                    st.rerun()
-            
-            with col2:
-                if st.button("⏹️ Stop Recording", key="stop_recording"):
-                    st.session_state.behavioral_auth.log_interaction('voice_stop')
-                    st.info("Recording stopped. Check the text area above for results.")
-            
-            with col3:
-                if st.button("🗑️ Clear", key="clear_voice"):
-                    st.session_state.voice_text = ""
-                    st.rerun()
-            
-            # Manual text input as fallback
-            st.markdown("---")
-            st.write("**Or type manually:**")
-            manual_voice_input = st.text_input(
-                "Type your product description here:",
-                key="manual_voice_input",
-                placeholder="e.g., 'I need that foldable thing people sleep on during camping'"
-            )
-            
-            # Search button for voice input
-            if st.button("🔍 Search from Voice/Text", type="primary", key="search_voice"):
-                search_text = voice_text_display.strip() or manual_voice_input.strip()
-                if search_text:
-                    st.session_state.behavioral_auth.log_interaction('voice_search', metadata={'query_length': len(search_text)})
-                    with st.spinner("Analyzing your input..."):
-                        keywords = analyze_text_description(search_text)
-                        results = search_products(keywords)
-                        
-                        st.session_state.search_results = results
-                        st.session_state.search_keywords = keywords
-                        st.session_state.voice_text = search_text
-                        st.rerun()
-                else:
-                    st.warning("Please provide voice input or type your description!")
-            
-            # Browser compatibility and tips
-            st.markdown("---")
-            st.caption("📱 **Browser Support**: Works best in Chrome, Edge, and Safari. Make sure to allow microphone access when prompted.")
-            st.caption("💡 **Tips**: Speak clearly and wait a moment after speaking for the best results.")
-    
+            voice_panel()
+
     with col2:
         st.header("📊 How It Works")
         st.markdown("""
@@ -553,45 +647,10 @@ def main():
             st.write(", ".join(st.session_state.search_keywords))
     
     # Search results
-    if hasattr(st.session_state, 'search_results') and st.session_state.search_results:
-        st.header("🎯 Search Results")
-        
-        if not st.session_state.search_results:
-            st.warning("No products found matching your description. Try different keywords!")
-        else:
-            for i, product in enumerate(st.session_state.search_results[:5]):  # Show top 5 results
-                with st.container():
-                    col1, col2, col3 = st.columns([1, 2, 1])
-                    
-                    with col1:
-                        st.image(product['image_url'], width=150)
-                    
-                    with col2:
-                        st.subheader(product['name'])
-                        st.write(product['description'])
-                        
-                        # Rating stars
-                        stars = "⭐" * int(product['rating'])
-                        st.write(f"{stars} {product['rating']}/5")
-                        
-                        # Relevance score (for demo)
-                        st.caption(f"Relevance Score: {product['score']}")
-                    
-                    with col3:
-                        st.metric("Price", product['price'])
-                        
-                        if product['availability'] == "In Stock":
-                            st.success("✅ In Stock")
-                        else:
-                            st.error("❌ Out of Stock")
-                        
-                        if st.button(f"View Details", key=f"view_{i}"):
-                            st.session_state.behavioral_auth.log_interaction('product_view', metadata={'product_rank': i+1})
-                
-                st.divider()
+    render_results()
     
     # Checkout simulation with BBA
-    if hasattr(st.session_state, 'search_results') and st.session_state.search_results:
+    if hasattr(st.session_state, 'search_cursor') and st.session_state.search_cursor:
         st.header("🛒 Checkout Demo - No CAPTCHA Required!")
         
         # Simulate checkout process
@@ -600,7 +659,7 @@ def main():
         with checkout_col1:
             st.subheader("Traditional E-commerce")
             st.error("❌ CAPTCHA Required")
-            st.image("https://via.placeholder.com/400x200?text=Select+all+traffic+lights", caption="Frustrating CAPTCHA")
+            show_image("https://via.placeholder.com/400x200?text=Select+all+traffic+lights", 400, caption="Frustrating CAPTCHA")
             st.button("😤 Struggle with CAPTCHA", disabled=True)
         
         with checkout_col2:
@@ -615,7 +674,7 @@ def main():
                 st.write("• Search behavior analysis")
                 
                 if st.button("🛒 Checkout Seamlessly", type="primary"):
-                    st.session_state.behavioral_auth.log_interaction('checkout_attempt')
+                    log_interaction('checkout_attempt')
                     st.balloons()
                     st.success("🎉 Order placed successfully! No CAPTCHA needed.")
             else:
@@ -633,22 +692,7 @@ def main():
                     st.info("Continue browsing to build trust and avoid CAPTCHA!")
     
     # Behavioral Analytics Dashboard
-    with st.expander("📊 Behavioral Analytics Dashboard (Admin View)"):
-        st.write("**User Interaction Timeline:**")
-        
-        if st.session_state.behavioral_auth.interactions:
-            for i, interaction in enumerate(st.session_state.behavioral_auth.interactions[-10:]):  # Show last 10
-                time_elapsed = interaction['timestamp'] - st.session_state.behavioral_auth.session_start
-                st.write(f"• {interaction['action']} at {time_elapsed:.1f}s")
-        
-        st.write("**Trust Score Breakdown:**")
-        st.write(f"• Base Score: 0")
-        st.write(f"• Session Time Bonus: +{min(15, int((time.time() - st.session_state.behavioral_auth.session_start) / 4))}")
-        st.write(f"• Interaction Variety: +{len(set(i['action'] for i in st.session_state.behavioral_auth.interactions)) * 5}")
-        st.write(f"• Search Behavior: +{15 if any(i['action'] == 'search' for i in st.session_state.behavioral_auth.interactions) else 0}")
-        st.write(f"• Voice Input: +{20 if any(i['action'].startswith('voice') for i in st.session_state.behavioral_auth.interactions) else 0}")
-        
-        st.metric("Final Trust Score", f"{st.session_state.behavioral_auth.trust_score}/100")
+    analytics_dashboard()
     
     # Footer
     st.markdown("---")
@@ -0,0 +1,122 @@
+import math
+from array import array
+
+from describo.audio_capture import TARGET_RATE, StreamingRecorder
+
+INPUT_RATE = 44100
+CHUNK = 1024
+
+
+def tone_then_silence(quiet: float = 0.3, tone: float = 0.5, silence: float = 3.0) -> array:
+    """Faint noise to calibrate on, a 440 Hz tone, then a long pause"""
+    samples = array('h')
+    for i in range(int(quiet * INPUT_RATE)):
+        samples.append(20 if i % 2 else -20)
+    for i in range(int(tone * INPUT_RATE)):
+        samples.append(int(8000 * math.sin(2 * math.pi * 440 * i / INPUT_RATE)))
+    samples.extend(array('h', bytes(int(silence * INPUT_RATE) * 2)))
+    return samples
+
+
+class FakeStream:
+    def __init__(self, audio: 'FakePyAudio', callback):
+        self.audio = audio
+        self.callback = callback
+        self.stopped = False
+        self.closed = False
+        self.frames_read = 0
+
+    def start_stream(self):
+        # Deliver the whole signal synchronously, the way PortAudio's thread would
+        samples = self.audio.samples
+        while self.frames_read < len(samples):
+            chunk = samples[self.frames_read:self.frames_read + CHUNK]
+            self.frames_read += len(chunk)
+            _, flag = self.callback(chunk.tobytes(), len(chunk), None, 0)
+            if flag == FakePyAudioModule.paComplete:
+                break
+
+    def stop_stream(self):
+        self.stopped = True
+
+    def close(self):
+        self.closed = True
+
+
+class FakePyAudio:
+    def __init__(self, samples: array):
+        self.samples = samples
+        self.stream = None
+        self.terminated = False
+        self.open_kwargs = None
+
+    def open(self, **kwargs):
+        self.open_kwargs = kwargs
+        self.stream = FakeStream(self, kwargs['stream_callback'])
+        return self.stream
+
+    def terminate(self):
+        self.terminated = True
+
+
+class FakePyAudioModule:
+    paInt16 = 8
+    paContinue = 0
+    paComplete = 1
+
+    def __init__(self, samples: array):
+        self.samples = samples
+        self.instances = []
+
+    def PyAudio(self) -> FakePyAudio:
+        audio = FakePyAudio(self.samples)
+        self.instances.append(audio)
+        return audio
+
+
+def record(samples: array, **options):
+    module = FakePyAudioModule(samples)
+    recorder = StreamingRecorder(max_duration=10.0, input_rate=INPUT_RATE, chunk=CHUNK,
+                                 pyaudio_module=module, **options)
+    recorder.start()
+    return recorder, module.instances[0]
+
+
+def test_stops_on_silence_after_speech():
+    samples = tone_then_silence()
+    recorder, audio = record(samples)
+
+    assert recorder.wait(timeout=1.0)
+    assert not recorder.is_active
+    # The 800 ms pause after the tone ends the recording long before the input runs out
+    assert audio.stream.frames_read < len(samples)
+    assert 1.5 < recorder.duration < 2.0
+
+
+def test_records_until_input_ends_without_vad():
+    samples = tone_then_silence()
+    recorder, audio = record(samples, stop_on_silence=False)
+
+    assert not recorder.wait(timeout=0.01)
+    assert audio.stream.frames_read == len(samples)
+
+
+def test_resamples_to_target_rate():
+    samples = tone_then_silence()
+    recorder, audio = record(samples)
+    consumed = audio.stream.frames_read
+    pcm = recorder.stop()
+
+    assert audio.open_kwargs['rate'] == INPUT_RATE
+    assert len(pcm) % 2 == 0
+    assert len(pcm) // 2 == round(recorder.duration * TARGET_RATE)
+    assert abs(len(pcm) // 2 - consumed * TARGET_RATE / INPUT_RATE) <= 2
+
+
+def test_stop_closes_stream_and_pyaudio():
+    recorder, audio = record(tone_then_silence())
+    recorder.stop()
+
+    assert audio.stream.stopped and audio.stream.closed
+    assert audio.terminated
+    assert not recorder.is_active
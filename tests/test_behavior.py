@@ -0,0 +1,73 @@
+import json
+import random
+import time
+from typing import Dict
+
+import pytest
+
+from describo.behavior import BehavioralAuth
+
+ACTIONS = ['search', 'voice_start', 'voice_transcribe', 'text_search', 'view_results', 'next_page', 'checkout']
+
+
+class BaselineAuth:
+    """The original scorer, which rescanned every logged interaction"""
+
+    def __init__(self):
+        self.session_start = time.time()
+        self.interactions = []
+        self.trust_score = 0
+
+    def log_interaction(self, action: str, metadata: Dict = None):
+        self.interactions.append({'timestamp': time.time(), 'action': action, 'metadata': metadata or {}})
+        self.update_trust_score()
+
+    def update_trust_score(self):
+        score = 0
+        session_time = time.time() - self.session_start
+        score += min(15, int(session_time / 30))
+        score += len(set(i['action'] for i in self.interactions)) * 5
+        if any(i['action'] == 'search' for i in self.interactions):
+            score += 10
+        if any(i['action'].startswith('voice') for i in self.interactions):
+            score += 20
+        if len(self.interactions) > 1:
+            recent_interactions = self.interactions[-5:]
+            if len(recent_interactions) >= 3:
+                time_diffs = [recent_interactions[i]['timestamp'] - recent_interactions[i - 1]['timestamp']
+                              for i in range(1, len(recent_interactions))]
+                if all(diff < 0.5 for diff in time_diffs):
+                    score -= 20
+        self.trust_score = min(100, max(0, score))
+
+    def is_human(self) -> bool:
+        return self.trust_score >= 80
+
+
+class Clock:
+    def __init__(self, start: float):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matches_baseline_scorer(monkeypatch, seed):
+    rng = random.Random(seed)
+    clock = Clock(1_700_000_000.0)
+    monkeypatch.setattr(time, 'time', clock)
+    baseline, auth = BaselineAuth(), BehavioralAuth(history_size=rng.choice([5, 20, 100]))
+    actions = rng.sample(ACTIONS, rng.randint(1, len(ACTIONS)))
+
+    for _ in range(rng.randint(1, 400)):
+        # Mix scripted bursts, browsing pauses and long idle stretches
+        clock.now += rng.choice([rng.uniform(0, 0.5), rng.uniform(0.3, 0.7), rng.uniform(1, 120)])
+        action = rng.choice(actions)
+        baseline.log_interaction(action)
+        auth.log_interaction(action)
+        if rng.random() < 0.05:
+            # Sessions are saved and restored between requests
+            auth = BehavioralAuth.from_dict(json.loads(json.dumps(auth.to_dict())))
+        assert auth.trust_score == baseline.trust_score
+        assert auth.is_human() == baseline.is_human()
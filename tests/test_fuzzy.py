@@ -0,0 +1,36 @@
+import pytest
+
+from describo.catalog import DictCatalog
+from describo.core import MOCK_PRODUCTS, SearchService
+from describo.fuzzy import FuzzyMatcher
+
+# The sidebar examples in latest.py, plus queries whose words are all near other catalog words
+EXAMPLES = [
+    "foldable thing people sleep on during camping",
+    "bottle which filters river water",
+    "light that goes on your head for camping",
+    "portable chair for outdoor use",
+    "waterproof shelter for camping",
+    "warm bag for cold nights",
+]
+
+
+@pytest.mark.parametrize('query', EXAMPLES)
+def test_examples_rank_the_same_with_and_without_fuzzy(query):
+    fuzzy = SearchService(DictCatalog(MOCK_PRODUCTS))
+    exact = SearchService(DictCatalog(MOCK_PRODUCTS), fuzzy=False)
+    keywords = exact.analyze(query)
+
+    assert fuzzy.cursor(keywords).ids == exact.cursor(keywords).ids
+
+
+def test_corrections():
+    matcher = FuzzyMatcher.from_catalog(DictCatalog(MOCK_PRODUCTS))
+
+    assert matcher.expand(['sleping', 'bag']) == ['sleping', 'bag', 'sleeping']
+    assert matcher.expand(['hed', 'lamp']) == ['hed', 'lamp', 'headlamp']
+    # Stop words and words under four letters are never corrections
+    assert 'for' not in matcher.vocabulary
+    assert matcher.expand(['fro', 'cut']) == ['fro', 'cut']
+    # Six letters allow one edit, not two ("during" -> "drink")
+    assert matcher.expand(['during']) == ['during']
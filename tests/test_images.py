@@ -0,0 +1,173 @@
+import io
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from describo.images import DISK_RESCAN_INTERVAL, ImageProxy, Thumbnail, ThumbnailCache, make_thumbnail
+
+
+def image_bytes(size=(600, 400), mode='RGB', format='JPEG') -> bytes:
+    Image = pytest.importorskip('PIL.Image')
+    out = io.BytesIO()
+    Image.new(mode, size, (200, 80, 40, 128)[:len(mode)]).save(out, format=format)
+    return out.getvalue()
+
+
+class StubImageHost(ThreadingHTTPServer):
+    """Local image host serving fixtures by path, with ETags and an optional delay"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _StubHandler)
+        self.images = {}  # path -> image bytes
+        self.delay = 0.0
+        self.requests = []  # (path, If-None-Match) of every request
+        self.lock = threading.Lock()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('If-None-Match')))
+        time.sleep(server.delay)
+        body = server.images.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = f'"{len(body)}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def host():
+    pytest.importorskip('requests')
+    server = StubImageHost()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def proxy():
+    proxies = []
+
+    def make(**options) -> ImageProxy:
+        proxies.append(ImageProxy(**options))
+        return proxies[-1]
+
+    yield make
+    for image_proxy in proxies:
+        image_proxy.close()
+
+
+def test_make_thumbnail_keeps_the_aspect_ratio():
+    Image = pytest.importorskip('PIL.Image')
+    thumbnail = make_thumbnail(image_bytes((600, 400)), width=150)
+
+    with Image.open(io.BytesIO(thumbnail.data)) as image:
+        assert image.size == (150, 100)
+    assert thumbnail.content_type == 'image/jpeg'
+    # Transparent images stay PNG, and small ones are not enlarged
+    transparent = make_thumbnail(image_bytes((100, 50), 'RGBA', 'PNG'), width=150)
+    assert transparent.content_type == 'image/png'
+    with Image.open(io.BytesIO(transparent.data)) as image:
+        assert image.size == (100, 50)
+
+
+def test_fetches_and_caches_a_thumbnail(host, proxy):
+    host.images['/cot.jpg'] = image_bytes()
+    image_proxy = proxy()
+
+    data = image_proxy.thumbnail(host.url('/cot.jpg'))
+    assert data.startswith(b'\xff\xd8')  # JPEG
+    assert image_proxy.thumbnail(host.url('/cot.jpg')) == data
+    assert len(host.requests) == 1
+
+
+def test_stale_thumbnail_is_revalidated_with_its_etag(host, proxy):
+    host.images['/cot.jpg'] = image_bytes()
+    image_proxy = proxy(max_age=0.0)
+
+    data = image_proxy.thumbnail(host.url('/cot.jpg'))
+    assert image_proxy.thumbnail(host.url('/cot.jpg')) == data
+    etag = f'"{len(host.images["/cot.jpg"])}"'
+    assert host.requests == [('/cot.jpg', None), ('/cot.jpg', etag)]
+
+
+def test_missing_image_is_not_retried_within_the_ttl(host, proxy):
+    image_proxy = proxy(failure_ttl=60.0)
+
+    assert image_proxy.thumbnail(host.url('/missing.jpg')) is None
+    assert image_proxy.thumbnail(host.url('/missing.jpg')) is None
+    assert len(host.requests) == 1
+
+
+def test_failed_url_is_retried_after_the_ttl(host, proxy):
+    image_proxy = proxy(failure_ttl=0.0)
+
+    image_proxy.thumbnail(host.url('/missing.jpg'))
+    image_proxy.thumbnail(host.url('/missing.jpg'))
+    assert len(host.requests) == 2
+
+
+def test_stale_thumbnail_is_served_when_the_origin_times_out(host, proxy):
+    host.images['/cot.jpg'] = image_bytes()
+    image_proxy = proxy(max_age=0.0, timeout=0.2)
+    data = image_proxy.thumbnail(host.url('/cot.jpg'))
+
+    host.delay = 0.5
+    assert image_proxy.thumbnail(host.url('/cot.jpg')) == data
+    assert image_proxy.thumbnail(host.url('/new.jpg')) is None
+
+
+def test_prefetch_fetches_a_page_concurrently(host, proxy):
+    urls = [host.url(f"/{i}.jpg") for i in range(8)]
+    for i in range(8):
+        host.images[f"/{i}.jpg"] = image_bytes((300 + i, 200))
+    host.delay = 0.2
+    image_proxy = proxy(pool_size=8)
+
+    start = time.perf_counter()
+    image_proxy.prefetch(urls + urls[:2])
+    assert time.perf_counter() - start < 0.2 * 4
+    assert len(host.requests) == len(urls)
+
+    # Rendering the page afterwards only reads the cache
+    assert all(image_proxy.thumbnail(url) is not None for url in urls)
+    assert len(host.requests) == len(urls)
+
+
+def test_disk_cap_covers_thumbnails_of_every_process(tmp_path):
+    thumbnail = Thumbnail(b'x' * 100, 'image/jpeg', None, None, 0.0)
+    entry_bytes = len(thumbnail.encode())
+    max_bytes = 20_000
+    # Several processes sharing one directory, each with its own index
+    caches = [ThumbnailCache(str(tmp_path), max_bytes=max_bytes) for _ in range(4)]
+    for i in range(2000):
+        caches[i % len(caches)].put(ThumbnailCache.key(f"http://images/{i}.jpg", 150), thumbnail)
+
+    total = sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+    assert total <= max_bytes + len(caches) * DISK_RESCAN_INTERVAL * entry_bytes
+    # A fresh process sees the same files and can read the newest entries
+    fresh = ThumbnailCache(str(tmp_path))
+    assert fresh.get(ThumbnailCache.key("http://images/1999.jpg", 150)) == thumbnail
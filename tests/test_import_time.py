@@ -0,0 +1,11 @@
+import pytest
+
+from benchmarks.bench_import import BUDGET_MS, HEAVY_MODULES, MODULES, measure
+
+
+@pytest.mark.parametrize('module', MODULES)
+def test_core_imports_fast_without_heavy_dependencies(module):
+    result = measure(module, runs=3)
+
+    assert result['loaded'] == [], f"{module} imported {', '.join(result['loaded'])} (lazy: {HEAVY_MODULES})"
+    assert result['ms'] <= BUDGET_MS, f"{module} took {result['ms']:.1f} ms"
@@ -0,0 +1,38 @@
+import threading
+
+from benchmarks.synthetic import make_catalog, make_queries
+from describo.analyzer import QueryAnalyzer
+from describo.catalog import DictCatalog
+from describo.ranking import RelevanceScorer
+
+
+def test_scores_stay_consistent_while_the_catalog_changes():
+    catalog = DictCatalog(make_catalog(300, seed=2))
+    scorer = RelevanceScorer(catalog)
+    analyzer = QueryAnalyzer(cache_size=0)
+    queries = [analyzer.analyze(query) for query in make_queries(50, seed=2)]
+    product_ids = list(catalog)
+    errors = []
+    done = threading.Event()
+
+    def search():
+        try:
+            while not done.is_set():
+                for keywords in queries:
+                    scorer.top_k(keywords, 10)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    # Shrinking the catalog fails if scores mix one build's products with another's postings
+    for product_id in product_ids[:100]:
+        catalog.remove_product(product_id)
+        scorer.refresh()
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert scorer.version == catalog.version and len(scorer.product_ids) == len(catalog)
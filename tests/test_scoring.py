@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from benchmarks.synthetic import make_catalog, make_queries
+from describo.analyzer import QueryAnalyzer
+from describo.catalog import DictCatalog
+from describo.core import SearchService
+from describo.search_index import KeywordIndex, score_product
+
+
+def linear_top_k(catalog: DictCatalog, keywords, k: int):
+    scored = [(score_product(product, keywords), product_id) for product_id, product in catalog.items()]
+    ranked = sorted((item for item in enumerate(scored) if item[1][0] > 0), key=lambda item: (-item[1][0], item[0]))
+    return [(product_id, score) for _, (score, product_id) in ranked[:k]]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_in_place_updates_match_a_full_scan(seed):
+    rng = random.Random(seed)
+    service = SearchService(DictCatalog(make_catalog(500, seed=seed)))
+    scorer = service.scorer
+    analyzer = QueryAnalyzer(cache_size=0)
+    queries = [analyzer.analyze(query) for query in make_queries(20, seed=seed)] + [['camping stove']]
+    incoming = list(make_catalog(400, seed=seed + 100).items())
+    product_ids = list(service.catalog)
+
+    for step in range(400):
+        action = rng.random()
+        if action < 0.4:
+            product_id, product = incoming.pop()
+            service.add_product(f"new-{product_id}", product)
+            product_ids.append(f"new-{product_id}")
+        elif action < 0.7:
+            service.remove_product(product_ids.pop(rng.randrange(len(product_ids))))
+        else:
+            service.add_product(rng.choice(product_ids), dict(rng.choice(incoming)[1]))
+
+        if step % 50 == 0:
+            for keywords in queries:
+                assert scorer.top_k(keywords, 10) == linear_top_k(service.catalog, keywords, 10)
+    # Updated in place (compacting as needed), never rebuilt from scratch by the service
+    assert service.scorer is scorer
+    assert scorer.version == service.catalog.version
+
+
+def test_keyword_index_ranks_like_a_full_scan():
+    catalog = DictCatalog(make_catalog(300, seed=7))
+    index = KeywordIndex.from_catalog(catalog)
+    for product_id, product in list(make_catalog(20, seed=8).items()):
+        catalog.add_product(f"new-{product_id}", product)
+        index.add_product(f"new-{product_id}", product)
+    removed = next(iter(catalog))
+    catalog.remove_product(removed)
+    index.remove_product(removed)
+
+    for query in make_queries(10, seed=7):
+        keywords = QueryAnalyzer(cache_size=0).analyze(query)
+        assert index.rank(keywords) == linear_top_k(catalog, keywords, None)
+        assert [product['score'] for product in index.search(keywords)] == [s for _, s in index.rank(keywords)]
+    assert removed not in index and len(index) == len(catalog)
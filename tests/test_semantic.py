@@ -0,0 +1,41 @@
+import threading
+
+import numpy as np
+
+from benchmarks.synthetic import make_catalog, make_queries
+from describo.catalog import DictCatalog
+from describo.core import SearchService
+from describo.semantic import HashingVectorizer
+
+
+def test_vectorizer_is_thread_safe():
+    queries = make_queries(2000, seed=1)
+    expected = HashingVectorizer().transform(queries)
+    # A tiny cache forces clears while other threads are vectorizing
+    vectorizer = HashingVectorizer(max_cached_words=50)
+    results = [None] * 8
+
+    def run(slot):
+        if slot % 2:
+            results[slot] = vectorizer.transform(queries)
+        else:
+            results[slot] = np.stack([vectorizer.transform_one(query) for query in queries])
+
+    threads = [threading.Thread(target=run, args=(slot,)) for slot in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for result in results:
+        np.testing.assert_allclose(result, expected)
+
+
+def test_semantic_index_follows_catalog_changes():
+    service = SearchService(DictCatalog(make_catalog(300, seed=1)), hybrid=True)
+    index = service.semantic
+    service.add_product('new-1', {'name': 'Zorbulator', 'description': 'quantum hammock', 'keywords': ['hammock'],
+                                  'rating': 5.0, 'image_url': ''})
+
+    assert service.semantic is not index
+    assert service.semantic.catalog_version == service.catalog.version
+    assert 'new-1' in [product_id for product_id, _ in service.semantic.search('zorbulator quantum', 5)]
@@ -0,0 +1,17 @@
+import os
+
+from describo.transcript_cache import DISK_RESCAN_INTERVAL, TranscriptCache
+
+
+def test_disk_cap_covers_files_of_every_process(tmp_path):
+    entry_bytes = len('{"text": "%s"}' % ('x' * 100))
+    max_bytes = 20_000
+    # Several processes sharing one directory, each with its own index
+    caches = [TranscriptCache(str(tmp_path), max_bytes=max_bytes) for _ in range(4)]
+    for i in range(2000):
+        caches[i % len(caches)].put(f"{i:064x}", 'x' * 100)
+
+    total = sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+    assert total <= max_bytes + len(caches) * DISK_RESCAN_INTERVAL * entry_bytes
+    # A fresh process sees the same files and can read the newest entries
+    assert TranscriptCache(str(tmp_path)).get(f"{1999:064x}") == 'x' * 100
@@ -0,0 +1,167 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from describo.transcription import CircuitBreaker, CircuitOpenError, TranscriptionError, TranscriptionService
+
+UPLOAD = ('audio.wav', b'RIFF' + bytes(64))
+
+
+class StubWhisper(ThreadingHTTPServer):
+    """Local stand-in for the Groq endpoint answering with scripted status codes"""
+
+    def __init__(self, statuses):
+        super().__init__(('127.0.0.1', 0), _StubHandler)
+        self.statuses = list(statuses)
+        self.requests = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        server.requests += 1
+        status = server.statuses.pop(0) if server.statuses else 200
+        body = json.dumps({'text': 'water filter'} if status == 200 else {'error': {'message': str(status)}})
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class StubStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class StubClient:
+    """Minimal HTTP client shaped like groq.Groq, raising errors with status_code like the SDK"""
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.audio = self
+        self.transcriptions = self
+
+    def create(self, file, model, response_format, language, timeout):
+        request = urllib.request.Request(f"{self.base_url}/openai/v1/audio/transcriptions", data=file[1],
+                                         method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                payload = json.load(response)
+        except urllib.error.HTTPError as e:
+            raise StubStatusError(e.code) from e
+
+        class Transcription:
+            text = payload['text']
+        return Transcription
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(*statuses) -> StubWhisper:
+        server = StubWhisper(statuses)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_service(base_url: str, breaker: CircuitBreaker = None, max_retries: int = 2) -> TranscriptionService:
+    service = TranscriptionService(base_url=base_url, max_retries=max_retries, backoff_base=0.0, timeout=5.0,
+                                   breaker=breaker)
+    service._client = StubClient(base_url, service.timeout)
+    return service
+
+
+def test_retries_count_as_one_breaker_failure(stub):
+    server = stub(503, 503, 503)
+    breaker = CircuitBreaker(failure_threshold=2)
+    service = make_service(server.base_url, breaker)
+
+    with pytest.raises(TranscriptionError):
+        service.transcribe(UPLOAD, timeout=5)
+    assert server.requests == 3
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_after_threshold_calls(stub):
+    server = stub(*[503] * 6)
+    breaker = CircuitBreaker(failure_threshold=2)
+    service = make_service(server.base_url, breaker)
+
+    for _ in range(2):
+        with pytest.raises(TranscriptionError):
+            service.transcribe(UPLOAD, timeout=5)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        service.transcribe(UPLOAD, timeout=5)
+    assert server.requests == 6
+
+
+def test_client_errors_are_not_retried_or_counted(stub):
+    server = stub(400, 400)
+    breaker = CircuitBreaker(failure_threshold=1)
+    service = make_service(server.base_url, breaker)
+
+    for _ in range(2):
+        with pytest.raises(TranscriptionError):
+            service.transcribe(UPLOAD, timeout=5)
+    assert server.requests == 2
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_transport_errors_open_the_breaker(stub):
+    server = stub()
+    base_url = server.base_url
+    server.shutdown()
+    server.server_close()
+    breaker = CircuitBreaker(failure_threshold=1)
+    service = make_service(base_url, breaker, max_retries=1)
+
+    with pytest.raises(TranscriptionError):
+        service.transcribe(UPLOAD, timeout=5)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_trial_may_retry(stub):
+    server = stub(503, 503, 200)
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0, clock=clock)
+    service = make_service(server.base_url, breaker, max_retries=1)
+
+    with pytest.raises(TranscriptionError):
+        service.transcribe(UPLOAD, timeout=5)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 31.0
+    assert service.transcribe(UPLOAD, timeout=5) == 'water filter'
+    assert server.requests == 3
+    assert breaker.state == CircuitBreaker.CLOSED